@@ -1,14 +1,10 @@
+from dotenv import load_dotenv  # For loading environment variables
+load_dotenv()  # Before the imports below: several modules read their settings from the environment at import
 from flask import Flask  # Flask web framework
 from flask_cors import CORS  # Enable CORS for cross-origin requests
-from db import db  # Import database instance
-
-app = Flask(__name__)  # Create Flask app
-app.config.from_object('config.Config')  # Load config from config.py
-
-# Initialize database with app
-db.init_app(app)
-# Enable CORS
-CORS(app)
+from flask_login import LoginManager  # Session-based login for the auth routes
+from db import db, setup_database  # Pooling, SQLite pragmas and read replica
+from utils import admission, metrics  # LLM admission control; request timing and /metrics
 
 # --- Register API blueprints ---
 def register_blueprints(app):
@@ -16,15 +12,81 @@ def register_blueprints(app):
     from routes.spots import spots_bp  # Study/recreation spot routes
     from routes.sessions import sessions_bp  # Study session routes
     from routes.ai import ai_bp  # AI recommendation routes
+    from routes.jobs import jobs_bp  # Background job status
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(spots_bp, url_prefix='/api/spots')
     app.register_blueprint(sessions_bp, url_prefix='/api/sessions')
     app.register_blueprint(ai_bp, url_prefix='/api/recommend')
+    app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
+
+# --- Load user for flask_login ---
+def load_user(user_id):
+    from models import User
+    return db.session.get(User, int(user_id))
+
+# --- Warm shared caches before worker processes fork ---
+def warm_caches(app):
+    """
+    Build the in-memory spot catalogs and indexes, load the session
+    embeddings and import openai/numpy up front. Run in the master process
+    (e.g. gunicorn --preload) so forked workers share these pages
+    copy-on-write instead of each rebuilding them on its first request.
+    """
+    import openai  # Only the module; each worker still creates its own client
+    from utils.ann_index import session_index
+    from utils.embeddings import session_store
+    from utils.spot_catalog import db_catalog, json_catalog
+    from utils.spot_search import ensure_search_index
+
+    with app.app_context():
+        catalog = db_catalog()
+        catalog.geo()
+        catalog.features()
+        catalog.hours()
+        for spot_type in ('study', 'recreation'):
+            catalog.sorted_ids(type=spot_type)
+        try:
+            json_catalog()
+        except OSError:
+            pass  # No spots.json in this deployment
+        ensure_search_index()
+        session_store.load()
+        session_index.refresh()
+        # Pooled connections must not be shared across the fork
+        for engine in db.engines.values():
+            engine.dispose()
+
+# --- Application factory ---
+def create_app(config=None, warm=False):
+    """
+    Build the app with every blueprint registered. config overrides values
+    from config.Config. Heavy modules (openai, numpy) load on first use
+    unless warm=True, which preloads them with warm_caches().
+    WSGI: gunicorn 'app:create_app()' or, pre-forking warm workers,
+    gunicorn --preload 'app:create_app(warm=True)'. `flask run` finds this
+    factory itself; scripts call it once. There is no module-level app, so
+    importing this module never builds a second one (and its engine pools).
+    .env is loaded when this module is imported, so scripts import it first.
+    """
+    app = Flask(__name__)  # Create Flask app
+    app.config.from_object('config.Config')  # Load config from config.py
+    app.config.update(config or {})
+
+    # Initialize database with app (engine options come from the environment)
+    setup_database(app)
+    # Enable CORS
+    CORS(app)
+    # Per-request timing, SQL and OpenAI metrics
+    metrics.init_app(app)
+    # 429/503 with Retry-After when LLM calls can't be admitted in time
+    admission.init_app(app)
+    login_manager = LoginManager(app)
+    login_manager.user_loader(load_user)
+    register_blueprints(app)
+    if warm:
+        warm_caches(app)
+    return app
 
 # --- Main entry point ---
 if __name__ == '__main__':
-    with app.app_context():
-        print("Registering blueprints...")
-        register_blueprints(app)  # Register all routes
-        print("Blueprints registered.")
-        app.run(debug=True)  # Start Flask server
+    create_app().run(debug=True)  # Start Flask server
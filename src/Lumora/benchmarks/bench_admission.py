@@ -0,0 +1,84 @@
+"""
+LLM admission control under a burst: many threads call a fake upstream
+that allows only --upstream-rps requests per second (more get a 429).
+Without the limiter every call goes upstream at once; with it, calls are
+admitted by priority within the rate and concurrency budget, and those
+that cannot be admitted in time are refused at once.
+
+Run from src/Lumora:  python -m benchmarks.bench_admission [--callers N]
+"""
+import argparse
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+from utils.admission import Limiter, Overloaded, TokenBucket
+
+class FakeUpstream:
+    """
+    Serves each call in `latency` seconds; starts beyond `rps` per second are rate limited.
+    """
+
+    def __init__(self, rps, latency):
+        self.bucket = TokenBucket(rps, max(1, int(rps)))
+        self.latency = latency
+
+    def call(self):
+        if self.bucket.take():
+            return 'upstream_429'
+        time.sleep(self.latency)
+        return 'ok'
+
+def run(callers, upstream, limiter, sites):
+    outcomes, latencies = Counter(), []
+    lock = threading.Lock()
+
+    def caller(i):
+        site = sites[i % len(sites)]
+        start = time.perf_counter()
+        try:
+            if limiter is None:
+                outcome = upstream.call()
+            else:
+                with limiter.slot(site):
+                    outcome = upstream.call()
+        except Overloaded as e:
+            outcome = f'refused_{e.status}'
+        with lock:
+            outcomes[(site, outcome)] += 1
+            latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(callers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return outcomes, np.array(latencies) * 1000, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM admission control benchmark")
+    parser.add_argument('--callers', type=int, default=200)
+    parser.add_argument('--upstream-rps', type=float, default=20)
+    parser.add_argument('--latency', type=float, default=0.2, help='Upstream seconds per call')
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    sites = ['recommend', 'recommend', 'recommend', 'session_index', 'categorize_spot']
+    print(f"{args.callers} simultaneous callers, upstream {args.upstream_rps:g} req/s, "
+          f"{args.latency * 1000:.0f} ms per call\n")
+    for label, limiter in (("no limiter", None),
+                           ("limiter", Limiter(TokenBucket(args.upstream_rps, int(args.upstream_rps)),
+                                               max_concurrent=args.concurrency, max_queue=args.callers))):
+        outcomes, latencies, seconds = run(args.callers, FakeUpstream(args.upstream_rps, args.latency),
+                                           limiter, sites)
+        print(f"{label}: {seconds:.2f} s, p50 {np.percentile(latencies, 50):.0f} ms, "
+              f"p95 {np.percentile(latencies, 95):.0f} ms")
+        for (site, outcome), n in sorted(outcomes.items()):
+            print(f"  {site:<16} {outcome:<14} {n:>5}")
+        print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Compare the IVF session index against an exact scan.
+
+Run from src/Lumora:  python -m benchmarks.bench_ann [rows] [dim]
+Reports build time, per-query latency and recall@10 for several nprobe values.
+"""
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from utils.ann_index import IVFIndex
+from utils.embeddings import normalize_rows
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+DIM = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+QUERIES = 200
+K = 10
+
+# --- Clustered synthetic embeddings (subjects cluster by topic) ---
+rng = np.random.default_rng(42)
+topics = normalize_rows(rng.standard_normal((2000, DIM)))
+vectors = normalize_rows(topics[rng.integers(0, len(topics), ROWS)] + rng.standard_normal((ROWS, DIM)) / np.sqrt(DIM))
+queries = normalize_rows(topics[rng.integers(0, len(topics), QUERIES)] + rng.standard_normal((QUERIES, DIM)) / np.sqrt(DIM))
+ids = np.arange(1, ROWS + 1)
+
+# --- Exact baseline ---
+start = time.perf_counter()
+truth = []
+for q in queries:
+    scores = vectors @ q
+    top = np.argpartition(-scores, K - 1)[:K]
+    truth.append(set(ids[top].tolist()))
+exact_ms = (time.perf_counter() - start) * 1000 / QUERIES
+print(f"{ROWS} rows x {DIM} dims")
+print(f"exact scan        {exact_ms:8.3f} ms/query  recall@{K} 1.000")
+
+with tempfile.TemporaryDirectory() as path:
+    index = IVFIndex(path)
+    start = time.perf_counter()
+    index.build(ids, vectors)
+    print(f"build             {time.perf_counter() - start:8.3f} s  ({index.meta['nlist']} lists)")
+
+    for nprobe in [1, 2, 4, 8, 16, 32, 64]:
+        if nprobe > index.meta['nlist']:
+            break
+        start = time.perf_counter()
+        found = [{sid for sid, _ in index.search(q, k=K, nprobe=nprobe)} for q in queries]
+        ms = (time.perf_counter() - start) * 1000 / QUERIES
+        recall = np.mean([len(f & t) / K for f, t in zip(found, truth)])
+        print(f"ivf nprobe={nprobe:<4}   {ms:8.3f} ms/query  recall@{K} {recall:.3f}  ({exact_ms / ms:5.1f}x)")
+
+    # Incremental maintenance
+    start = time.perf_counter()
+    for i in range(1000):
+        index.add(ROWS + 1 + i, vectors[i])
+    print(f"add               {(time.perf_counter() - start) * 1000 / 1000:8.3f} ms/row")
+    start = time.perf_counter()
+    for i in range(1, 1001):
+        index.remove(i)
+    print(f"delete            {(time.perf_counter() - start) * 1000 / 1000:8.3f} ms/row")
+    start = time.perf_counter()
+    index.compact()
+    print(f"compact           {time.perf_counter() - start:8.3f} s  ({len(index)} live rows)")
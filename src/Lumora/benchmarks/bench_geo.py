@@ -0,0 +1,48 @@
+"""
+Nearest-spot queries on the grid index versus a full vectorized scan.
+
+Run from src/Lumora:  python -m benchmarks.bench_geo [spots]
+"""
+import sys
+import time
+
+import numpy as np
+
+from utils.geo_index import GeoIndex, haversine_km
+
+SPOTS = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+QUERIES = 2000
+
+# --- Synthetic regional catalog (roughly the South Bay) ---
+rng = np.random.default_rng(7)
+lats = rng.uniform(37.0, 37.8, SPOTS)
+lons = rng.uniform(-122.3, -121.5, SPOTS)
+ids = np.arange(1, SPOTS + 1)
+study = frozenset(ids[rng.random(SPOTS) < 0.5].tolist())  # e.g. catalog.ids(type='study')
+points = np.column_stack([rng.uniform(37.1, 37.7, QUERIES), rng.uniform(-122.2, -121.6, QUERIES)])
+
+start = time.perf_counter()
+index = GeoIndex(ids, lats, lons)
+print(f"{SPOTS} spots, build {(time.perf_counter() - start) * 1000:.1f} ms")
+
+def timed(label, fn):
+    start = time.perf_counter()
+    for lat, lon in points:
+        fn(lat, lon)
+    print(f"{label:<34} {(time.perf_counter() - start) * 1e6 / QUERIES:9.1f} us/query")
+
+def full_scan(lat, lon, k=10, radius_km=2.0):
+    d = haversine_km(lat, lon, lats, lons)
+    inside = np.nonzero(d <= radius_km)[0]
+    return inside[np.argsort(d[inside])[:k]]
+
+timed("full scan, 2 km, k=10", full_scan)
+timed("grid, 2 km, k=10", lambda lat, lon: index.nearest(lat, lon, k=10, radius_km=2.0))
+timed("grid, 2 km, k=10, type filter", lambda lat, lon: index.nearest(lat, lon, 10, 2.0, allowed_ids=study))
+timed("grid, 10 km, k=10", lambda lat, lon: index.nearest(lat, lon, k=10, radius_km=10.0))
+
+# Same answers as the full scan
+for lat, lon in points[:100]:
+    expected = ids[full_scan(lat, lon)].tolist()
+    assert [i for i, _ in index.nearest(lat, lon, k=10, radius_km=2.0)] == expected
+print("results match full scan")
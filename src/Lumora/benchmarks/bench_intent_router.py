@@ -0,0 +1,76 @@
+"""
+Intent routing throughput and the share of messages that skip the LLM parse,
+for the compiled router versus the original keyword scans.
+
+Run from src/Lumora:  python -m benchmarks.bench_intent_router [messages]
+"""
+import random
+import sys
+import time
+
+from utils.intent_router import IntentRouter
+
+MESSAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+# --- Synthetic chat traffic (intent label, message) ---
+TEMPLATES = [
+    ('study_question', "how do I {verb} this {subject} problem?"),
+    ('study_question', "can you explain {subject} to me"),
+    ('study_question', "what is the answer to question {n} in my {subject} homework"),
+    ('study_spot', "I need a {noise} place to study with {amenity}"),
+    ('study_spot', "where can I study in {city}?"),
+    ('study_spot', "any {noise} library nearby"),
+    ('recreation', "where can I play {activity} in {city}?"),
+    ('recreation', "show me a {activity} spot near campus"),
+    ('recreation', "somewhere fun to go {activity}"),
+    (None, "hi lumora"),
+    (None, "thanks, that was useful"),
+    (None, "recommend something for saturday afternoon"),
+]
+WORDS = {
+    'verb': ['solve', 'calculate', 'approach'], 'subject': ['math', 'physics', 'history', 'chemistry'],
+    'noise': ['quiet', 'silent', 'lively'], 'amenity': ['wifi', 'outlets', 'coffee'],
+    'city': ['Milpitas', 'San Jose', 'Santa Clara'], 'activity': ['basketball', 'tennis', 'hiking', 'swimming'],
+    'n': ['3', '7', '12'],
+}
+
+rng = random.Random(3)
+traffic = []
+for _ in range(MESSAGES):
+    label, template = rng.choice(TEMPLATES)
+    traffic.append((label, template.format(**{k: rng.choice(v) for k, v in WORDS.items()})))
+
+# --- The original classification ---
+STUDY = ["solve", "explain", "help", "question", "math", "science", "history", "english", "biology", "physics",
+         "chemistry", "calculate", "who", "what", "when", "where", "why", "how"]
+LOCATION = ["location", "where", "place", "spot", "specific", "library", "milpitas", "san jose", "online"]
+RECREATION = ["recreation", "play", "park", "basketball", "pickleball", "tennis", "hiking", "hang-gliding",
+              "dog park"]
+
+def keyword_route(query):
+    if any(w in query.lower() for w in STUDY) and not any(w in query.lower() for w in LOCATION):
+        return 'study_question'
+    if any(w in query.lower() for w in LOCATION):
+        return 'study_spot'
+    if any(w in query.lower() for w in RECREATION):
+        return 'recreation'
+    return None  # LLM parse
+
+router = IntentRouter()
+
+def compiled_route(query):
+    route = router.route(query)
+    return route.intent if route.confident else None
+
+def report(label, classify):
+    start = time.perf_counter()
+    results = [classify(message) for _, message in traffic]
+    elapsed = time.perf_counter() - start
+    local = sum(r is not None for r in results)
+    wrong = sum(r is not None and r != expected for r, (expected, _) in zip(results, traffic))
+    print(f"{label:<16} {MESSAGES / elapsed:>12,.0f} msg/s  local {local / MESSAGES:6.1%}  "
+          f"misrouted {wrong / MESSAGES:6.1%}")
+
+print(f"{MESSAGES} messages")
+report("keyword scans", keyword_route)
+report("compiled router", compiled_route)
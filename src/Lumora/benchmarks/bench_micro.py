@@ -0,0 +1,86 @@
+"""
+Microbenchmarks of the hot helpers, offline (OpenAI calls go to the fake
+server): recommend_spots, match_study_sessions (embeddings and local
+TF-IDF), cosine_similarity and spot serialization. --save/--compare work
+like benchmarks.load_test.
+
+Run from src/Lumora:  python -m benchmarks.bench_micro [--spots N] [--sessions N]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from benchmarks import harness
+
+def timed(results, name, fn, repeat):
+    fn()  # Warm caches, catalogs and indexes
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples = np.array(samples) * 1e6
+    results[name] = {'ops_per_s': round(repeat / (samples.sum() / 1e6), 1),
+                     'p50_us': round(float(np.percentile(samples, 50)), 1),
+                     'p95_us': round(float(np.percentile(samples, 95)), 1)}
+    r = results[name]
+    print(f"{name:<34} {r['ops_per_s']:>12,.1f} ops/s {r['p50_us']:>12,.1f} us p50 {r['p95_us']:>12,.1f} us p95")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline microbenchmarks")
+    parser.add_argument('--spots', type=int, default=20000)
+    parser.add_argument('--sessions', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--latency-scale', type=float, default=0.0,
+                        help='Fake OpenAI latency multiplier (0 measures local work only)')
+    parser.add_argument('--save')
+    parser.add_argument('--compare')
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    args = parser.parse_args()
+    save = os.path.abspath(args.save) if args.save else None
+    compare = os.path.abspath(args.compare) if args.compare else None
+
+    app, fake = harness.setup(args.spots, 200, args.sessions, args.latency_scale)
+    from utils.ai_utils import cosine_similarity, match_study_sessions, recommend_spots, spot_to_dict
+    from utils.responses import dumps
+    from utils.spot_catalog import db_catalog
+
+    results = {}
+    rng = np.random.default_rng(0)
+    a, b = rng.standard_normal(1536).tolist(), rng.standard_normal(1536).tolist()
+    print(f"{args.spots} spots, {args.sessions} sessions")
+    with app.app_context():
+        records = db_catalog().filter(type='study')[:1000]
+        timed(results, "cosine_similarity (1536-d lists)", lambda: cosine_similarity(a, b), args.repeat * 10)
+        timed(results, "recommend_spots (study, quiet)",
+              lambda: recommend_spots({'type': 'study', 'noise_level': 'quiet'}), args.repeat)
+        timed(results, "recommend_spots (recreation)",
+              lambda: recommend_spots({'type': 'recreation', 'activity': 'basketball'}), args.repeat)
+        timed(results, "recommend_spots (5 signals)",
+              lambda: recommend_spots({'type': 'study', 'noise_level': 'quiet', 'amenities': 'wifi coffee',
+                                       'open_at': '20:00', 'lat': 37.35, 'lon': -121.9}), args.repeat)
+        timed(results, "serialize 1000 spots (json)",
+              lambda: json.dumps([spot_to_dict(s) for s in records]), args.repeat)
+        timed(results, "serialize 1000 spots (fast)",
+              lambda: dumps([spot_to_dict(s) for s in records]), args.repeat)
+        timed(results, "match_study_sessions",
+              lambda: match_study_sessions({'subject': 'calculus', 'topic': 'derivatives'}, min_score=0.3),
+              args.repeat)
+        timed(results, "match_study_sessions (local)",
+              lambda: match_study_sessions({'subject': 'calculus', 'topic': 'derivatives'}, mode='local'),
+              args.repeat)
+    print(f"fake OpenAI requests: {fake.requests}")
+
+    if save:
+        harness.save_results(save, results)
+    if compare:
+        if harness.compare_results(results, compare, {'ops_per_s': True, 'p50_us': False, 'p95_us': False},
+                                   args.tolerance):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
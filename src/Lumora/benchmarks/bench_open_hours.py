@@ -0,0 +1,89 @@
+"""
+"Open at" filtering over a large synthetic catalog: parsing each spot's
+hours text per request, scanning pre-parsed intervals, and the catalog's
+hours interval index (first lookup of a segment and cached lookups).
+
+Run from src/Lumora:  python -m benchmarks.bench_open_hours [--spots N]
+"""
+import argparse
+import random
+import time
+
+from utils.opening_hours import MINUTES_PER_WEEK, parse_hours
+from utils.spot_catalog import SpotCatalog, SpotRecord
+
+DAY_GROUPS = ['', 'Mon-Fri ', 'Sat-Sun ', 'Mon-Sat ', 'Tue-Sun ']
+
+def random_hours(rng):
+    """
+    Hours text with varied opening times, day groups, split days and overnight spans.
+    """
+    if rng.random() < 0.05:
+        return '24/7'
+    if rng.random() < 0.05:
+        return None
+    def span():
+        start, length = rng.randint(5, 20), rng.randint(3, 10)
+        end = (start + length) % 24
+        fmt = lambda h: f"{h % 12 or 12}{'am' if h < 12 else 'pm'}"
+        return f"{fmt(start)}-{fmt(end)}"
+    text = rng.choice(DAY_GROUPS) + span()
+    if rng.random() < 0.3:
+        text += f"; {rng.choice(['Sat', 'Sun', 'Fri'])} {span()}"
+    return text
+
+def timed(label, fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    seconds = (time.perf_counter() - start) / repeat
+    print(f"{label:<46} {seconds * 1e3:>10.3f} ms")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Opening-hours filter benchmark")
+    parser.add_argument('--spots', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    records = [SpotRecord(i, f'Spot {i}', 'study' if i % 3 else 'recreation', f'{i} Main St',
+                          hours=random_hours(rng)) for i in range(1, args.spots + 1)]
+    minutes = [rng.randrange(MINUTES_PER_WEEK) for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    schedules = {r.id: parse_hours(r.hours) for r in records}
+    parse_seconds = time.perf_counter() - start
+    catalog = SpotCatalog(records, schedules=schedules)
+    start = time.perf_counter()
+    index = catalog.hours()
+    build_seconds = time.perf_counter() - start
+    print(f"{args.spots} spots, {len(set(r.hours for r in records))} distinct hours strings, "
+          f"{len(index.breakpoints) - 1} index segments")
+    print(f"parse all hours: {parse_seconds:.2f} s ({args.spots / parse_seconds:,.0f} strings/s), "
+          f"index build: {build_seconds * 1e3:.1f} ms\n")
+
+    m = minutes[0]
+
+    def parse_per_request():
+        return {r.id for r in records if any(s <= m < e for s, e in parse_hours(r.hours) or ())}
+
+    def scan_parsed():
+        return {i for i, s in schedules.items() if s and any(a <= m < b for a, b in s)}
+
+    expected = timed("parse every row per request", parse_per_request, 1)
+    assert timed("scan pre-parsed intervals", scan_parsed, 3) == expected
+    assert timed("index open_ids (cached segment)", lambda: index.open_ids(m), args.queries) == expected
+
+    start = time.perf_counter()
+    for minute in minutes:
+        catalog.hours().open_ids(minute)
+    print(f"{'index open_ids (random minutes, mostly first use)':<46} "
+          f"{(time.perf_counter() - start) / len(minutes) * 1e3:>10.3f} ms")
+    timed("catalog.sorted_ids(type, open_at)", lambda: catalog.sorted_ids(type='study', open_at=m), args.queries)
+    timed("catalog.page(type, open_at, limit=100)", lambda: catalog.page(None, 100, type='study', open_at=m),
+          args.queries)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Rows/s served by /api/spots/study on a synthetic spot table: the original
+ORM + jsonify listing versus keyset pages, field projection, compression,
+the response cache and conditional GETs answered with 304.
+
+Run from src/Lumora:  python -m benchmarks.bench_spot_listing [spots]
+"""
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+
+from flask import Flask, jsonify
+
+from db import db
+from models import Spot
+from routes.spots import spot_to_dict, spots_bp
+from utils.response_cache import response_cache
+from utils.seeding import upsert_spots
+
+SPOTS = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+NOISE = ('quiet', 'moderate', 'loud')
+
+# --- Throwaway app on a temporary database ---
+tmp = tempfile.mkdtemp()
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+db.init_app(app)
+app.register_blueprint(spots_bp, url_prefix='/api/spots')
+
+with app.app_context():
+    db.create_all()
+    rows = ({'name': f'Spot {i}', 'type': 'study', 'location': f'Campus {i % 50}', 'hours': '8am-10pm',
+             'noise_level': NOISE[i % 3], 'seating': 'tables, couches', 'amenities': 'wifi, outlets',
+             'latitude': 37.0 + i * 1e-5, 'longitude': -122.0} for i in range(SPOTS))
+    upsert_spots(rows, progress=None)
+
+client = app.test_client()
+
+def timed(label, fn):
+    fn()  # Warm the catalog and caches
+    start = time.perf_counter()
+    count, size = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {count / elapsed:>12,.0f} rows/s {size / 1e6:>8.1f} MB")
+
+def orm_listing():
+    # What the endpoint did originally
+    with app.test_request_context():
+        spots = Spot.query.filter_by(type='study').all()
+        body = jsonify([spot_to_dict(s) for s in spots]).get_data()
+    return len(spots), len(body)
+
+def paged(query='', headers=None, limit=1000, cached=False):
+    def run():
+        if not cached:
+            response_cache.clear()  # Measure encoding every page
+        count, size, cursor = 0, 0, None
+        while True:
+            url = f'/api/spots/study?limit={limit}{query}' + (f'&cursor={cursor}' if cursor else '')
+            response = client.get(url, headers=headers or {})
+            body = response.get_data()
+            size += len(body)
+            if response.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+            count += len(json.loads(body))
+            cursor = response.headers.get('X-Next-Cursor')
+            if cursor is None:
+                return count, size
+    return run
+
+def revalidated(limit=1000):
+    # A client polling with the ETags (and rows) it got last time
+    pages, cursor = [], None
+    while True:
+        url = f'/api/spots/study?limit={limit}' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(url)
+        pages.append((url, response.headers['ETag'], len(response.get_json())))
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            break
+
+    def run():
+        count, size = 0, 0
+        for url, etag, rows in pages:
+            response = client.get(url, headers={'If-None-Match': etag})
+            assert response.status_code == 304
+            count += rows
+            size += len(response.get_data())
+        return count, size
+    return run
+
+print(f"{SPOTS} spots")
+timed("ORM query + jsonify (all rows)", orm_listing)
+timed("keyset pages of 1000", paged())
+timed("keyset pages, fields=id,name,location", paged('&fields=id,name,location'))
+timed("keyset pages, gzip", paged(headers={'Accept-Encoding': 'gzip'}))
+timed("keyset pages, response cache hits", paged(cached=True))
+timed("keyset pages, If-None-Match (304)", revalidated())
@@ -0,0 +1,83 @@
+"""
+Startup time: a fresh interpreter imports the app, builds it with
+create_app() and serves its first request. "cold" defers openai/numpy and
+the catalogs to the first request; "warm" runs warm_caches() first, as a
+pre-forking server would in its master process. --save/--compare work
+like benchmarks.load_test.
+
+Run from src/Lumora:  python -m benchmarks.bench_startup [--runs N] [--spots N]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from benchmarks import harness
+
+# Runs in the child interpreter; prints one JSON line of timings
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app(warm=WARM)
+created = time.perf_counter()
+client = app.test_client()
+status = client.get(PATH).status_code
+first = time.perf_counter()
+client.get(PATH)
+second = time.perf_counter()
+print(json.dumps({'import_ms': (imported - start) * 1000, 'create_ms': (created - imported) * 1000,
+                  'first_request_ms': (first - created) * 1000, 'second_request_ms': (second - first) * 1000,
+                  'status': status, 'openai_loaded': 'openai' in sys.modules,
+                  'numpy_loaded': 'numpy' in sys.modules}))
+"""
+
+def run_once(warm, path, env):
+    code = CHILD.replace('WARM', str(warm)).replace('PATH', repr(path))
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True)
+    total = (time.perf_counter() - start) * 1000
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result['total_ms'] = total  # Includes interpreter startup
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--spots', type=int, default=5000)
+    parser.add_argument('--path', default='/api/spots/study?limit=100', help='First request to serve')
+    parser.add_argument('--save')
+    parser.add_argument('--compare')
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    args = parser.parse_args()
+    save = os.path.abspath(args.save) if args.save else None
+    compare = os.path.abspath(args.compare) if args.compare else None
+
+    harness.setup(args.spots, 100, 500, latency_scale=0.0)
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.abspath('bench.db')}",
+               PYTHONPATH=os.pathsep.join(filter(None, [harness.ROOT, os.environ.get('PYTHONPATH')])))
+
+    metrics = ('import_ms', 'create_ms', 'first_request_ms', 'second_request_ms', 'total_ms')
+    results = {}
+    print(f"{args.spots} spots, median of {args.runs} runs, first request {args.path}")
+    print(f"{'mode':<6} " + " ".join(f"{m:>18}" for m in metrics) + "  heavy modules after first request")
+    for mode in ('cold', 'warm'):
+        runs = [run_once(mode == 'warm', args.path, env) for _ in range(args.runs)]
+        results[mode] = {m: round(float(np.median([r[m] for r in runs])), 1) for m in metrics}
+        loaded = [name for name in ('openai', 'numpy') if runs[-1][f'{name}_loaded']]
+        print(f"{mode:<6} " + " ".join(f"{results[mode][m]:>18,.1f}" for m in metrics)
+              + f"  {', '.join(loaded) or 'none'} (status {runs[-1]['status']})")
+
+    if save:
+        harness.save_results(save, results)
+    if compare:
+        if harness.compare_results(results, compare, {m: False for m in metrics}, args.tolerance):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""
+Local stand-in for the OpenAI API, for benchmarks and load tests that must
+not reach the real service. Serves /v1/chat/completions (including
+streaming) and /v1/embeddings with log-normally distributed latencies.
+
+Run standalone:  python -m benchmarks.fake_openai [--port 8765]
+then start the app with OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake
+"""
+import argparse
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+EMBEDDING_DIM = 1536
+
+# Latency model: median seconds and log-normal sigma per endpoint
+DEFAULT_LATENCY = {
+    'chat_median': 0.6, 'chat_sigma': 0.5,  # Time to a complete (non-streamed) answer
+    'first_token_median': 0.25, 'first_token_sigma': 0.4,  # Streaming: time to the first chunk
+    'token_interval': 0.015,  # Streaming: seconds between chunks
+    'embed_median': 0.12, 'embed_sigma': 0.35,
+}
+
+ANSWER = ("Break the problem into smaller steps, check each step against what you already know, "
+          "and write down why every step follows from the last one before moving on.")
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+# --- Deterministic embeddings (texts sharing words get similar vectors) ---
+def _word_vector(word):
+    seed = int.from_bytes(hashlib.sha1(word.encode('utf-8')).digest()[:8], 'little')
+    return np.random.default_rng(seed).standard_normal(EMBEDDING_DIM).astype(np.float32)
+
+def fake_embedding(text):
+    words = _TOKEN_RE.findall(text.lower()) or ['']
+    vector = np.sum([_word_vector(w) for w in words], axis=0)
+    return vector / (np.linalg.norm(vector) or 1.0)
+
+# --- Canned chat answers shaped like what each call site expects ---
+def fake_answer(messages, params):
+    prompt = "\n".join(str(m.get('content', '')) for m in messages)
+    ids = re.findall(r'"id": "(\d+)"', prompt)
+    if ids:  # Batch categorization
+        return json.dumps({i: 'park' for i in ids})
+    if 'JSON object' in prompt or params.get('response_format'):
+        if re.search(r'basketball|tennis|swim|park|hiking', prompt.split('User')[-1], re.I):
+            return json.dumps({'type': 'recreation', 'activity': 'basketball'})
+        return json.dumps({'type': 'study', 'noise_level': 'quiet'})
+    if 'Return only the activity name' in prompt:
+        return 'park'
+    return ANSWER
+
+class FakeOpenAI(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=None, error_rate=0.0, seed=0):
+        super().__init__(address, Handler)
+        self.latency = dict(DEFAULT_LATENCY, **(latency or {}))
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = {'chat': 0, 'chat_stream': 0, 'embeddings': 0, 'errors': 0}
+
+    def sample(self, name):
+        with self.lock:
+            z = self.rng.gauss(0.0, 1.0)
+        return self.latency[f'{name}_median'] * math.exp(self.latency[f'{name}_sigma'] * z)
+
+    def count(self, kind):
+        with self.lock:
+            self.requests[kind] += 1
+
+    def fail(self):
+        with self.lock:
+            return self.rng.random() < self.error_rate
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        server = self.server
+        if server.fail():
+            server.count('errors')
+            self.send_json(429, {'error': {'message': 'Rate limit (fake)', 'type': 'rate_limit'}},
+                           {'Retry-After': '0'})
+            return
+        if self.path.endswith('/embeddings'):
+            self.embeddings(request)
+        elif self.path.endswith('/chat/completions'):
+            self.chat(request)
+        else:
+            self.send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+
+    def embeddings(self, request):
+        self.server.count('embeddings')
+        texts = request.get('input')
+        texts = [texts] if isinstance(texts, str) else texts
+        time.sleep(self.server.sample('embed'))
+        data = []
+        for i, text in enumerate(texts):
+            vector = fake_embedding(text)
+            if request.get('encoding_format') == 'base64':
+                embedding = base64.b64encode(vector.astype(np.float32).tobytes()).decode('ascii')
+            else:
+                embedding = vector.tolist()
+            data.append({'object': 'embedding', 'index': i, 'embedding': embedding})
+        tokens = sum(len(t.split()) for t in texts)
+        self.send_json(200, {'object': 'list', 'data': data, 'model': request.get('model'),
+                             'usage': {'prompt_tokens': tokens, 'total_tokens': tokens}})
+
+    def chat(self, request):
+        messages = request.get('messages', [])
+        params = {k: v for k, v in request.items() if k not in ('messages', 'model', 'stream')}
+        content = fake_answer(messages, params)
+        prompt_tokens = sum(len(str(m.get('content', '')).split()) for m in messages)
+        completion_tokens = len(content.split())
+        created = int(time.time())
+        if not request.get('stream'):
+            self.server.count('chat')
+            time.sleep(self.server.sample('chat'))
+            self.send_json(200, {
+                'id': 'chatcmpl-fake', 'object': 'chat.completion', 'created': created,
+                'model': request.get('model'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content},
+                             'finish_reason': 'stop'}],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                          'total_tokens': prompt_tokens + completion_tokens},
+            })
+            return
+        self.server.count('chat_stream')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        def event(delta, finish=None):
+            chunk = {'id': 'chatcmpl-fake', 'object': 'chat.completion.chunk', 'created': created,
+                     'model': request.get('model'),
+                     'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        try:
+            time.sleep(self.server.sample('first_token'))
+            event({'role': 'assistant', 'content': ''})
+            for word in re.findall(r'\S+\s*', content):
+                event({'content': word})
+                time.sleep(self.server.latency['token_interval'])
+            event({}, 'stop')
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client cancelled the stream
+
+def start(port=0, latency=None, error_rate=0.0):
+    """
+    Run a fake server on a background thread; returns it (see .base_url).
+    """
+    server = FakeOpenAI(('127.0.0.1', port), latency=latency, error_rate=error_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local fake OpenAI API")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with 429')
+    for name, value in DEFAULT_LATENCY.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=float, default=value)
+    args = parser.parse_args()
+    latency = {name: getattr(args, name) for name in DEFAULT_LATENCY}
+    server = FakeOpenAI(('127.0.0.1', args.port), latency=latency, error_rate=args.error_rate)
+    print(f"Fake OpenAI listening on {server.base_url}")
+    server.serve_forever()
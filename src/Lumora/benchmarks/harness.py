@@ -0,0 +1,114 @@
+"""
+Shared setup for the offline benchmarks: a throwaway working directory and
+database, synthetic users/spots/sessions, and the fake OpenAI server.
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks import fake_openai
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # src/Lumora
+
+SUBJECTS = ['calculus', 'algebra', 'physics', 'chemistry', 'biology', 'history', 'english', 'spanish',
+            'economics', 'computer science']
+TOPICS = ['derivatives', 'integrals', 'kinematics', 'stoichiometry', 'genetics', 'world war', 'essays',
+          'vocabulary', 'supply and demand', 'recursion', 'limits', 'cells']
+NOISE = ['quiet', 'very quiet', 'moderate', 'loud']
+ACTIVITIES = ['basketball', 'tennis', 'swimming', 'park', 'gym', 'running', 'soccer']
+AMENITIES = ['wifi', 'wifi, outlets', 'coffee, wifi', 'outlets', 'restrooms, water']
+HOURS = ['8am-9pm', '7am-10pm', 'Mon-Fri 8am-6pm; Sat 10am-4pm', '24/7', 'Mon-Sat 6pm-2am', '6am-10pm',
+         'Mon-Thu 9am-9pm, Fri 9am-5pm, Sat-Sun 11am-5pm', None]
+
+def setup(spots=2000, users=200, sessions=1000, latency_scale=1.0, error_rate=0.0, seed=1):
+    """
+    Move into a temporary directory (so caches, indexes and uploads land
+    there), start a fake OpenAI server and point the client at it, then
+    build the app on a fresh SQLite database with synthetic data.
+    Returns (app, fake_server).
+    """
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)  # App modules stay importable after the chdir
+    os.chdir(tempfile.mkdtemp(prefix='lumora-bench-'))
+    latency = {k: v * latency_scale for k, v in fake_openai.DEFAULT_LATENCY.items() if not k.endswith('_sigma')}
+    server = fake_openai.start(latency=latency, error_rate=error_rate)
+    os.environ['OPENAI_BASE_URL'] = server.base_url
+    os.environ['OPENAI_API_KEY'] = 'fake'
+
+    from app import create_app
+    from db import db
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.abspath('bench.db')}"})
+    with app.app_context():
+        db.create_all()
+        seed_data(spots, users, sessions, seed)
+    return app, server
+
+def seed_data(spots, users, sessions, seed=1):
+    """
+    Insert synthetic rows with bulk core inserts. Must run inside an app context.
+    """
+    from db import db
+    from models import SessionMember, StudySession, User
+    from utils.seeding import upsert_spots
+
+    rng = random.Random(seed)
+    rows = []
+    for i in range(spots):
+        study = rng.random() < 0.6
+        rows.append({'name': f'Spot {i}', 'type': 'study' if study else 'recreation',
+                     'location': f'{i} Main St, {rng.choice(["Milpitas", "San Jose", "Santa Clara"])}, CA',
+                     'activity': None if study else rng.choice(ACTIVITIES), 'hours': rng.choice(HOURS),
+                     'noise_level': rng.choice(NOISE) if study else None, 'seating': 'tables',
+                     'amenities': rng.choice(AMENITIES), 'latitude': rng.uniform(37.2, 37.5),
+                     'longitude': rng.uniform(-122.0, -121.8)})
+    upsert_spots(rows, progress=None)
+    db.session.execute(User.__table__.insert(), [
+        {'id': i, 'username': f'user{i}', 'password': 'pass', 'preferences': {'subjects': [rng.choice(SUBJECTS)]}}
+        for i in range(1, users + 1)])
+    session_rows, member_rows = [], []
+    for i in range(1, sessions + 1):
+        owner = rng.randint(1, users)
+        session_rows.append({'id': i, 'subject': f'{rng.choice(SUBJECTS)} {rng.choice(TOPICS)}',
+                             'spot_id': rng.randint(1, spots), 'user_id': owner, 'member_count': 1})
+        member_rows.append({'session_id': i, 'user_id': owner, 'joined_at': time.time()})
+    if session_rows:
+        db.session.execute(StudySession.__table__.insert(), session_rows)
+        db.session.execute(SessionMember.__table__.insert(), member_rows)
+    db.session.commit()
+
+# --- Baselines ---
+def save_results(path, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"Saved results to {path}")
+
+def compare_results(results, path, metrics, tolerance=0.10):
+    """
+    Print each metric's change against a saved baseline. metrics maps a
+    metric name to True if higher is better. Returns the regressions beyond
+    tolerance as (name, metric, old, new) tuples.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = []
+    print(f"\nCompared with {path} (tolerance {tolerance:.0%}):")
+    for name, current in results.items():
+        old = baseline.get(name)
+        if not isinstance(current, dict) or not isinstance(old, dict):
+            continue
+        changes = []
+        for metric, higher_is_better in metrics.items():
+            if not old.get(metric) or current.get(metric) is None:
+                continue
+            change = (current[metric] - old[metric]) / old[metric]
+            worse = -change if higher_is_better else change
+            flag = ' !' if worse > tolerance else ''
+            if flag:
+                regressions.append((name, metric, old[metric], current[metric]))
+            changes.append(f"{metric} {change:+.1%}{flag}")
+        print(f"  {name:<28} " + ", ".join(changes))
+    return regressions
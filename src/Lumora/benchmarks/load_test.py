@@ -0,0 +1,177 @@
+"""
+Concurrent load test of every /api/* route against an in-process server
+backed by the fake OpenAI API (or against --url). Reports throughput and
+p50/p95/p99 latency per route; --save writes a baseline and --compare
+checks a run against one (exit status 1 on regressions).
+
+Run from src/Lumora:
+    python -m benchmarks.load_test --duration 10 --concurrency 16 --save baseline.json
+    python -m benchmarks.load_test --compare baseline.json
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from benchmarks import harness
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\0' * 2048  # Uploads only check the signature before storing
+
+def routes(users, sessions, rng):
+    """
+    (name, method, path, body or None, headers) factories for every /api/* route and /metrics.
+    """
+    def user():
+        return rng.randint(1, users)
+
+    def session():
+        return rng.randint(1, sessions)
+
+    query = lambda: rng.choice(['quiet place to study with wifi', 'how do I solve quadratic equations',
+                                'where can I play basketball', 'explain photosynthesis'])
+    json_headers = {'Content-Type': 'application/json'}
+    return {
+        'spots_study': lambda: ('GET', '/api/spots/study?noise_level=quiet&limit=100', None, {}),
+        'spots_recreation': lambda: ('GET', '/api/spots/recreation?activity=basketball', None, {}),
+        'spots_search': lambda: ('GET', f"/api/spots/search?q={rng.choice(['wifi', 'coffee', 'outlets'])}", None, {}),
+        'spots_nearby': lambda: ('GET', '/api/spots/nearby?lat=37.35&lon=-121.9&radius_km=3', None, {}),
+        'auth_signup': lambda: ('POST', '/api/auth/signup', {'username': f'load{rng.getrandbits(48)}',
+                                                           'password': 'pass'}, json_headers),
+        'auth_login': lambda: ('POST', '/api/auth/login', {'username': f'user{user()}', 'password': 'pass'},
+                               json_headers),
+        'auth_logout': lambda: ('POST', '/api/auth/logout', None, {}),
+        'sessions_create': lambda: ('POST', '/api/sessions/', {'subject': f'{rng.choice(harness.SUBJECTS)} review',
+                                                               'spot_id': 1, 'user_id': user()}, json_headers),
+        'sessions_join': lambda: ('POST', '/api/sessions/join', {'session_id': session(), 'user_id': user()},
+                                  json_headers),
+        'sessions_members': lambda: ('GET', f'/api/sessions/{session()}/members', None, {}),
+        'sessions_user': lambda: ('GET', f'/api/sessions/user/{user()}', None, {}),
+        'recommend': lambda: ('POST', '/api/recommend/', {'query': query()}, json_headers),
+        'recommend_stream': lambda: ('POST', '/api/recommend/', {'query': query(), 'stream': True}, json_headers),
+        'recommend_upload': lambda: ('POST', '/api/recommend/upload', PNG + os.urandom(16),
+                                     {'Content-Type': 'image/png'}),
+        'cache_stats': lambda: ('GET', '/api/recommend/cache/stats', None, {}),
+        'router_stats': lambda: ('GET', '/api/recommend/router/stats', None, {}),
+        'metrics': lambda: ('GET', '/metrics', None, {}),
+    }
+
+def worker(base, factories, names, deadline, samples, rng):
+    parts = urlsplit(base)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=60)
+    while time.perf_counter() < deadline:
+        name = rng.choice(names)
+        method, path, body, headers = factories[name]()
+        if isinstance(body, dict):
+            body = json.dumps(body)
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            ok = response.status < 500
+            if response.getheader('Connection', '').lower() == 'close':
+                conn.close()
+        except (OSError, http.client.HTTPException):
+            ok = False
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=60)
+        samples.append((name, time.perf_counter() - start, ok))
+    conn.close()
+
+def run(base, factories, names, duration, concurrency, seed):
+    samples = []  # list.append is atomic, so threads share it without a lock
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=worker, args=(base, factories, names, deadline, samples,
+                                                     random.Random(seed + i)))
+               for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    results = {}
+    for name in names:
+        latencies = np.array([s[1] for s in samples if s[0] == name])
+        if not len(latencies):
+            continue
+        errors = sum(1 for s in samples if s[0] == name and not s[2])
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+        results[name] = {'requests': len(latencies), 'errors': errors, 'rps': round(len(latencies) / elapsed, 1),
+                         'p50_ms': round(p50, 2), 'p95_ms': round(p95, 2), 'p99_ms': round(p99, 2)}
+    all_latencies = np.array([s[1] for s in samples]) * 1000
+    results['_total'] = {'requests': len(samples), 'errors': sum(1 for s in samples if not s[2]),
+                         'rps': round(len(samples) / elapsed, 1),
+                         'p50_ms': round(float(np.percentile(all_latencies, 50)), 2),
+                         'p95_ms': round(float(np.percentile(all_latencies, 95)), 2),
+                         'p99_ms': round(float(np.percentile(all_latencies, 99)), 2)}
+    return results
+
+def report(results):
+    print(f"{'route':<20} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, r in results.items():
+        print(f"{name:<20} {r['requests']:>9} {r['errors']:>7} {r['rps']:>9.1f} "
+              f"{r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the /api/* routes")
+    parser.add_argument('--url', help='Target a running server instead of an in-process one')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run')
+    parser.add_argument('--concurrency', type=int, default=16, help='Client threads')
+    parser.add_argument('--routes', help='Comma-separated route names (default: all)')
+    parser.add_argument('--spots', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('--latency-scale', type=float, default=1.0, help='Multiply fake OpenAI latencies')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of fake OpenAI calls that get 429')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', help='Write results to this JSON file')
+    parser.add_argument('--compare', help='Compare against a saved JSON baseline')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Allowed regression before failing')
+    args = parser.parse_args()
+    # The in-process setup changes directory, so resolve paths first
+    args.save = os.path.abspath(args.save) if args.save else None
+    args.compare = os.path.abspath(args.compare) if args.compare else None
+
+    if args.url:
+        base = args.url.rstrip('/')
+    else:
+        import logging
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)  # No per-request access log
+        app, fake = harness.setup(args.spots, args.users, args.sessions, args.latency_scale, args.error_rate,
+                                  args.seed)
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_port}"
+
+    factories = routes(args.users, args.sessions, random.Random(args.seed))
+    names = args.routes.split(',') if args.routes else list(factories)
+    unknown = set(names) - set(factories)
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+
+    print(f"{base}: {args.concurrency} clients for {args.duration:.0f}s")
+    results = run(base, factories, names, args.duration, args.concurrency, args.seed)
+    report(results)
+    if not args.url:
+        print(f"fake OpenAI requests: {fake.requests}")
+    if args.save:
+        harness.save_results(args.save, results)
+    if args.compare:
+        regressions = harness.compare_results(
+            results, args.compare, {'rps': True, 'p50_ms': False, 'p95_ms': False, 'p99_ms': False},
+            args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
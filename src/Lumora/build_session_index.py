@@ -0,0 +1,10 @@
+from app import create_app  # Flask app factory
+from utils.ai_utils import rebuild_session_index  # Session index rebuild helper
+from utils.ann_index import session_index  # Shared ANN index
+
+app = create_app()
+
+# Run periodically (e.g. nightly) to pick up deleted sessions and compact the index
+with app.app_context():
+    count = rebuild_session_index()
+    print(f"Indexed {count} study sessions (ANN {'on' if session_index.is_trained() else 'off'}).")
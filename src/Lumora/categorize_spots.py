@@ -0,0 +1,23 @@
+import argparse  # Command-line options
+from app import create_app  # Flask app factory
+from db import db  # Import database instance
+import models  # Register every model's table with SQLAlchemy
+from utils.batch_categorize import (BATCH_SIZE, CONCURRENCY, REQUESTS_PER_MINUTE,
+                                    categorize_spots, spots_to_categorize)
+
+app = create_app()
+
+parser = argparse.ArgumentParser(description="Label recreation spots' activity in bulk with OpenAI.")
+parser.add_argument('--all', action='store_true', help="re-check labeled spots too (unchanged ones hit the cache)")
+parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+parser.add_argument('--rpm', type=int, default=REQUESTS_PER_MINUTE, help="max requests per minute")
+args = parser.parse_args()
+
+with app.app_context():
+    db.create_all()  # Creates the label cache table on older databases
+    spots = spots_to_categorize(include_labeled=args.all)
+    print(f"Categorizing {len(spots)} recreation spots...")
+    stats = categorize_spots(spots, batch_size=args.batch_size, concurrency=args.concurrency,
+                             requests_per_minute=args.rpm)
+    print(f"Done: {stats}")
@@ -3,5 +3,19 @@ import os  # For environment variables
 # --- Configuration class for Flask app ---
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'devkey')  # Secret key for sessions
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///app.db'  # SQLite database URI
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///app.db')  # Any SQLAlchemy URL
     SQLALCHEMY_TRACK_MODIFICATIONS = False  # Disable modification tracking
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')  # Optional read replica for /api/spots
+
+    # Connection pool (SQLite file databases use the size/overflow/timeout only)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # Reconnect before servers drop idle links
+
+    # SQLite pragmas, applied to every new connection
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')  # Readers don't block the writer
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')  # Safe with WAL, far fewer fsyncs
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))  # Wait for locks, don't fail
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # Bytes read via mmap
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024))  # Page cache per connection
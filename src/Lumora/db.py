@@ -1,3 +1,108 @@
+import sqlite3
+
+from flask import g, has_request_context
 from flask_sqlalchemy import SQLAlchemy  # Import SQLAlchemy extension
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 
 db = SQLAlchemy()  # Create SQLAlchemy database instance
+
+REPLICA = 'replica'  # Bind key of the optional read replica
+JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SYNCHRONOUS_LEVELS = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+
+# --- Engine options per backend ---
+def engine_options(url, config):
+    """
+    Pool settings for a database URL. In-memory SQLite keeps Flask-SQLAlchemy's
+    single static connection; file SQLite gets a sized pool but no pre-ping
+    (a local file can't drop the connection); network databases also get
+    pre-ping and recycling so stale connections are replaced, not reported.
+    """
+    url = make_url(url)
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            return {}
+        return {'pool_size': config['DB_POOL_SIZE'], 'max_overflow': config['DB_MAX_OVERFLOW'],
+                'pool_timeout': config['DB_POOL_TIMEOUT'], 'pool_pre_ping': False,
+                'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}
+    return {'pool_size': config['DB_POOL_SIZE'], 'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'], 'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': True}
+
+def _normalize_url(url):
+    # Heroku-style postgres:// URLs are not accepted by SQLAlchemy 1.4+
+    return 'postgresql://' + url[len('postgres://'):] if url.startswith('postgres://') else url
+
+# --- SQLite pragmas ---
+def sqlite_pragmas(config):
+    """
+    PRAGMA statements run on each new SQLite connection.
+    """
+    journal_mode = config['SQLITE_JOURNAL_MODE'].upper()
+    synchronous = config['SQLITE_SYNCHRONOUS'].upper()
+    if journal_mode not in JOURNAL_MODES:
+        raise ValueError(f"SQLITE_JOURNAL_MODE must be one of {sorted(JOURNAL_MODES)}")
+    if synchronous not in SYNCHRONOUS_LEVELS:
+        raise ValueError(f"SQLITE_SYNCHRONOUS must be one of {sorted(SYNCHRONOUS_LEVELS)}")
+    return [f"PRAGMA journal_mode={journal_mode}",
+            f"PRAGMA synchronous={synchronous}",
+            f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+            f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+            f"PRAGMA cache_size=-{int(config['SQLITE_CACHE_SIZE_KB'])}",
+            "PRAGMA temp_store=MEMORY"]
+
+def _listen_for_pragmas(engine, pragmas):
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                try:
+                    cursor.execute(pragma)
+                except sqlite3.OperationalError as e:  # e.g. journal_mode on a read-only replica
+                    print(f"SQLite pragma skipped ({pragma}): {e}")
+        finally:
+            cursor.close()
+
+# --- Flask setup ---
+def setup_database(app):
+    """
+    Configure pooling (and the read replica bind, if DATABASE_REPLICA_URL is
+    set) from the app config, initialize Flask-SQLAlchemy and install the
+    SQLite pragmas on every SQLite engine.
+    """
+    config = app.config
+    config['SQLALCHEMY_DATABASE_URI'] = _normalize_url(config['SQLALCHEMY_DATABASE_URI'])
+    options = engine_options(config['SQLALCHEMY_DATABASE_URI'], config)
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(options, **config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    replica = config.get('DATABASE_REPLICA_URL')
+    if replica:
+        replica = _normalize_url(replica)
+        config.setdefault('SQLALCHEMY_BINDS', {})[REPLICA] = dict(engine_options(replica, config), url=replica)
+    db.init_app(app)
+
+    pragmas = sqlite_pragmas(config)
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                _listen_for_pragmas(engine, pragmas)
+
+# --- Read replica routing ---
+def use_replica():
+    """
+    before_request hook: send this request's read_bind() queries to the
+    replica. Only register it on routes that never write.
+    """
+    g.use_replica = True
+
+def read_bind():
+    """
+    bind_arguments for a read-only query: the replica engine when the current
+    request opted in and a replica is configured, otherwise None (primary).
+    """
+    if has_request_context() and g.get('use_replica'):
+        engine = db.engines.get(REPLICA)
+        if engine is not None:
+            return {'bind': engine}
+    return None
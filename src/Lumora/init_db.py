@@ -1,32 +1,37 @@
-from app import app
+from app import create_app
 from db import db
-from models import Spot
+import models
+from utils.migrations import run_migrations
+from utils.seeding import normalize_spot, upsert_spots
+
+app = create_app()
 
 with app.app_context():
     db.create_all()
-    # Add sample study spot
-    spot1 = Spot(
-        name='Quiet Coffee House',
-        type='study',
-        location='Downtown',
-        activity=None,
-        hours='8am-8pm',
-        noise_level='quiet',
-        seating='tables, couches',
-        amenities='coffee, wifi'
-    )
-    # Add sample recreation spot
-    spot2 = Spot(
-        name='Central Park Basketball Court',
-        type='recreation',
-        location='Central Park',
-        activity='basketball',
-        hours='6am-10pm',
-        noise_level='outdoor',
-        seating='benches',
-        amenities='basketball, water fountain'
-    )
-    db.session.add(spot1)
-    db.session.add(spot2)
-    db.session.commit()
+    run_migrations(db.engine)
+    sample_spots = [
+        # Sample study spot
+        {
+            'name': 'Quiet Coffee House',
+            'type': 'study',
+            'location': 'Downtown',
+            'activity': None,
+            'hours': '8am-8pm',
+            'noise_level': 'quiet',
+            'seating': 'tables, couches',
+            'amenities': 'coffee, wifi'
+        },
+        # Sample recreation spot
+        {
+            'name': 'Central Park Basketball Court',
+            'type': 'recreation',
+            'location': 'Central Park',
+            'activity': 'basketball',
+            'hours': '6am-10pm',
+            'noise_level': 'outdoor',
+            'seating': 'benches',
+            'amenities': 'basketball, water fountain'
+        },
+    ]
+    upsert_spots((normalize_spot(spot) for spot in sample_spots), progress=None)
     print('Database initialized and sample spots added.')
@@ -0,0 +1,11 @@
+from app import create_app  # Flask app factory
+from db import db  # Import database instance
+import models  # Register every model's table with SQLAlchemy
+from utils.migrations import run_migrations  # Schema migrations
+
+app = create_app()
+
+with app.app_context():
+    db.create_all()  # Create any missing tables
+    applied = run_migrations(db.engine)  # Upgrade existing tables
+    print(f"Applied migrations: {', '.join(applied) or 'none (up to date)'}")
@@ -1,5 +1,8 @@
 from db import db  # SQLAlchemy database instance
 from flask_login import UserMixin  # For user authentication
+from sqlalchemy import event  # ORM events for catalog versioning
+from sqlalchemy.orm import Session
+from utils.opening_hours import encode_hours  # Hours text -> stored weekly intervals
 
 # --- User model ---
 class User(db.Model, UserMixin):
@@ -16,9 +19,18 @@ class Spot(db.Model):
     location = db.Column(db.String(120), nullable=False)  # Address or location
     activity = db.Column(db.String(50))  # Activity type (for recreation)
     hours = db.Column(db.String(50))  # Opening hours
+    open_intervals = db.Column(db.Text)  # Parsed hours as minute-of-week ranges (see utils.opening_hours)
     noise_level = db.Column(db.String(20))  # Noise level (for study spots)
     seating = db.Column(db.String(50))  # Seating info
     amenities = db.Column(db.String(120))  # Amenities available
+    latitude = db.Column(db.Float)  # Optional coordinates (degrees)
+    longitude = db.Column(db.Float)
+
+    __table_args__ = (
+        db.Index('uq_spot_name_location', 'name', 'location', unique=True),  # Natural key for upserts
+        # Listings filter the in-memory catalog; batch categorization still queries unlabeled recreation spots
+        db.Index('ix_spot_type_activity', 'type', 'activity'),
+    )
 
 # --- StudySession model ---
 class StudySession(db.Model):
@@ -26,4 +38,59 @@ class StudySession(db.Model):
     subject = db.Column(db.String(120), nullable=False)  # Study subject
     spot_id = db.Column(db.Integer, db.ForeignKey('spot.id'))  # Linked spot
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))  # Creator user
-    joined_users = db.Column(db.JSON)  # List of joined users (JSON)
+    joined_users = db.Column(db.JSON)  # Legacy member list; migrated into SessionMember
+    member_count = db.Column(db.Integer, nullable=False, default=0)  # Maintained with SessionMember rows
+    capacity = db.Column(db.Integer)  # Maximum members (None = unlimited)
+
+# --- Session membership (one row per user in a session) ---
+class SessionMember(db.Model):
+    session_id = db.Column(db.Integer, db.ForeignKey('study_session.id'), primary_key=True)  # Session -> users
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    joined_at = db.Column(db.Float, nullable=False)  # Unix time
+
+    __table_args__ = (
+        db.Index('ix_session_member_user_id', 'user_id', 'session_id'),  # User -> sessions
+    )
+
+# --- Cached activity labels, keyed by a hash of the spot's name and description ---
+class SpotCategory(db.Model):
+    content_hash = db.Column(db.String(40), primary_key=True)  # sha1 of name + description
+    activity = db.Column(db.String(50), nullable=False)  # Activity label from the LLM
+
+# --- Catalog version (bumped on every Spot write) ---
+class CatalogVersion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)  # Always 1
+    version = db.Column(db.Integer, nullable=False, default=0)  # Increases on every Spot change
+
+def bump_catalog_version(connection):
+    """
+    Increment the catalog version on the given connection (inside the
+    caller's transaction). Call this after writes on a raw connection,
+    which skip the session hooks below.
+    """
+    table = CatalogVersion.__table__
+    result = connection.execute(table.update().where(table.c.id == 1).values(version=table.c.version + 1))
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(id=1, version=1))
+
+@event.listens_for(Spot.hours, 'set')
+def _parse_spot_hours(spot, value, oldvalue, initiator):
+    # Keep the parsed schedule in step with the hours text on every ORM write
+    spot.open_intervals = encode_hours(value)
+
+@event.listens_for(Session, 'before_flush')
+def _bump_on_spot_write(session, flush_context, instances):
+    # Any added, changed or deleted Spot invalidates cached catalogs in every process
+    changed = [o for o in session.new | session.deleted if isinstance(o, Spot)]
+    changed += [o for o in session.dirty if isinstance(o, Spot) and session.is_modified(o)]
+    if changed:
+        bump_catalog_version(session.connection())
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bump_on_spot_statement(state):
+    # Bulk INSERT/UPDATE/DELETE through the session (seeding, batch categorize) skip the flush hook
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    table = getattr(state.statement, 'table', None)
+    if table is not None and table.name == Spot.__table__.name:
+        bump_catalog_version(state.session.connection())
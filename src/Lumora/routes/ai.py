@@ -1,50 +1,149 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, send_file, stream_with_context, url_for
+import json
 import os
-from werkzeug.utils import secure_filename
-from utils.ai_utils import parse_query, recommend_spots
+import re
+from db import db
+from models import User
+from utils.ai_utils import parse_query, recommend_spots, chat_completion, stream_chat_completion
+from utils.admission import Overloaded, limiter
+from utils.llm_cache import llm_cache
+from utils.intent_router import intent_router
+from utils.uploads import (MAX_UPLOAD_BYTES, VARIANTS, UnsupportedImage, UploadTooLarge,
+                           derived_assets, derived_path, find_object, store_stream)
 
 ai_bp = Blueprint('ai', __name__)
 
-UPLOAD_FOLDER = 'instance/uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-
-# Ensure upload folder exists
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+FALLBACK_ANSWER = "Sorry, I couldn't answer that question."
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# --- Relay text chunks to the client as Server-Sent Events ---
+def sse_response(chunks):
+    """
+    Stream chunks as "data: {"delta": ...}" events, then a "done" event with
+    the full answer. If the client disconnects, the WSGI server closes this
+    generator, which closes chunks and cancels the upstream request.
+    """
+    def events():
+        parts = []
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                yield f"data: {json.dumps({'delta': chunk})}\n\n"
+            yield f"event: done\ndata: {json.dumps({'answer': ''.join(parts).strip()})}\n\n"
+        except Overloaded as e:
+            yield f"event: error\ndata: {json.dumps({'answer': FALLBACK_ANSWER, 'retry_after': e.retry_after})}\n\n"
+        except Exception as e:
+            print(f"OpenAI error: {e}")
+            yield f"event: error\ndata: {json.dumps({'answer': FALLBACK_ANSWER})}\n\n"
+        finally:
+            chunks.close()
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def wants_stream(data):
+    return bool(data.get('stream')) or request.args.get('stream') == '1' \
+        or request.accept_mimetypes.best == 'text/event-stream'
+
 @ai_bp.route('/', methods=['POST'])
 def recommend():
-    print("recommend endpoint hit")
     data = request.json
     user_query = data.get('query')
-    # Use OpenAI to answer general homework questions
-    import openai
-    import os
-    openai.api_key = os.getenv("OPENAI_API_KEY")
+    messages = [{"role": "user", "content": user_query}]
+    if wants_stream(data):
+        limiter.check('recommend')  # Refuse with 429/503 now rather than after the stream has started
+        return sse_response(stream_chat_completion('recommend', messages))
+    # Use OpenAI to answer general homework questions (repeat questions hit the cache)
     try:
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": user_query}]
-        )
-        answer = response.choices[0].message.content.strip()
+        answer = chat_completion('recommend', messages).strip()
+    except Overloaded:
+        raise  # 429/503 with Retry-After
     except Exception as e:
         print(f"OpenAI error: {e}")
-        answer = "Sorry, I couldn't answer that question."
+        answer = FALLBACK_ANSWER
     return jsonify({"answer": answer})
 
+SPOT_ATTRIBUTES = ('type', 'noise_level', 'amenities', 'activity', 'location', 'open_at', 'open_now', 'lat', 'lon')
+
+@ai_bp.route('/spots', methods=['POST'])
+def recommend_spot_list():
+    # Ranked spots for a free-text query and/or explicit attributes, optionally personalized
+    from utils.spot_ranking import DEFAULT_TOP_K, MAX_TOP_K  # NumPy loads on first use
+    data = request.get_json(silent=True) or {}
+    parsed = parse_query(data['query']) if data.get('query') else {}
+    parsed.update({name: data[name] for name in SPOT_ATTRIBUTES if data.get(name) not in (None, '')})
+    try:
+        k = min(int(data.get('k', DEFAULT_TOP_K)), MAX_TOP_K)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'k must be an integer'}), 400
+    preferences = None
+    if data.get('user_id') is not None:
+        user = db.session.get(User, data['user_id'])
+        if user is None:
+            return jsonify({'error': 'User not found'}), 404
+        preferences = user.preferences
+    return jsonify({'parsed': parsed, 'spots': recommend_spots(parsed, k=k, preferences=preferences)})
+
+@ai_bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    # Hit/miss counters and upstream seconds saved, per call site
+    return jsonify(llm_cache.stats())
+
+@ai_bp.route('/router/stats', methods=['GET'])
+def router_stats():
+    # Messages routed locally versus parsed by the LLM, per intent
+    return jsonify(intent_router.stats())
+
 @ai_bp.route('/upload', methods=['POST'])
 def upload_image():
+    # Refuse oversized bodies before anything is read or spooled
+    request.max_content_length = MAX_UPLOAD_BYTES + 64 * 1024  # Room for multipart headers
+    if request.content_length and request.content_length > request.max_content_length:
+        return jsonify({'error': f'File exceeds {MAX_UPLOAD_BYTES} bytes'}), 413
+    if request.mimetype.startswith('image/') or request.mimetype == 'application/octet-stream':
+        return store_upload(request.stream)  # Raw body: streamed straight to disk
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
     file = request.files['file']
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
-        return jsonify({'message': 'File uploaded successfully', 'filepath': filepath}), 200
+        return store_upload(file.stream)
     else:
         return jsonify({'error': 'Invalid file type'}), 400
+
+def store_upload(stream):
+    """
+    Store an upload by content hash, queue its thumbnails and describe the result.
+    """
+    try:
+        stored = store_stream(stream)
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except UnsupportedImage as e:
+        return jsonify({'error': str(e)}), 400
+    digest = stored['hash']
+    status, assets_job = derived_assets.schedule(digest, stored['path'])
+    assets = {name: url_for('ai.get_upload', digest=digest, variant=name, _external=True)
+              for name in ('original',) + tuple(VARIANTS)}
+    return jsonify({'message': 'File uploaded successfully', 'hash': digest, 'size': stored['size'],
+                    'duplicate': stored['duplicate'], 'filepath': stored['path'],
+                    'assets': assets, 'assets_status': status, 'assets_job': assets_job}), 200
+
+@ai_bp.route('/uploads/<digest>/<variant>', methods=['GET'])
+def get_upload(digest, variant):
+    # Content-addressed, so responses never change and can be cached forever
+    if not re.fullmatch(r'[0-9a-f]{64}', digest) or variant not in ('original',) + tuple(VARIANTS):
+        return jsonify({'error': 'Not found'}), 404
+    original = find_object(digest)
+    if original is None:
+        return jsonify({'error': 'Not found'}), 404
+    path = original if variant == 'original' else derived_path(digest, variant)
+    if os.path.exists(path):
+        return send_file(os.path.abspath(path), max_age=365 * 24 * 3600, etag=digest + variant)
+    status, assets_job = derived_assets.schedule(digest, original)
+    if status == 'unavailable':
+        return jsonify({'error': 'Thumbnails unavailable'}), 404
+    return jsonify({'status': status, 'job': assets_job}), 202, {'Retry-After': '1'}
@@ -0,0 +1,17 @@
+from flask import Blueprint, jsonify
+from utils.jobs import job_queue
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    # Status of a background job (queued, running, done or failed) and its result or last error
+    found = job_queue.get(job_id)
+    if found is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(found)
+
+@jobs_bp.route('/stats', methods=['GET'])
+def job_stats():
+    # Job counts per kind and status
+    return jsonify(job_queue.stats())
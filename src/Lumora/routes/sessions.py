@@ -1,22 +1,62 @@
 from flask import Blueprint, request, jsonify
 from models import db, StudySession
+from utils.ai_utils import index_session, index_session_locally
+from utils.jobs import job_queue
+from utils.membership import add_member, session_members, user_sessions
 
 sessions_bp = Blueprint('sessions', __name__)
 
 @sessions_bp.route('/', methods=['POST'])
 def create_session():
     data = request.json
-    session = StudySession(subject=data['subject'], spot_id=data['spot_id'], user_id=data['user_id'], joined_users=[data['user_id']])
+    capacity = data.get('capacity')
+    if capacity is not None and (not isinstance(capacity, int) or isinstance(capacity, bool) or capacity < 1):
+        return jsonify({'message': 'capacity must be a whole number of at least 1'}), 400
+    session = StudySession(subject=data['subject'], spot_id=data['spot_id'], user_id=data['user_id'],
+                           capacity=capacity)
     db.session.add(session)
+    db.session.flush()
+    outcome = add_member(session.id, data['user_id'])  # The creator is the first member
+    if outcome != 'joined':
+        db.session.rollback()  # Never keep a session without its creator
+        return jsonify({'message': f'Could not add the creator to the session ({outcome})'}), 409
     db.session.commit()
-    return jsonify({'message': 'Session created', 'session_id': session.id})
+    index_session_locally(session)  # Local TF-IDF matching sees it at once, with no table scan
+    # Embed the subject in the background so matching never has to; poll /api/jobs/<id> for progress
+    index_job = None
+    try:
+        index_job = job_queue.enqueue('index_session', {'session_id': session.id},
+                                      key=f'index_session:{session.id}')['id']
+    except Exception as e:
+        print(f"Job queue error: {e}")
+        try:
+            index_session(session)  # No queue: embed inline as before
+        except Exception as e:
+            print(f"Embedding error: {e}")
+    return jsonify({'message': 'Session created', 'session_id': session.id, 'index_job': index_job})
 
 @sessions_bp.route('/join', methods=['POST'])
 def join_session():
     data = request.json
-    session = StudySession.query.get(data['session_id'])
-    if session:
-        session.joined_users.append(data['user_id'])
+    outcome = add_member(data['session_id'], data['user_id'])
+    if outcome == 'joined':
         db.session.commit()
         return jsonify({'message': 'Joined session'})
+    db.session.rollback()
+    if outcome == 'already_joined':
+        return jsonify({'message': 'Already joined'})
+    if outcome == 'full':
+        return jsonify({'message': 'Session is full'}), 409
     return jsonify({'message': 'Session not found'}), 404
+
+@sessions_bp.route('/<int:session_id>/members', methods=['GET'])
+def get_members(session_id):
+    session = db.session.get(StudySession, session_id)
+    if session is None:
+        return jsonify({'message': 'Session not found'}), 404
+    return jsonify({'session_id': session_id, 'member_count': session.member_count,
+                    'capacity': session.capacity, 'members': session_members([session_id])[session_id]})
+
+@sessions_bp.route('/user/<int:user_id>', methods=['GET'])
+def get_user_sessions(user_id):
+    return jsonify({'user_id': user_id, 'session_ids': user_sessions(user_id)})
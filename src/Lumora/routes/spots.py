@@ -1,27 +1,144 @@
+from operator import attrgetter
+from urllib.parse import urlencode
+
 from flask import Blueprint, request, jsonify
-from models import Spot
+from db import use_replica
+from utils.opening_hours import parse_open_at
+from utils.response_cache import cached_response
+from utils.spot_catalog import SpotRecord, db_catalog
+from utils.spot_search import search_spots
 
 spots_bp = Blueprint('spots', __name__)
+spots_bp.before_request(use_replica)  # Every spot route is read-only
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+class BadFilter(ValueError):
+    """
+    A query parameter that cannot be used as a filter (answered with 400).
+    """
+
+@spots_bp.errorhandler(BadFilter)
+def bad_filter(e):
+    return jsonify({'error': str(e)}), 400
+
+def requested_open_at():
+    """
+    Minute of the week to filter on from ?open_at= ("now", "23:00", "sat
+    11pm", ...) or ?open_now=1, or None if neither is given.
+    """
+    value = request.args.get('open_at')
+    if value is None and request.args.get('open_now', '').lower() in ('1', 'true', 'yes'):
+        value = 'now'
+    if value is None:
+        return None
+    minute = parse_open_at(value)
+    if minute is None:
+        raise BadFilter("open_at must be 'now', a time like 23:00 or 11pm, optionally after a day name")
+    return minute
 
 @spots_bp.route('/study', methods=['GET'])
 def get_study_spots():
     filters = request.args
-    query = Spot.query.filter_by(type='study')
-    if 'noise_level' in filters:
-        query = query.filter_by(noise_level=filters['noise_level'])
-    if 'location' in filters:
-        query = query.filter_by(location=filters['location'])
-    spots = query.all()
-    return jsonify([spot_to_dict(s) for s in spots])
+    return list_spots(
+        type='study',
+        noise_level=filters.get('noise_level'),
+        location=filters.get('location'),
+        open_at=requested_open_at(),
+    )
 
 @spots_bp.route('/recreation', methods=['GET'])
 def get_recreation_spots():
     activity = request.args.get('activity')
-    query = Spot.query.filter_by(type='recreation')
-    if activity:
-        query = query.filter_by(activity=activity)
-    spots = query.all()
-    return jsonify([spot_to_dict(s) for s in spots])
+    return list_spots(type='recreation', activity=activity, open_at=requested_open_at())
+
+# --- Paged, projected listing ---
+def list_spots(**filters):
+    """
+    One page of matching spots ordered by id. Query parameters:
+    limit (default 100, max 1000), cursor (from the previous page's
+    X-Next-Cursor header), fields (comma-separated columns to return) and
+    open_at/open_now (only spots open at that time). Pages carry an ETag
+    from the catalog version and are cached until the catalog changes.
+    """
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    cursor = request.args.get('cursor')
+    if cursor is not None and not cursor.isdigit():
+        return jsonify({'error': 'invalid cursor'}), 400
+    fields = parse_fields(request.args.get('fields'))
+    if fields is None:
+        return jsonify({'error': f"fields must be among: {', '.join(SpotRecord.__slots__)}"}), 400
+
+    catalog = db_catalog()
+    filters = catalog.normalized(filters)
+    args = sorted(request.args.items())  # Same page whatever the parameter order
+
+    def build():
+        spots, next_cursor = catalog.page(int(cursor) if cursor else None, limit, **filters)
+        getter = attrgetter(*fields)
+        if len(fields) == 1:
+            rows = [{fields[0]: getter(s)} for s in spots]
+        else:
+            rows = [dict(zip(fields, getter(s))) for s in spots]
+        headers = {}
+        if next_cursor is not None:
+            headers['X-Next-Cursor'] = str(next_cursor)
+            next_args = dict(args, cursor=next_cursor, limit=limit)
+            headers['Link'] = f'<{request.base_url}?{urlencode(next_args)}>; rel="next"'
+        return rows, headers
+
+    # open_now resolves to a different segment as time passes, so key on the snapped filters too
+    key = (request.endpoint, tuple(args), catalog.filter_key(filters))
+    return cached_response(key, catalog.version, build)
+
+def parse_fields(value):
+    """
+    Requested columns in SpotRecord order (all when value is empty), or None
+    if any name is unknown.
+    """
+    requested = {f.strip() for f in (value or '').split(',') if f.strip()}
+    if not requested:
+        return SpotRecord.__slots__
+    if not requested <= set(SpotRecord.__slots__):
+        return None
+    return tuple(f for f in SpotRecord.__slots__ if f in requested)
+
+@spots_bp.route('/search', methods=['GET'])
+def search():
+    # Ranked full-text search over name, amenities, seating and activity
+    q = request.args.get('q', '')
+    spot_type = request.args.get('type')
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    open_at = requested_open_at()
+    catalog = db_catalog()
+    allowed = catalog.ids(type=spot_type, open_at=open_at) if spot_type or open_at is not None else None
+    results = []
+    for spot_id, score in search_spots(q, limit=limit if allowed is None else 10000):
+        if spot_id in catalog.records and (allowed is None or spot_id in allowed):
+            results.append(dict(spot_to_dict(catalog.records[spot_id]), score=score))
+            if len(results) == limit:
+                break
+    return jsonify(results)
+
+@spots_bp.route('/nearby', methods=['GET'])
+def nearby():
+    # k nearest spots within radius_km of lat/lon, with the usual filters
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({'error': 'lat and lon are required'}), 400
+    radius_km = request.args.get('radius_km', 5.0, type=float)
+    k = request.args.get('k', 10, type=int)
+    if not radius_km > 0 or k < 1:  # Also rejects a NaN radius
+        return jsonify({'error': 'k must be at least 1 and radius_km greater than 0'}), 400
+    radius_km, k = min(radius_km, 500.0), min(k, 100)
+    catalog = db_catalog()
+    filters = {f: request.args.get(f) for f in ('type', 'noise_level', 'activity')}
+    open_at = requested_open_at()
+    allowed = catalog.ids(open_at=open_at, **filters) if any(filters.values()) or open_at is not None else None
+    results = catalog.geo().nearest(lat, lon, k=k, radius_km=radius_km, allowed_ids=allowed)
+    return jsonify([dict(spot_to_dict(catalog.records[i]), distance_km=round(d, 3)) for i, d in results])
 
 def spot_to_dict(spot):
     return {
@@ -33,5 +150,7 @@ def spot_to_dict(spot):
         'hours': spot.hours,
         'noise_level': spot.noise_level,
         'seating': spot.seating,
-        'amenities': spot.amenities
+        'amenities': spot.amenities,
+        'latitude': spot.latitude,
+        'longitude': spot.longitude
     }
@@ -1,29 +1,36 @@
-from app import app  # Import Flask app
+import argparse  # Command-line options
+from app import create_app  # Flask app factory
 from db import db  # Import database instance
-from models import Spot  # Import Spot model
-import json  # For reading JSON spot data
+import models  # Register every model's table with SQLAlchemy
+from utils.migrations import run_migrations  # Upgrade existing tables
+from utils.seeding import BATCH_SIZE, READERS, iter_spot_rows, upsert_spots  # Streaming bulk seeder
+from utils.spot_catalog import SPOTS_JSON_PATH  # Default spot data file
+
+app = create_app()
+
+parser = argparse.ArgumentParser(description="Load spots into the database (safe to rerun).")
+parser.add_argument('path', nargs='?', default=SPOTS_JSON_PATH, help="JSON, NDJSON or CSV file of spots")
+parser.add_argument('--format', choices=sorted(READERS), help="input format (default: from the file extension)")
+parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="rows per bulk insert")
+parser.add_argument('--categorize', action='store_true',
+                    help="queue a job to label recreation spots' activity (run by worker.py)")
+parser.add_argument('--categorize-now', action='store_true', help="label recreation spots' activity before exiting")
+args = parser.parse_args()
 
 with app.app_context():  # Run within Flask app context
     db.create_all()  # Create all tables if not exist
-    with open("backend/spots.json", "r") as f:
-        data = json.load(f)  # Load spot data from JSON file
+    run_migrations(db.engine)  # Add columns missing from older databases
+    # Stream rows from the file and upsert them on (name, location)
+    stats = upsert_spots(iter_spot_rows(args.path, args.format), batch_size=args.batch_size)
+    print(f"Seeded spots from {args.path}: {stats}")  # Confirmation message
 
-    # Add study spots to database
-    for spot in data["study_spots"]:
-        db.session.add(Spot(
-            name=spot["name"],
-            location=spot["location"],
-            type="study",
-            noise_level=spot.get("noise_level", "unknown")
-        ))
-    # Add recreation spots to database
-    for spot in data["recreation_spots"]:
-        db.session.add(Spot(
-            name=spot["name"],
-            location=spot["location"],
-            type="recreation",
-            activity=spot.get("activity", "unknown"),
-            amenities=spot.get("amenities", "unknown")
-        ))
-    db.session.commit()  # Save changes to database
-    print("Seeded study and recreation spots from spots.json.")  # Confirmation message
+    # Optionally label recreation spots' activities with the batch categorizer
+    if args.categorize_now:
+        from utils.batch_categorize import categorize_spots, spots_to_categorize
+        stats = categorize_spots(spots_to_categorize())
+        print(f"Categorized recreation spots: {stats}")
+    elif args.categorize:
+        import utils.batch_categorize  # Registers the categorize_spots job
+        from utils.jobs import job_queue
+        queued = job_queue.enqueue('categorize_spots', key='categorize_spots', priority=10)
+        print(f"Queued categorization as job {queued['id']}; run `python worker.py` to process it")
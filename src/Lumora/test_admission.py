@@ -0,0 +1,105 @@
+"""
+LLM admission tests: priority order, the rate limit, the concurrency cap,
+and limits configured when the app is built.
+
+Run from src/Lumora:  python -m pytest -q test_admission.py
+"""
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from utils import admission
+from utils.admission import Limiter, Overloaded, TokenBucket
+
+UNLIMITED = 0  # Bucket rate that admits every start
+
+@pytest.fixture
+def short_waits(monkeypatch):
+    monkeypatch.setitem(admission.MAX_WAIT, 'interactive', 0.1)
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.005)
+
+def test_higher_priority_waiters_are_admitted_first():
+    limiter = Limiter(TokenBucket(UNLIMITED), max_concurrent=1)
+    limiter.acquire('recommend')  # Hold the only slot while the others queue
+    order = []
+
+    def call(site):
+        with limiter.slot(site):
+            order.append(site)
+
+    # Queued lowest priority first; sites map to batch, background and interactive
+    threads = []
+    for n, site in enumerate(['categorize_spot', 'session_index', 'parse_query'], start=1):
+        threads.append(threading.Thread(target=call, args=(site,)))
+        threads[-1].start()
+        wait_until(lambda: sum(limiter.stats()['queued'].values()) == n)
+    limiter.release()
+    for thread in threads:
+        thread.join()
+    assert order == ['parse_query', 'session_index', 'categorize_spot']
+
+def test_bucket_allows_a_burst_then_the_rate():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.take() == 0.0 and bucket.take() == 0.0
+    assert 0.0 < bucket.take() <= 0.1
+
+def test_rate_limit_delays_or_refuses(short_waits):
+    limiter = Limiter(TokenBucket(rate=20, burst=1), max_concurrent=10)
+    limiter.acquire('recommend')
+    assert limiter.acquire('recommend') >= 0.03  # Waited for the next token
+    slow = Limiter(TokenBucket(rate=1, burst=1), max_concurrent=10)
+    slow.acquire('recommend')
+    with pytest.raises(Overloaded) as refused:
+        slow.acquire('recommend')  # The next token is a second away, past the 0.1s deadline
+    assert refused.value.status == 429 and refused.value.retry_after >= 1
+
+def test_concurrency_cap(short_waits):
+    limiter = Limiter(TokenBucket(UNLIMITED), max_concurrent=2)
+    limiter.acquire('recommend')
+    limiter.acquire('recommend')
+    with pytest.raises(Overloaded) as busy:
+        limiter.acquire('recommend')
+    assert busy.value.status == 503 and limiter.stats()['active'] == 2
+    threading.Timer(0.02, limiter.release).start()
+    limiter.acquire('recommend')  # Admitted once a slot frees up
+    assert limiter.stats()['active'] == 2
+
+def test_full_queue_is_refused_at_once():
+    limiter = Limiter(TokenBucket(UNLIMITED), max_concurrent=1, max_queue=0)
+    with pytest.raises(Overloaded) as full:
+        limiter.acquire('recommend')
+    assert full.value.status == 503
+
+@pytest.fixture
+def restore_limiter():
+    limiter = admission.limiter
+    saved = limiter.bucket, limiter.max_concurrent, limiter.max_queue
+    yield limiter
+    limiter.configure(*saved)
+
+def test_limits_are_read_when_the_app_is_built(monkeypatch, restore_limiter):
+    monkeypatch.setenv('LLM_MAX_CONCURRENT', '3')  # Set after import, as .env is
+    monkeypatch.setenv('LLM_RATE_PER_SECOND', '5')
+    app = Flask(__name__)
+    app.config['LLM_MAX_QUEUE'] = 7
+    admission.init_app(app)
+    limiter = restore_limiter
+    assert (limiter.max_concurrent, limiter.max_queue, limiter.bucket.rate) == (3, 7, 5.0)
+
+def test_overloaded_views_answer_with_retry_after(restore_limiter):
+    app = Flask(__name__)
+    admission.init_app(app)
+
+    @app.route('/busy')
+    def busy():
+        raise Overloaded("busy", 503, 2)
+
+    response = app.test_client().get('/busy')
+    assert response.status_code == 503 and response.headers['Retry-After'] == '2'
@@ -1,6 +1,8 @@
-from app import app
+from app import create_app
 from utils.ai_utils import match_study_sessions, categorize_spot
 
+app = create_app()
+
 with app.app_context():
     # Test study session matching
     user_input = {
@@ -0,0 +1,70 @@
+"""
+Batch categorization tests: which spots are picked up, cached labels, and
+two runs storing the same label at once.
+
+Run from src/Lumora:  python -m pytest -q test_batch_categorize.py
+"""
+import pytest
+from flask import Flask
+
+from db import db
+from models import Spot, SpotCategory
+from utils import batch_categorize
+from utils.batch_categorize import categorize_spots, spot_description, spot_hash, spots_to_categorize
+
+@pytest.fixture
+def app(tmp_path):
+    # A file database, so a "concurrent run" can write through its own connection
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'app.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Spot(name=f"Spot {activity!r}", type='recreation', location='North', activity=activity)
+                            for activity in (None, '', 'unknown', 'park')])
+        db.session.add(Spot(name='Library', type='study', location='Campus'))
+        db.session.commit()
+        yield app
+
+def names(spots):
+    return sorted(s.name for s in spots)
+
+def test_unlabeled_spots_are_picked_up(app):
+    assert names(spots_to_categorize()) == ["Spot ''", "Spot 'unknown'", "Spot None"]
+    assert names(spots_to_categorize(include_labeled=True)) == ["Spot ''", "Spot 'park'", "Spot 'unknown'", "Spot None"]
+
+def fake_classifier(calls, label='gym'):
+    def classify_batch(items, model=None):
+        calls.append(len(items))
+        return {key: label for key, _, _ in items}
+    return classify_batch
+
+def test_labels_are_written_and_cached(app, monkeypatch):
+    calls = []
+    monkeypatch.setattr(batch_categorize, 'classify_batch', fake_classifier(calls))
+    stats = categorize_spots(spots_to_categorize(), progress=None)
+    assert (stats['classified'], stats['updated'], stats['failed']) == (3, 3, 0)
+    assert spots_to_categorize() == []
+    assert db.session.query(SpotCategory).count() == 3
+
+    # Relabeling everything reuses the cache and only classifies the new text
+    stats = categorize_spots(spots_to_categorize(include_labeled=True), progress=None)
+    assert (stats['cached'], stats['classified'], stats['updated']) == (3, 1, 1)
+    assert calls == [3, 1]
+
+def test_concurrent_run_storing_the_same_labels(app, monkeypatch):
+    spots = spots_to_categorize()
+    engine = db.engine
+
+    def classify_batch(items, model=None):
+        # Another worker finishes the same spots first and caches their labels
+        with engine.begin() as conn:
+            conn.execute(SpotCategory.__table__.insert(), [{'content_hash': key, 'activity': 'gym'} for key, _, _ in items])
+        return {key: 'gym' for key, _, _ in items}
+
+    monkeypatch.setattr(batch_categorize, 'classify_batch', classify_batch)
+    stats = categorize_spots(spots, progress=None)
+    assert (stats['classified'], stats['updated']) == (3, 3)
+    assert {s.activity for s in Spot.query.filter_by(type='recreation')} == {'gym', 'park'}
+    stored = {row.content_hash for row in SpotCategory.query}
+    assert stored == {spot_hash(s.name, spot_description(s)) for s in spots}
@@ -1,9 +1,11 @@
-from app import app  # Import Flask app
+from app import create_app  # Flask app factory
 from utils.ai_utils import conversation_helper  # Import AI conversation helper
 import os
 from dotenv import load_dotenv  # For loading environment variables
 import openai  # OpenAI API
 
+app = create_app()
+
 load_dotenv()  # Load environment variables from .env
 # openai.api_key = os.environ.get("OPENAI_API_KEY")
 openai.api_key = os.getenv("OPENAI_API_KEY")  # Set OpenAI API key directly
@@ -1,7 +1,10 @@
-from app import app
+from app import create_app
 from db import db
 from models import User, StudySession, Spot
 from utils.ai_utils import match_study_sessions, categorize_spot
+from utils.membership import add_member
+
+app = create_app()
 
 with app.app_context():
     # Add sample users and study sessions
@@ -12,10 +15,13 @@ with app.app_context():
     db.session.add(user2)
     db.session.commit()
 
-    session1 = StudySession(subject='AP Calculus', spot_id=None, user_id=user1.id, joined_users=[user1.id])
-    session2 = StudySession(subject='Physics', spot_id=None, user_id=user2.id, joined_users=[user2.id])
+    session1 = StudySession(subject='AP Calculus', spot_id=None, user_id=user1.id)
+    session2 = StudySession(subject='Physics', spot_id=None, user_id=user2.id)
     db.session.add(session1)
     db.session.add(session2)
+    db.session.flush()
+    add_member(session1.id, user1.id)
+    add_member(session2.id, user2.id)
     db.session.commit()
 
     # Test study session matching
@@ -0,0 +1,77 @@
+"""
+Intent router tests: intents and slots from the vocabulary, confidence,
+misspelling correction, and which messages parse_query answers locally.
+
+Run from src/Lumora:  python -m pytest -q test_intent_router.py
+"""
+import re
+
+import pytest
+
+from utils import ai_utils
+from utils.intent_router import IntentRouter, trie_regex
+
+@pytest.fixture
+def router():
+    return IntentRouter()
+
+@pytest.mark.parametrize('text, intent, slots', [
+    ("quiet library with wifi near downtown", 'study_spot',
+     {'type': 'study', 'noise_level': 'quiet', 'amenities': 'wifi', 'location': 'downtown'}),
+    ("Where can I play basketball?", 'recreation', {'type': 'recreation', 'activity': 'basketball'}),
+    ("How do I solve this calculus equation?", 'study_question', {'subject': 'calculus'}),
+    ("Find a dog park open now", 'recreation', {'type': 'recreation', 'activity': 'dog park', 'open_now': True}),
+    ("any QUIET cafe in San\tJose", 'study_spot', {'type': 'study', 'noise_level': 'quiet', 'location': 'san jose'}),
+    ("somewhere to swim", 'recreation', {'type': 'recreation', 'activity': 'swimming'}),
+])
+def test_confident_routes(router, text, intent, slots):
+    route = router.route(text)
+    assert (route.intent, route.slots) == (intent, slots)
+    assert route.confident
+    assert route.parsed()['type'] == ('recreation' if intent == 'recreation' else 'study')
+
+def test_words_match_whole_words_only(router):
+    route = router.route("a parking garage with a showroom")  # Neither "park" nor "how"
+    assert route.intent is None and route.slots == {}
+
+def test_weak_or_split_evidence_is_not_confident(router):
+    assert not router.route("hello there").confident  # Nothing matched
+    assert not router.route("help").confident  # Below the minimum score
+    mixed = router.route("where can I study or play")
+    assert mixed.intent is not None and not mixed.confident
+    assert mixed.confidence == pytest.approx(mixed.scores[mixed.intent] / sum(mixed.scores.values()))
+
+def test_misspellings_are_corrected_to_vocabulary_words(router):
+    assert router.correct("Quiett libary with wiifi") == "quiet library with wifi"
+    assert router.correct("whre is it") == "whre is it"  # Question words and short words are left alone
+    assert router.route(router.correct("quiett libary")).confident
+
+def test_trie_regex_matches_like_an_alternation():
+    phrases = ["how", "home", "homework", "park", "dog park", "swimming pool", "swim"]
+    trie = re.compile(rf"\b(?:{trie_regex(phrases)})\b")
+    text = "homework at the dog  park, then a swim; how about the swimming pool at home"
+    assert trie.findall(text) == ["homework", "dog  park", "swim", "how", "swimming pool", "home"]
+
+# --- parse_query ---
+@pytest.fixture
+def llm_replies(monkeypatch):
+    prompts = []
+
+    def chat_completion(site, messages, **params):
+        prompts.append(messages[-1]['content'])
+        return '{"type": "recreation", "activity": "chess"}'
+
+    monkeypatch.setattr(ai_utils, 'chat_completion', chat_completion)
+    monkeypatch.setattr(ai_utils, 'intent_router', IntentRouter())
+    return prompts
+
+def test_confident_messages_skip_the_llm(llm_replies):
+    assert ai_utils.parse_query("quiet libary with outlets") == \
+        {'type': 'study', 'noise_level': 'quiet', 'amenities': 'outlets'}
+    assert llm_replies == []
+    assert ai_utils.intent_router.stats()['study_spot'] == {'local': 1, 'fallback': 0, 'local_rate': 1.0}
+
+def test_unrecognized_messages_go_to_the_llm(llm_replies):
+    assert ai_utils.parse_query("somewhere for a chess match") == {'type': 'recreation', 'activity': 'chess'}
+    assert len(llm_replies) == 1 and "chess match" in llm_replies[0]
+    assert ai_utils.intent_router.stats()['unknown']['fallback'] == 1
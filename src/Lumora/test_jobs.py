@@ -0,0 +1,38 @@
+"""
+Job queue tests: leases that expire because a worker died.
+
+Run from src/Lumora:  python -m pytest -q test_jobs.py
+"""
+import pytest
+
+from utils import jobs
+
+@jobs.job('test_noop')
+def noop(payload):
+    return {'ok': True}
+
+@pytest.fixture
+def queue(tmp_path):
+    return jobs.JobQueue(str(tmp_path / 'jobs.sqlite'))
+
+def expire_lease(queue, job_id):
+    queue._conn().execute("UPDATE jobs SET locked_until = 0 WHERE id = ?", (job_id,))
+
+def test_job_that_keeps_killing_its_worker_fails(queue):
+    queued = queue.enqueue('test_noop', max_attempts=2)
+    for worker in ('w1', 'w2'):
+        assert queue.claim(worker)['id'] == queued['id']
+        expire_lease(queue, queued['id'])  # The worker died mid-run
+    assert queue.claim('w3') is None
+    job = queue.get(queued['id'])
+    assert job['status'] == 'failed' and job['attempts'] == 2 and 'Lease expired' in job['error']
+
+def test_stale_lease_holder_cannot_overwrite_the_new_one(queue):
+    queued = queue.enqueue('test_noop')
+    first = queue.claim('slow')
+    expire_lease(queue, queued['id'])
+    assert queue.claim('fast')['id'] == queued['id']
+    assert queue.complete(queued['id'], 'slow', 'stale') is False
+    assert queue.fail(first, 'late error', 'slow') == 'lost'
+    assert queue.complete(queued['id'], 'fast', 'fresh') is True
+    assert queue.get(queued['id'])['result'] == 'fresh'
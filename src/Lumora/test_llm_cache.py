@@ -0,0 +1,68 @@
+"""
+LLM cache tests: keys, the disk tier's least-recently-used eviction, a
+failing tier never failing a lookup, and replies that are not cached.
+
+Run from src/Lumora:  python -m pytest -q test_llm_cache.py
+"""
+import sqlite3
+
+from utils import llm_cache
+from utils.llm_cache import LLMCache, MemoryTier, SQLiteTier
+
+def entry(value, ttl=3600):
+    return (llm_cache.time.time() + ttl, f'"{value}"', 0.5)
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    tier = SQLiteTier(str(tmp_path / 'cache.sqlite'), max_entries=2, purge_every=1000, touch_every=0)
+    tier.set('long_lived_but_idle', entry('a', ttl=10 ** 6))
+    tier.set('short_lived_but_hot', entry('b', ttl=60))
+    assert tier.get('short_lived_but_hot') is not None
+    tier.set('new', entry('c'))
+    tier.get('short_lived_but_hot')
+    tier.purge()
+    assert tier.get('long_lived_but_idle') is None
+    assert tier.get('short_lived_but_hot') is not None and tier.get('new') is not None
+
+def test_cache_file_without_last_used_is_upgraded(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                 "expires_at REAL NOT NULL, latency REAL NOT NULL)")
+    conn.execute("INSERT INTO llm_cache VALUES ('old', '1', ?, 0.1)", (llm_cache.time.time() + 3600,))
+    conn.commit()
+    conn.close()
+    tier = SQLiteTier(path)
+    assert tier.get('old')[1] == '1'
+    tier.set('new', entry('x'))
+    assert tier.get('new')[1] == '"x"'
+
+class BrokenTier(MemoryTier):
+    name = 'broken'
+
+    def set(self, key, entry):
+        raise RuntimeError("tier down")
+
+def test_failed_promotion_still_returns_the_hit(tmp_path):
+    disk = SQLiteTier(str(tmp_path / 'cache.sqlite'))
+    cache = LLMCache([BrokenTier(), disk])
+    messages = [{'role': 'user', 'content': 'hi'}]
+    disk.set(llm_cache.make_key('model', messages), entry('cached'))
+    assert cache.lookup('test', 'model', messages) == 'cached'
+    assert cache.stats()['test']['disk_hits'] == 1
+
+def test_keys_ignore_whitespace_but_not_case():
+    key = lambda content: llm_cache.make_key('model', [{'role': 'user', 'content': content}])
+    assert key("convert  5 MB\n to bytes") == key("convert 5 MB to bytes")
+    assert key("convert 5 MB to bytes") != key("convert 5 mb to bytes")  # Megabytes vs millibits
+    assert key("print(X)") != key("print(x)")
+
+def test_malformed_extraction_replies_are_not_cached(monkeypatch):
+    from utils import ai_utils, openai_client
+    replies = ['not json', '{"type": "recreation"}', 'unused']
+    monkeypatch.setattr(openai_client, 'chat', lambda *args, **kwargs: replies.pop(0))
+    monkeypatch.setattr(ai_utils, 'llm_cache', LLMCache([MemoryTier()]))
+    query = "zzqx plover"  # Nothing the intent router recognizes, so it goes to the model
+    assert ai_utils.parse_query(query) == {'type': 'study'}  # Local fallback
+    assert ai_utils.parse_query(query) == {'type': 'recreation'}  # Asked again, not served the bad reply
+    assert ai_utils.parse_query(query) == {'type': 'recreation'}  # Now cached
+    assert replies == ['unused']
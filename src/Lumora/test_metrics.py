@@ -0,0 +1,54 @@
+"""
+Request metrics tests: every request is counted, including ones whose view
+raises, and the slow-request log follows the settings the app is built with.
+
+Run from src/Lumora:  python -m pytest -q test_metrics.py
+"""
+import pytest
+from flask import Flask
+
+from utils import metrics
+
+@pytest.mark.parametrize('propagate', [False, True])
+def test_unhandled_error_is_recorded_as_500(propagate):
+    app = Flask(__name__)
+    app.config['PROPAGATE_EXCEPTIONS'] = propagate  # True in debug and testing mode
+    metrics.init_app(app)
+
+    @app.route(f'/boom/{propagate}')
+    def boom():
+        raise RuntimeError("boom")
+
+    client = app.test_client()
+    if propagate:
+        with pytest.raises(RuntimeError):
+            client.get(f'/boom/{propagate}')
+    else:
+        client.get(f'/boom/{propagate}').close()  # Error responses are recorded when closed
+    assert metrics.REQUEST_SECONDS.series[(f'/boom/{propagate}', 'GET', 500)][2] == 1
+
+@pytest.fixture
+def restore_slow_request_settings():
+    saved = metrics.SLOW_REQUEST_SECONDS, metrics.SLOW_REQUEST_SAMPLE_RATE
+    yield
+    metrics.SLOW_REQUEST_SECONDS, metrics.SLOW_REQUEST_SAMPLE_RATE = saved
+
+def test_slow_request_threshold_is_read_when_the_app_is_built(monkeypatch, capsys, restore_slow_request_settings):
+    monkeypatch.setenv('SLOW_REQUEST_SECONDS', '0.000001')  # Set after import, as .env is
+    app = Flask(__name__)
+    metrics.init_app(app)
+    assert metrics.SLOW_REQUEST_SECONDS == 0.000001
+
+    @app.route('/slow')
+    def slow():
+        return 'ok'
+
+    app.test_client().get('/slow')
+    assert '"endpoint": "/slow"' in capsys.readouterr().out
+
+def test_app_config_overrides_the_environment(monkeypatch, restore_slow_request_settings):
+    monkeypatch.setenv('SLOW_REQUEST_SECONDS', '5')
+    app = Flask(__name__)
+    app.config.update(SLOW_REQUEST_SECONDS=0, SLOW_REQUEST_SAMPLE_RATE=0.25)
+    metrics.init_app(app)
+    assert metrics.SLOW_REQUEST_SECONDS is None and metrics.SLOW_REQUEST_SAMPLE_RATE == 0.25
@@ -0,0 +1,131 @@
+"""
+OpenAI client tests: identical in-flight calls share one upstream request,
+and each process reuses one pooled client.
+
+Run from src/Lumora:  python -m pytest -q test_openai_client.py
+"""
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from utils import openai_client
+from utils.openai_client import SingleFlight
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.005)
+
+def run_together(n, target):
+    results = [None] * n
+
+    def run(i):
+        try:
+            results[i] = target()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+# --- Single-flight ---
+def test_concurrent_calls_share_one_result():
+    flight, release, calls = SingleFlight(), threading.Event(), []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return 'answer'
+
+    threads, results = run_together(4, lambda: flight.do('k', fn))
+    wait_until(lambda: flight.coalesced == 3)  # One leader, three waiters
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ['answer'] * 4 and calls == [1]
+    assert flight.calls == {}
+
+def test_waiters_get_the_leaders_error():
+    flight, release = SingleFlight(), threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise ValueError("upstream failed")
+
+    threads, results = run_together(3, lambda: flight.do('k', fn))
+    wait_until(lambda: flight.coalesced == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flight.do('k', lambda: 'retried') == 'retried'  # A failed key is not remembered
+
+def test_different_or_finished_keys_are_not_coalesced():
+    flight = SingleFlight()
+    assert [flight.do(key, lambda key=key: key) for key in ('a', 'b', 'a')] == ['a', 'b', 'a']
+    assert flight.coalesced == 0
+
+class FakeCompletions:
+    def __init__(self):
+        self.release = threading.Event()
+        self.requests = []
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        self.release.wait(5)
+        message = SimpleNamespace(content=f"reply to {kwargs['messages'][-1]['content']}")
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(message=message)])
+
+def test_identical_chat_requests_make_one_upstream_call(monkeypatch):
+    completions = FakeCompletions()
+    monkeypatch.setattr(openai_client, 'get_client', lambda: SimpleNamespace(chat=SimpleNamespace(
+        completions=completions)))
+    monkeypatch.setattr(openai_client, 'flight', SingleFlight())
+    ask = lambda text: openai_client.chat('recommend', 'gpt-4o', [{'role': 'user', 'content': text}])
+
+    threads, results = run_together(3, lambda: ask('hi'))
+    other_threads, other_results = run_together(1, lambda: ask('bye'))
+    wait_until(lambda: openai_client.flight.coalesced == 2 and len(completions.requests) == 2)
+    completions.release.set()
+    for thread in threads + other_threads:
+        thread.join()
+    assert results == ['reply to hi'] * 3 and other_results == ['reply to bye']
+    assert sorted(r['messages'][0]['content'] for r in completions.requests) == ['bye', 'hi']
+
+# --- Pooled client ---
+@pytest.fixture
+def fresh_client(monkeypatch):
+    created = []
+
+    def client_factory(**kwargs):
+        created.append(kwargs)
+        return SimpleNamespace(n=len(created))
+
+    monkeypatch.setattr(openai, 'OpenAI', client_factory)
+    monkeypatch.setattr(openai_client, '_client', None)
+    monkeypatch.setattr(openai_client, '_client_pid', None)
+    return created
+
+def test_one_client_per_process(fresh_client):
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(openai_client.get_client())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(fresh_client) == 1 and all(c is clients[0] for c in clients)
+    assert fresh_client[0]['max_retries'] == 0  # Retries are ours, not the SDK's
+
+def test_forked_process_builds_its_own_client(fresh_client, monkeypatch):
+    parent = openai_client.get_client()
+    monkeypatch.setattr(openai_client, '_client_pid', os.getpid() + 1)  # Built before a fork
+    child = openai_client.get_client()
+    assert child is not parent and openai_client.get_client() is child
+    assert len(fresh_client) == 2
@@ -0,0 +1,93 @@
+"""
+Opening-hours parser tests: each documented free-text form against the
+minute-of-week intervals it should produce (minute 0 is Monday 00:00), and
+the open_at values the spot filters accept.
+
+Run from src/Lumora:  python -m pytest -q test_opening_hours.py
+"""
+from datetime import datetime
+
+import pytest
+
+from utils.opening_hours import parse_hours, parse_open_at
+
+DAY = 1440
+WEEK = 7 * DAY
+WEEKDAYS, WEEKEND, EVERY_DAY = range(5), range(5, 7), range(7)
+
+def on(days, start, end):
+    """
+    Expected intervals: start..end minutes after midnight on each day.
+    """
+    return [(d * DAY + start, d * DAY + end) for d in days]
+
+CASES = [
+    # Daily ranges and am/pm inference
+    ("8am-8pm", on(EVERY_DAY, 480, 1200)),
+    ("9-5", on(EVERY_DAY, 540, 1020)),
+    ("8-5pm", on(EVERY_DAY, 480, 1020)),
+    ("10-2pm", on(EVERY_DAY, 600, 840)),
+    ("13:00-17:30", on(EVERY_DAY, 780, 1050)),
+    ("noon to midnight", on(EVERY_DAY, 720, 1440)),
+    ("7:30 a.m. – 4 p.m.", on(EVERY_DAY, 450, 960)),
+    # Day groups before their times
+    ("Mon-Fri 8am-9pm; Sat 10am-6pm", on(WEEKDAYS, 480, 1260) + on([5], 600, 1080)),
+    ("weekends 9-5", on(WEEKEND, 540, 1020)),
+    ("Tue, Thu 9am-12pm", on([1, 3], 540, 720)),
+    ("Fri-Mon 10am-4pm", on([0], 600, 960) + on([4, 5, 6], 600, 960)),
+    ("Mon-Fri 9am-12pm, 1pm-5pm", sorted(on(WEEKDAYS, 540, 720) + on(WEEKDAYS, 780, 1020))),
+    ("Mon-Fri 9-5, Sat-Sun closed", on(WEEKDAYS, 540, 1020)),
+    # Day groups after their times
+    ("8am-8pm (Mon-Fri)", on(WEEKDAYS, 480, 1200)),
+    ("9am-5pm Mon-Fri, 10am-2pm weekends", on(WEEKDAYS, 540, 1020) + on(WEEKEND, 600, 840)),
+    ("9am-12pm, 1pm-5pm weekdays", sorted(on(WEEKDAYS, 540, 720) + on(WEEKDAYS, 780, 1020))),
+    ("9am-5pm Mon-Fri; closed Sat, Sun", on(WEEKDAYS, 540, 1020)),
+    # Times first without a trailing day group: the daily range still applies
+    ("8am-8pm, Sat 10am-4pm", on(EVERY_DAY, 480, 1200)),
+    # Overnight, including Sunday night into Monday morning
+    ("Fri 6pm-2am", [(4 * DAY + 1080, 5 * DAY + 120)]),
+    ("Sun 10pm-2am", [(0, 120), (6 * DAY + 1320, WEEK)]),
+    ("6pm-2am", [(0, 120)] + [(d * DAY + 1080, (d + 1) * DAY + 120) for d in range(6)] + [(6 * DAY + 1080, WEEK)]),
+    ("22-2", [(0, 120)] + [(d * DAY + 1320, (d + 1) * DAY + 120) for d in range(6)] + [(6 * DAY + 1320, WEEK)]),
+    ("Fri 20-4", [(4 * DAY + 1200, 5 * DAY + 240)]),
+    # Always open and never open
+    ("24/7", [(0, WEEK)]),
+    ("Open 24 hours", [(0, WEEK)]),
+    ("Sat 24 hrs", on([5], 0, DAY)),
+    ("closed", []),
+    ("Closed", []),
+]
+
+@pytest.mark.parametrize('text, expected', CASES, ids=[text for text, _ in CASES])
+def test_parse_hours(text, expected):
+    assert parse_hours(text) == expected
+
+@pytest.mark.parametrize('text', [None, "", "unknown", "call ahead", "Mon-Fri"])
+def test_unreadable_hours(text):
+    assert parse_hours(text) is None
+
+WEDNESDAY_NOON = datetime(2026, 10, 21, 12, 0)
+WEDNESDAY = 2 * DAY
+
+OPEN_AT = [
+    ("now", WEDNESDAY + 720),
+    ("23:00", WEDNESDAY + 1380),
+    ("2300", WEDNESDAY + 1380),
+    (2300, WEDNESDAY + 1380),  # A number from parsed JSON
+    ("0930", WEDNESDAY + 570),
+    ("11pm", WEDNESDAY + 1380),
+    ("7:30 am", WEDNESDAY + 450),
+    ("sat 11pm", 5 * DAY + 1380),
+    ("Sun 0800", 6 * DAY + 480),
+    # Bare hours are ambiguous; minute-of-week numbers are not accepted
+    ("23", None),
+    ("10079", None),
+    ("2400", None),
+    ("1260", None),
+    ("tomorrow", None),
+    (True, None),
+]
+
+@pytest.mark.parametrize('value, expected', OPEN_AT, ids=[str(value) for value, _ in OPEN_AT])
+def test_parse_open_at(value, expected):
+    assert parse_open_at(value, WEDNESDAY_NOON) == expected
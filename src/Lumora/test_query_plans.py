@@ -0,0 +1,115 @@
+"""
+Query-plan regression tests: the statements the code actually executes are
+captured while it runs, then explained. Point lookups must be answered from
+an index; the few intentional whole-table reads must stay a single scan.
+
+Run from src/Lumora:  python -m pytest -q test_query_plans.py
+"""
+import re
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from db import db
+from models import Spot, StudySession, User
+from utils import ai_utils, spot_catalog
+from utils.batch_categorize import spots_to_categorize
+from utils.membership import add_member, is_member, session_members, user_sessions
+
+# SCAN lines that are not full table scans (FTS5 lookups go through the virtual table)
+ALLOWED_SCANS = re.compile(r"VIRTUAL TABLE")
+
+@pytest.fixture
+def app(monkeypatch):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    monkeypatch.setattr(spot_catalog, '_db_catalog', None)
+    monkeypatch.setattr(ai_utils, '_synced', {})
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([User(username=f"user{i}", password='pw') for i in range(3)])
+        db.session.add_all([Spot(name=f"Spot {i}", type='recreation' if i % 2 else 'study', location='Campus',
+                                 activity=None if i % 3 else 'park') for i in range(6)])
+        db.session.add_all([StudySession(subject=f"subject {i}", user_id=1, spot_id=1) for i in range(4)])
+        db.session.commit()
+        for session_id, user_id in [(1, 1), (1, 2), (2, 1), (3, 3)]:
+            add_member(session_id, user_id)
+        db.session.commit()
+        yield app
+
+def executed(fn):
+    """
+    (statement, parameters) of every query fn runs.
+    """
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and not statement.lstrip().upper().startswith('EXPLAIN'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        fn()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    assert statements, "nothing was executed"
+    return statements
+
+def plan(statement, parameters):
+    return [row[3] for row in db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+
+def full_scans(details):
+    return [d for d in details if d.startswith('SCAN') and not ALLOWED_SCANS.search(d)]
+
+# --- Lookups: never a full table scan ---
+LOOKUPS = {
+    'session_members': lambda: session_members([1, 2]),
+    'user_sessions': lambda: user_sessions(1),
+    'add_member': lambda: add_member(4, 2),
+    'is_member': lambda: is_member(1, 2),
+    'spots_to_categorize': spots_to_categorize,
+}
+
+@pytest.mark.parametrize('name', sorted(LOOKUPS))
+def test_lookup_uses_index(app, name):
+    for statement, parameters in executed(LOOKUPS[name]):
+        details = plan(statement, parameters)
+        assert not full_scans(details), f"{name} scans a table: {statement} -> {details}"
+
+def test_user_sessions_is_index_only(app):
+    (statement, parameters), = executed(lambda: user_sessions(1))
+    assert plan(statement, parameters) == ['SEARCH session_member USING COVERING INDEX ix_session_member_user_id (user_id=?)']
+
+# --- Whole-table reads: one pass, no sort ---
+def assert_single_scan(statement, parameters, table):
+    details = plan(statement, parameters)
+    assert len(full_scans(details)) == 1 and full_scans(details)[0].startswith(f"SCAN {table}"), details
+    assert not any('TEMP B-TREE' in d for d in details), details
+
+def test_catalog_load_is_one_scan_after_a_version_lookup(app):
+    (version, version_params), (load, load_params) = executed(spot_catalog.db_catalog)
+    assert not full_scans(plan(version, version_params))
+    assert_single_scan(load, load_params, 'spot')
+    assert executed(spot_catalog.db_catalog)[1:] == []  # Unchanged version: no reload
+
+def test_session_match_reads(app):
+    query = {'subject': 'subject 1'}
+    # First match in a process: signature, full (id, subject) sync, then lookups by id
+    signature, load, *lookups = executed(lambda: ai_utils.match_study_sessions(query, mode='local'))
+    assert_single_scan(*signature, 'study_session')
+    assert_single_scan(*load, 'study_session')
+    for statement, parameters in lookups:
+        assert not full_scans(plan(statement, parameters)), statement
+    # Later matches only re-check the signature
+    signature, *lookups = executed(lambda: ai_utils.match_study_sessions(query, mode='local'))
+    assert 'count' in signature[0].lower()
+    for statement, parameters in lookups:
+        assert not full_scans(plan(statement, parameters)), statement
+
+def test_fts_search_uses_index(app):
+    from utils.spot_search import ensure_search_index
+    ensure_search_index()
+    details = plan("SELECT rowid FROM spot_fts WHERE spot_fts MATCH 'wifi' LIMIT 10", ())
+    assert all(ALLOWED_SCANS.search(d) for d in details if d.startswith('SCAN')), details
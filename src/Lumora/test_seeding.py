@@ -0,0 +1,66 @@
+"""
+Seeding tests: the streaming JSON reader against json.load on the shapes
+seed files come in, and the upsert statement on every supported dialect.
+
+Run from src/Lumora:  python -m pytest -q test_seeding.py
+"""
+import io
+import json
+
+import pytest
+from flask import Flask
+from sqlalchemy.dialects import postgresql
+
+from db import db
+from models import Spot
+from utils.seeding import _upsert_statement, iter_json, upsert_spots
+
+SPOTS = [
+    {'name': 'Main Library', 'location': 'Campus', 'noise_level': 'quiet', 'hours': '8am-10pm'},
+    {'name': 'Cafe [24h]', 'location': 'Main St, "Downtown"', 'amenities': 'wifi, {outlets}', 'latitude': 37.5},
+    {'name': 'Park', 'location': 'North', 'tags': ['a', ']', ','], 'nested': {'x': [1, 2, {'y': None}]}},
+]
+
+# read_size 1 makes every token straddle a buffer refill
+@pytest.mark.parametrize('read_size', [1, 7, 64, 1 << 16])
+@pytest.mark.parametrize('indent', [None, 2])
+def test_top_level_array(read_size, indent):
+    text = json.dumps(SPOTS, indent=indent)
+    assert list(iter_json(io.StringIO(text), read_size)) == SPOTS
+
+@pytest.mark.parametrize('read_size', [1, 7, 1 << 16])
+def test_grouped_document(read_size):
+    doc = {'version': 3, 'study_spots': SPOTS[:2], 'meta': {'source': '[not spots]'},
+           'recreation_spots': SPOTS[2:], 'empty': []}
+    objects = list(iter_json(io.StringIO(json.dumps(doc, indent=1)), read_size))
+    assert [o['_group'] for o in objects] == ['study_spots', 'study_spots', 'recreation_spots']
+    assert [{k: v for k, v in o.items() if k != '_group'} for o in objects] == SPOTS
+
+def test_empty_inputs():
+    assert list(iter_json(io.StringIO(''))) == []
+    assert list(iter_json(io.StringIO('[]'))) == []
+    assert list(iter_json(io.StringIO('{"study_spots": []}'))) == []
+
+def test_truncated_file_raises():
+    with pytest.raises(ValueError):
+        list(iter_json(io.StringIO(json.dumps(SPOTS)[:-20]), 8))
+
+def test_postgresql_upsert_leaves_coordinates_untyped():
+    # nullif(float, 'unknown') is rejected by PostgreSQL
+    sql = str(_upsert_statement('postgresql').compile(dialect=postgresql.dialect()))
+    assert "nullif(excluded.latitude" not in sql and "nullif(excluded.longitude" not in sql
+    assert "latitude = coalesce(excluded.latitude, spot.latitude)" in sql
+    assert "nullif(excluded.noise_level, 'unknown')" in sql
+
+def test_upsert_keeps_known_values():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        base = {'name': 'Cafe', 'type': 'study', 'location': 'Main St', 'activity': None, 'hours': '8am-5pm',
+                'seating': None, 'amenities': None}
+        upsert_spots([dict(base, noise_level='quiet', latitude=1.5, longitude=2.5)], progress=None)
+        upsert_spots([dict(base, noise_level='unknown', latitude=None, longitude=None)], progress=None)
+        spot = db.session.execute(db.select(Spot)).scalar_one()
+        assert (spot.noise_level, spot.latitude, spot.longitude) == ('quiet', 1.5, 2.5)
@@ -0,0 +1,121 @@
+"""
+Session index tests: once the ANN index is trained it is the only vector
+store searched, so training must pick up every session in the database;
+the embedding store across processes; the local TF-IDF index.
+
+Run from src/Lumora:  python -m pytest -q test_session_index.py
+"""
+import zlib
+
+import numpy as np
+import pytest
+from flask import Flask
+
+from db import db
+from models import StudySession
+from utils import ai_utils, ann_index, embeddings
+
+DIM = 16
+
+def fake_embed(texts):
+    # Deterministic vector per text, no API call
+    return [np.random.default_rng(zlib.crc32(t.encode())).standard_normal(DIM) for t in texts]
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    monkeypatch.setattr(ann_index, 'session_index', ann_index.IVFIndex(str(tmp_path / 'ann'), min_train_rows=16))
+    monkeypatch.setattr(embeddings, 'session_store', embeddings.EmbeddingStore(str(tmp_path / 'store.npz')))
+    monkeypatch.setattr(ai_utils, 'embed_for_index', fake_embed)
+    with app.app_context():
+        db.create_all()
+        yield app
+
+def add_sessions(subjects):
+    sessions = [StudySession(subject=s) for s in subjects]
+    db.session.add_all(sessions)
+    db.session.commit()
+    return sessions
+
+def test_training_indexes_sessions_created_before_the_index(app):
+    # Sessions that predate the index (e.g. created before upgrading) were never indexed
+    old = add_sessions([f"old subject {i}" for i in range(20)])
+    for session in add_sessions([f"new subject {i}" for i in range(16)]):
+        ai_utils.index_session(session)
+
+    index = ann_index.session_index
+    assert index.is_trained()
+    assert len(index) == 36
+    for session in old:
+        query = fake_embed([session.subject])[0]
+        assert index.search(query, k=1, nprobe=index.meta['nlist'])[0][0] == session.id
+
+def test_sessions_added_after_training_are_searchable(app):
+    for session in add_sessions([f"subject {i}" for i in range(16)]):
+        ai_utils.index_session(session)
+    assert ann_index.session_index.is_trained()
+    late, = add_sessions(["late subject"])
+    ai_utils.index_session(late)
+    index = ann_index.session_index
+    assert index.search(fake_embed(["late subject"])[0], k=1, nprobe=index.meta['nlist'])[0][0] == late.id
+
+def test_store_appends_are_seen_by_other_processes(tmp_path, monkeypatch):
+    monkeypatch.setattr(embeddings, 'COMPACT_MIN_ROWS', 8)
+    path = str(tmp_path / 'store.npz')
+    writer, reader = embeddings.EmbeddingStore(path), embeddings.EmbeddingStore(path)
+    for i in range(20):  # Crosses a compaction into a new snapshot
+        writer.upsert(i, f"subject {i}", fake_embed)
+    writer.remove(3)
+    writer.upsert(4, "renamed", fake_embed)
+    reader.load()
+    assert sorted(reader.rows) == [i for i in range(20) if i != 3]
+    assert np.allclose(reader.vector(4), writer.vector(4))
+    assert reader.top_k(fake_embed(["subject 7"])[0], k=1)[0][0] == 7
+
+def _upsert_range(path, start, count):
+    store = embeddings.EmbeddingStore(path)
+    for i in range(start, start + count):
+        store.upsert(i, f"subject {i}", fake_embed)
+
+@pytest.mark.skipif(embeddings.fcntl is None, reason="needs POSIX file locks")
+def test_concurrent_writer_processes_keep_every_row(tmp_path):
+    import multiprocessing
+    path = str(tmp_path / 'store.npz')
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_upsert_range, args=(path, w * 400, 400)) for w in range(4)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join()
+    store = embeddings.EmbeddingStore(path)
+    store.load()
+    assert sorted(store.rows) == list(range(1600))
+
+# --- Local TF-IDF index ---
+def test_text_index_reuses_idf_until_a_change(monkeypatch):
+    from utils.text_vectors import TextIndex
+    index = TextIndex()
+    index.sync([(1, "calculus exam prep"), (2, "organic chemistry"), (3, "calculus homework")])
+    computed = []
+    idf = index.idf
+    monkeypatch.setattr(index, 'idf', lambda: computed.append(1) or idf())
+    for _ in range(3):
+        assert {key for key, _ in index.top_k("calculus", k=2)} == {1, 3}
+    assert len(computed) == 1  # Once, with the postings
+    index.add(4, "calculus review")
+    assert index.top_k("calculus review", k=1)[0][0] == 4
+    assert len(computed) == 2
+
+def test_text_index_scores_match_a_fresh_index_after_edits():
+    from utils.text_vectors import TextIndex
+    index, fresh = TextIndex(), TextIndex()
+    index.sync([(1, "calculus exam prep"), (2, "organic chemistry"), (3, "spanish essay")])
+    index.top_k("calculus")  # Builds the postings before the edits below
+    index.add(2, "chemistry lab report")
+    index.remove(3)
+    index.add(4, "calculus homework")
+    fresh.sync([(1, "calculus exam prep"), (2, "chemistry lab report"), (4, "calculus homework")])
+    for query in ("calculus", "chemistry report", "spanish"):
+        assert index.top_k(query) == pytest.approx(fresh.top_k(query))
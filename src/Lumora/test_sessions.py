@@ -0,0 +1,50 @@
+"""
+Study session route tests: creating a session makes its creator the first
+member, and joins respect capacity.
+
+Run from src/Lumora:  python -m pytest -q test_sessions.py
+"""
+import pytest
+
+from app import create_app
+from db import db
+from models import StudySession, User
+from routes import sessions
+from utils import jobs
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, 'INLINE_WORKERS', 0)  # Leave the queued index jobs alone
+    monkeypatch.setattr(sessions, 'job_queue', jobs.JobQueue(str(tmp_path / 'jobs.sqlite')))
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([User(username=name, password='pw') for name in ('ana', 'ben', 'cy')])
+        db.session.commit()
+        yield app.test_client()
+
+def create(client, **fields):
+    return client.post('/api/sessions/', json=dict({'subject': 'Linear algebra', 'spot_id': None, 'user_id': 1},
+                                                    **fields))
+
+def test_creator_is_the_first_member(client):
+    response = create(client, capacity=2)
+    assert response.status_code == 200
+    session_id = response.get_json()['session_id']
+    members = client.get(f'/api/sessions/{session_id}/members').get_json()
+    assert (members['members'], members['member_count']) == ([1], 1)
+    assert client.get('/api/sessions/user/1').get_json()['session_ids'] == [session_id]
+
+@pytest.mark.parametrize('capacity', [0, -1, 1.5, '2', True])
+def test_invalid_capacity_is_rejected(client, capacity):
+    assert create(client, capacity=capacity).status_code == 400
+    assert db.session.query(StudySession).count() == 0
+
+def test_joins_stop_at_capacity(client):
+    session_id = create(client, capacity=2).get_json()['session_id']
+    join = lambda user_id: client.post('/api/sessions/join', json={'session_id': session_id, 'user_id': user_id})
+    assert join(2).status_code == 200
+    assert join(2).get_json()['message'] == 'Already joined'
+    assert join(3).status_code == 409
+    assert client.post('/api/sessions/join', json={'session_id': 999, 'user_id': 2}).status_code == 404
+    assert client.get(f'/api/sessions/{session_id}/members').get_json()['members'] == [1, 2]
@@ -0,0 +1,78 @@
+"""
+Recommendation tests: rank_spots weighting on a small catalog, and
+parse_query replies that are not JSON objects.
+
+Run from src/Lumora:  python -m pytest -q test_spot_ranking.py
+"""
+import pytest
+
+from utils import ai_utils
+from utils.spot_catalog import SpotRecord
+from utils.spot_ranking import PREFERENCE_FACTOR, SIGNAL_WEIGHTS, UNKNOWN_SCORE, SpotFeatures, rank_spots
+
+SPOTS = [
+    SpotRecord(1, 'Quiet Hall', 'study', 'Campus', noise_level='quiet'),
+    SpotRecord(2, 'Wifi Cafe', 'study', 'Downtown', noise_level='loud', amenities='wifi, outlets'),
+    SpotRecord(3, 'Moderate Room', 'study', 'Campus', noise_level='moderate', amenities='wifi'),
+    SpotRecord(4, 'Unlabeled Nook', 'study', 'Campus'),
+    SpotRecord(5, 'Field', 'recreation', 'North', activity='soccer', noise_level='quiet'),
+]
+
+@pytest.fixture(scope='module')
+def features():
+    return SpotFeatures(SPOTS)
+
+def ids(ranked):
+    return [spot_id for spot_id, _, _ in ranked]
+
+def test_noise_ranks_by_closeness(features):
+    ranked = rank_spots(features, {'type': 'study', 'noise_level': 'silent'})
+    assert ids(ranked) == [1, 3, 4, 2]  # quiet, moderate, unknown, loud
+    assert dict((i, score) for i, score, _ in ranked)[4] == pytest.approx(UNKNOWN_SCORE)
+
+def test_weights_decide_between_signals(features):
+    query = {'type': 'study', 'noise_level': 'quiet', 'amenities': 'wifi outlets'}
+    # Default weights: the loud cafe with both amenities (0.4 * 2 + 1.5) / 3.5
+    # beats the quiet hall with none (1.0 * 2) / 3.5
+    assert ids(rank_spots(features, query, k=1)) == [2]
+    # A user who weights noise higher gets the quiet hall
+    assert ids(rank_spots(features, query, k=1, preferences={'weights': {'noise': 5}})) == [1]
+    # A zero weight drops the signal
+    ranked = rank_spots(features, query, preferences={'weights': {'noise': 0}})
+    assert all(set(explanation) == {'amenities'} for _, _, explanation in ranked)
+
+def test_score_is_the_weighted_mean_of_signals(features):
+    query = {'type': 'study', 'noise_level': 'quiet', 'amenities': 'wifi'}
+    for _, score, explanation in rank_spots(features, query):
+        assert score == pytest.approx(sum(explanation.values()), abs=1e-3)
+    (_, score, explanation), = [r for r in rank_spots(features, query) if r[0] == 3]
+    total = SIGNAL_WEIGHTS['noise'] + SIGNAL_WEIGHTS['amenities']
+    assert explanation['amenities'] == pytest.approx(SIGNAL_WEIGHTS['amenities'] / total, abs=1e-3)
+    assert explanation['noise'] == pytest.approx((1 - 0.25) * SIGNAL_WEIGHTS['noise'] / total, abs=1e-3)
+
+def test_preferences_fill_in_at_reduced_weight(features):
+    ranked = rank_spots(features, {'type': 'study', 'amenities': 'wifi'}, preferences={'noise_level': 'quiet'})
+    assert ids(ranked)[0] == 3  # Wifi and moderate beats wifi and loud
+    (_, _, explanation), = [r for r in ranked if r[0] == 3]
+    total = SIGNAL_WEIGHTS['amenities'] + SIGNAL_WEIGHTS['noise'] * PREFERENCE_FACTOR
+    assert explanation['amenities'] == pytest.approx(SIGNAL_WEIGHTS['amenities'] / total, abs=1e-3)
+
+def test_type_and_allowed_ids_are_hard_filters(features):
+    assert ids(rank_spots(features, {'type': 'recreation', 'noise_level': 'quiet'})) == [5]
+    assert ids(rank_spots(features, {'type': 'study'}, allowed_ids={2, 4, 5})) == [2, 4]
+
+def test_top_k_keeps_lowest_ids_on_ties(features):
+    assert ids(rank_spots(features, {'type': 'study'}, k=2)) == [1, 2]
+    assert rank_spots(features, {'type': 'study'}, k=0) == []
+
+# --- parse_query replies ---
+@pytest.mark.parametrize('reply', ['["study"]', '"study"', '42', 'null', 'not json'])
+def test_non_object_replies_fall_back_to_the_local_route(monkeypatch, reply):
+    monkeypatch.setattr(ai_utils, 'chat_completion', lambda *args, **kwargs: reply)
+    parsed = ai_utils.parse_query("zzqx plover")  # Nothing the intent router recognizes
+    assert isinstance(parsed, dict) and parsed['type'] == 'study'
+
+def test_object_replies_are_used(monkeypatch):
+    reply = '{"type": "recreation", "activity": "soccer"}'
+    monkeypatch.setattr(ai_utils, 'chat_completion', lambda *args, **kwargs: reply)
+    assert ai_utils.parse_query("zzqx plover") == {'type': 'recreation', 'activity': 'soccer'}
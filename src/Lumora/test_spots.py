@@ -0,0 +1,207 @@
+"""
+Spot route and catalog tests against an in-memory database.
+
+Run from src/Lumora:  python -m pytest -q test_spots.py
+"""
+import pytest
+
+from app import create_app
+from db import db
+from models import Spot
+from utils import spot_catalog, spot_search
+from utils.response_cache import ResponseCache, response_cache
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(spot_catalog, '_db_catalog', None)
+    response_cache.clear()
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            Spot(name='Main Library', type='study', location='Campus', noise_level='quiet', hours='8am-10pm',
+                 amenities='wifi, outlets', latitude=37.3352, longitude=-121.8811),
+            Spot(name='Bean Cafe', type='study', location='Downtown', noise_level='moderate', hours='24/7',
+                 amenities='wifi, coffee', latitude=37.3382, longitude=-121.8863),
+            Spot(name='Riverside Park', type='recreation', location='North', activity='park', hours='6am-8pm',
+                 latitude=37.3600, longitude=-121.9000),
+        ])
+        db.session.commit()
+        yield app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+# --- Paged listing ---
+def test_pages_follow_the_cursor(client):
+    db.session.add_all([Spot(name=f'Carrel {n}', type='study', location='Campus') for n in range(3)])
+    db.session.commit()
+    names, url, pages = [], '/api/spots/study?limit=2', 0
+    while url:
+        response = client.get(url)
+        names += [s['name'] for s in response.get_json()]
+        pages += 1
+        cursor = response.headers.get('X-Next-Cursor')
+        assert ('Link' in response.headers) == (cursor is not None)
+        url = response.headers['Link'][1:].split('>')[0] if cursor else None
+    assert pages == 3
+    assert names == ['Main Library', 'Bean Cafe', 'Carrel 0', 'Carrel 1', 'Carrel 2']
+
+def test_cursor_is_the_last_id_and_keeps_the_filters(client):
+    response = client.get('/api/spots/study?limit=1&location=Campus')
+    assert [s['name'] for s in response.get_json()] == ['Main Library']
+    assert 'X-Next-Cursor' not in response.headers  # Only one study spot on campus
+    response = client.get('/api/spots/study?limit=1')
+    assert response.headers['X-Next-Cursor'] == '1'
+    assert 'limit=1' in response.headers['Link'] and 'cursor=1' in response.headers['Link']
+    assert [s['name'] for s in client.get('/api/spots/study?cursor=1').get_json()] == ['Bean Cafe']
+    assert client.get('/api/spots/study?cursor=2').get_json() == []
+
+@pytest.mark.parametrize('cursor', ['-1', 'abc', '1.5'])
+def test_invalid_cursor_is_rejected(client, cursor):
+    assert client.get(f'/api/spots/study?cursor={cursor}').status_code == 400
+
+def test_limit_is_clamped(client):
+    assert len(client.get('/api/spots/study?limit=0').get_json()) == 1
+    assert len(client.get('/api/spots/study?limit=5000').get_json()) == 2
+
+def test_fields_project_the_rows(client):
+    rows = client.get('/api/spots/study?fields=name, noise_level').get_json()
+    assert rows == [{'name': 'Main Library', 'noise_level': 'quiet'}, {'name': 'Bean Cafe', 'noise_level': 'moderate'}]
+    assert client.get('/api/spots/recreation?fields=id').get_json() == [{'id': 3}]
+    full = client.get('/api/spots/study').get_json()[0]
+    assert set(full) == set(spot_catalog.SpotRecord.__slots__)
+
+def test_unknown_fields_are_rejected(client):
+    response = client.get('/api/spots/study?fields=name,password')
+    assert response.status_code == 400 and 'fields' in response.get_json()['error']
+
+# --- Conditional GETs and the response cache ---
+def test_unchanged_listing_answers_304(client):
+    first = client.get('/api/spots/study?noise_level=quiet')
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and 'Accept-Encoding' in first.headers['Vary']
+    again = client.get('/api/spots/study?noise_level=quiet', headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.data == b'' and again.headers['ETag'] == etag
+    # Parameter order doesn't matter; other parameters are another representation
+    assert client.get('/api/spots/study?limit=1&noise_level=quiet').headers['ETag'] == \
+        client.get('/api/spots/study?noise_level=quiet&limit=1').headers['ETag'] != etag
+    replay = client.get('/api/spots/study?noise_level=quiet')
+    assert replay.headers['ETag'] == etag and replay.data == first.data
+    assert response_cache.stats()['entries'] == 2
+
+def test_version_bump_invalidates_cached_listings(client):
+    first = client.get('/api/spots/study')
+    etag = first.headers['ETag']
+    Spot.query.filter_by(name='Bean Cafe').update({'name': 'Bean Roasters'})
+    db.session.commit()
+    response = client.get('/api/spots/study', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+    assert [s['name'] for s in response.get_json()] == ['Main Library', 'Bean Roasters']
+    assert response_cache.stats() == {'entries': 1, 'bytes': len(response.data),
+                                      'version': spot_catalog.db_catalog().version}
+
+def test_response_cache_drops_old_versions_and_evicts_by_size():
+    cache = ResponseCache(max_bytes=10)
+    cache.set('a', 2, b'12345', {})
+    cache.set('b', 1, b'67890', {})  # From a lagging replica: not kept
+    assert cache.get('b') is None
+    cache.set('b', 2, b'67890', {})
+    cache.get('a')
+    cache.set('c', 2, b'xyz', {})  # Over budget: evicts the least recently used
+    assert (cache.get('a'), cache.get('b')) == ((b'12345', {}), None)
+    cache.set('d', 3, b'new', {})
+    assert cache.stats() == {'entries': 1, 'bytes': 3, 'version': 3}
+
+# --- /search ---
+def search(client, **params):
+    return client.get('/api/spots/search', query_string=params).get_json()
+
+def test_search_ranks_name_hits_first(client):
+    db.session.add(Spot(name='Coffee Corner', type='study', location='Campus', amenities='wifi'))
+    db.session.commit()  # Triggers index the new row
+    results = search(client, q='coffee')
+    assert [s['name'] for s in results] == ['Coffee Corner', 'Bean Cafe']
+    assert results[0]['score'] > results[1]['score']
+
+def test_search_matches_every_word_and_prefixes(client):
+    assert [s['name'] for s in search(client, q='wifi outlets')] == ['Main Library']
+    assert [s['name'] for s in search(client, q='riversi')] == ['Riverside Park']
+    assert search(client, q='') == []
+    # FTS syntax in the query is matched as plain words, not parsed
+    assert search(client, q='"wifi*') == search(client, q='wifi')
+    assert search(client, q='wifi OR park') == []
+
+def test_search_filters_and_limit(client):
+    assert [s['name'] for s in search(client, q='park', type='study')] == []
+    assert len(search(client, q='wifi', limit=1)) == 1
+    assert len(search(client, q='wifi', limit=-1)) == 1  # Clamped like the listing's limit
+
+def test_search_follows_updates(client):
+    Spot.query.filter_by(name='Bean Cafe').update({'amenities': 'tea'})
+    db.session.commit()
+    assert [s['name'] for s in search(client, q='coffee')] == []
+    assert [s['name'] for s in search(client, q='tea')] == ['Bean Cafe']
+
+def test_search_without_fts_falls_back_to_the_catalog(client, monkeypatch):
+    with_fts = search(client, q='wifi')
+    monkeypatch.setattr(spot_search, 'ensure_search_index', lambda: False)
+    without_fts = search(client, q='wifi')
+    assert [s['id'] for s in without_fts] == sorted(s['id'] for s in with_fts)
+    assert [s['name'] for s in search(client, q='wifi coffee')] == ['Bean Cafe']
+    assert search(client, q='wifi', type='recreation') == []
+
+# --- /nearby ---
+def test_nearby_nearest_first(client):
+    spots = client.get('/api/spots/nearby?lat=37.3352&lon=-121.8811&k=2').get_json()
+    assert [s['name'] for s in spots] == ['Main Library', 'Bean Cafe']
+    assert spots[0]['distance_km'] == 0.0
+
+def test_nearby_filters_and_radius(client):
+    spots = client.get('/api/spots/nearby?lat=37.3352&lon=-121.8811&radius_km=50&type=recreation').get_json()
+    assert [s['name'] for s in spots] == ['Riverside Park']
+    spots = client.get('/api/spots/nearby?lat=37.3352&lon=-121.8811&radius_km=0.1').get_json()
+    assert [s['name'] for s in spots] == ['Main Library']  # Bean Cafe is ~0.6 km away
+
+@pytest.mark.parametrize('query', ['k=0', 'k=-3', 'radius_km=0', 'radius_km=-1', 'radius_km=nan', 'lat=91', ''])
+def test_nearby_rejects_bad_parameters(client, query):
+    base = {'lat': '37.3352', 'lon': '-121.8811'}
+    params = dict(base, **dict([query.split('=')])) if query else {}
+    response = client.get('/api/spots/nearby', query_string=params)
+    assert response.status_code == 400
+
+# --- Spot catalog ---
+def old_query(type=None, noise_level=None, activity=None, location=None, amenities=None):
+    # The filter_by/contains queries the routes ran before the catalog
+    query = Spot.query
+    for field, value in (('type', type), ('noise_level', noise_level), ('activity', activity), ('location', location)):
+        if value:
+            query = query.filter_by(**{field: value})
+    if amenities:
+        query = query.filter(Spot.amenities.contains(amenities))
+    return [s.id for s in query.order_by(Spot.id)]
+
+@pytest.mark.parametrize('filters', [
+    {}, {'type': 'study'}, {'type': 'study', 'noise_level': 'quiet'}, {'type': 'study', 'location': 'Downtown'},
+    {'type': 'recreation', 'activity': 'park'}, {'amenities': 'wifi'}, {'type': 'study', 'amenities': 'coffee'},
+    {'type': 'study', 'noise_level': 'loud'},
+])
+def test_catalog_filters_match_the_old_queries(app, filters):
+    catalog = spot_catalog.db_catalog()
+    assert [r.id for r in catalog.filter(**filters)] == old_query(**filters)
+    assert catalog.ids(**filters) == set(old_query(**filters))
+
+def test_catalog_reloads_when_the_version_bumps(app):
+    catalog = spot_catalog.db_catalog()
+    assert spot_catalog.db_catalog() is catalog  # Unchanged version, same snapshot
+    db.session.add(Spot(name='Night Owl Hall', type='study', location='Campus', noise_level='quiet'))
+    db.session.commit()
+    refreshed = spot_catalog.db_catalog()
+    assert refreshed is not catalog and refreshed.version > catalog.version
+    assert [r.name for r in refreshed.filter(type='study', noise_level='quiet')] == ['Main Library', 'Night Owl Hall']
+
+    # Bulk updates bump the version too
+    Spot.query.filter_by(name='Bean Cafe').update({'noise_level': 'quiet'})
+    db.session.commit()
+    assert len(spot_catalog.db_catalog().ids(noise_level='quiet')) == 3
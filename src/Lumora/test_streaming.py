@@ -0,0 +1,116 @@
+"""
+Streaming answer tests: Server-Sent Event framing, error events, and
+streams that are cached only when they run to completion.
+
+Run from src/Lumora:  python -m pytest -q test_streaming.py
+"""
+import json
+
+import pytest
+
+from app import create_app
+from routes import ai
+from utils import ai_utils, openai_client
+from utils.admission import Overloaded
+from utils.llm_cache import LLMCache, MemoryTier
+
+@pytest.fixture
+def client():
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+    return app.test_client()
+
+class Chunks:
+    """
+    Generator-like stand-in for stream_chat_completion that records whether
+    it was closed, and can fail after its chunks.
+    """
+    def __init__(self, chunks, error=None):
+        self.chunks = iter(chunks)
+        self.error = error
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.chunks)
+        except StopIteration:
+            if self.error is not None:
+                raise self.error
+            raise
+
+    def close(self):
+        self.closed = True
+
+def stream(client, monkeypatch, chunks):
+    monkeypatch.setattr(ai, 'stream_chat_completion', lambda site, messages: chunks)
+    return client.post('/api/recommend/', json={'query': 'What is a derivative?', 'stream': True})
+
+def events(response):
+    """
+    Parse an SSE body into [(event, data)], event None for plain data events.
+    """
+    parsed = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        if not block:
+            continue
+        fields = dict(line.split(': ', 1) for line in block.split('\n'))
+        parsed.append((fields.get('event'), json.loads(fields['data'])))
+    return parsed
+
+def test_chunks_are_framed_as_events(client, monkeypatch):
+    chunks = Chunks(['A derivative ', 'is a "rate"\nof change. '])
+    response = stream(client, monkeypatch, chunks)
+    assert response.status_code == 200 and response.mimetype == 'text/event-stream'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert events(response) == [
+        (None, {'delta': 'A derivative '}),
+        (None, {'delta': 'is a "rate"\nof change. '}),  # Newlines stay inside the JSON payload
+        ('done', {'answer': 'A derivative is a "rate"\nof change.'}),
+    ]
+    assert chunks.closed
+
+def test_upstream_failure_ends_with_an_error_event(client, monkeypatch):
+    chunks = Chunks(['Partial '], error=RuntimeError("connection reset"))
+    received = events(stream(client, monkeypatch, chunks))
+    assert received == [(None, {'delta': 'Partial '}), ('error', {'answer': ai.FALLBACK_ANSWER})]
+    assert chunks.closed
+
+def test_overload_mid_stream_reports_retry_after(client, monkeypatch):
+    received = events(stream(client, monkeypatch, Chunks([], error=Overloaded("busy", 429, 3))))
+    assert received == [('error', {'answer': ai.FALLBACK_ANSWER, 'retry_after': 3})]
+
+def test_accept_header_or_query_string_also_stream(client, monkeypatch):
+    monkeypatch.setattr(ai, 'stream_chat_completion', lambda site, messages: Chunks(['ok']))
+    response = client.post('/api/recommend/?stream=1', json={'query': 'hi'})
+    assert events(response)[-1] == ('done', {'answer': 'ok'})
+    response = client.post('/api/recommend/', json={'query': 'hi'}, headers={'Accept': 'text/event-stream'})
+    assert events(response)[-1] == ('done', {'answer': 'ok'})
+
+# --- Caching streamed replies ---
+@pytest.fixture
+def upstream(monkeypatch):
+    calls = []
+
+    def stream_chat(site, model, messages, **params):
+        calls.append(messages)
+        yield from ['Use ', 'flashcards.']
+
+    monkeypatch.setattr(openai_client, 'stream_chat', stream_chat)
+    monkeypatch.setattr(ai_utils, 'llm_cache', LLMCache([MemoryTier()]))
+    return calls
+
+def test_completed_streams_are_cached(upstream):
+    messages = [{'role': 'user', 'content': 'How do I memorize terms?'}]
+    assert list(ai_utils.stream_chat_completion('recommend', messages)) == ['Use ', 'flashcards.']
+    assert list(ai_utils.stream_chat_completion('recommend', messages)) == ['Use flashcards.']  # One cached chunk
+    assert len(upstream) == 1
+
+def test_streams_closed_early_are_not_cached(upstream):
+    messages = [{'role': 'user', 'content': 'How do I memorize terms?'}]
+    chunks = ai_utils.stream_chat_completion('recommend', messages)
+    assert next(chunks) == 'Use '
+    chunks.close()  # Client went away
+    assert list(ai_utils.stream_chat_completion('recommend', messages)) == ['Use ', 'flashcards.']
+    assert len(upstream) == 2
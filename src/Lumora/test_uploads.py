@@ -0,0 +1,77 @@
+"""
+Upload tests: a render_upload job pushed through `python worker.py`, and
+scheduling for images whose render failed for good.
+
+Run from src/Lumora:  python -m pytest -q test_uploads.py
+"""
+import io
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from utils import jobs, uploads
+
+pytest.importorskip('PIL')
+from PIL import Image
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # Uploads and jobs live under ./instance, like in a deployment
+    monkeypatch.chdir(tmp_path)
+    queue = jobs.JobQueue(str(tmp_path / 'instance' / 'jobs.sqlite'))
+    monkeypatch.setattr(uploads, 'job_queue', queue)
+    return tmp_path, queue
+
+def store_png(size=(600, 400)):
+    data = io.BytesIO()
+    Image.new('RGB', size, 'red').save(data, 'PNG')
+    data.seek(0)
+    return uploads.store_stream(data)
+
+def wait_for(queue, job_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.2)
+    return queue.get(job_id)
+
+def test_worker_renders_upload(workdir):
+    tmp_path, queue = workdir
+    stored = store_png()
+    status, job_id = uploads.derived_assets.schedule(stored['hash'], stored['path'])
+    assert status == 'pending'
+
+    env = dict(os.environ, PYTHONPATH=HERE, DATABASE_URL=f"sqlite:///{tmp_path / 'app.db'}")
+    worker = subprocess.Popen([sys.executable, os.path.join(HERE, 'worker.py'), '--kinds', 'render_upload',
+                               '--threads', '1'], cwd=tmp_path, env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        job = wait_for(queue, job_id)
+    finally:
+        worker.send_signal(signal.SIGINT)
+        output = worker.communicate(timeout=30)[0]
+    assert job['status'] == 'done', output
+    assert output.count("Running render_upload jobs") == 1, output  # Pool processes don't start workers
+    assert worker.returncode == 0, output
+    assert uploads.derived_assets.ready(stored['hash'])
+    with Image.open(uploads.derived_path(stored['hash'], 'thumb')) as thumb:
+        assert max(thumb.size) == uploads.VARIANTS['thumb']
+
+def test_failed_render_is_not_requeued(workdir):
+    _, queue = workdir
+    stored = store_png()
+    key = f"render_upload:{stored['hash']}"
+    queued = queue.enqueue('render_upload', {'digest': stored['hash'], 'src': stored['path']}, key=key,
+                           max_attempts=1)
+    claimed = queue.claim('w1')
+    assert queue.fail(claimed, "cannot identify image file", 'w1') == 'failed'
+    assert uploads.derived_assets.schedule(stored['hash'], stored['path']) == ('unavailable', queued['id'])
+    assert queue.latest(key)['id'] == queued['id']
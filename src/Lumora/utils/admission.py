@@ -0,0 +1,261 @@
+import heapq  # Waiters ordered by priority, then arrival
+import itertools
+import math
+import os
+import sqlite3  # Optional token bucket shared by every worker process
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import jsonify
+
+from utils import metrics  # Admission wait times and rejections
+
+# Default outbound LLM/embedding budget; init_app applies LLM_RATE_PER_SECOND, LLM_BURST,
+# LLM_MAX_CONCURRENT, LLM_MAX_QUEUE and LLM_LIMITER_DB from the app config or the environment.
+# The token bucket is per process unless LLM_LIMITER_DB (e.g. instance/llm_limiter.db) is set
+RATE_PER_SECOND = 20.0  # Sustained request starts per second (0 = no limit)
+BURST = 40  # Starts allowed back to back after an idle spell
+MAX_CONCURRENT = 8  # Requests in flight per process
+MAX_QUEUE = 64  # Callers waiting for admission per process
+
+# Priority classes (lower is admitted first) and how long each may wait for admission
+PRIORITIES = {'interactive': 0, 'background': 1, 'batch': 2}
+MAX_WAIT = {'interactive': 2.0, 'background': 15.0, 'batch': 120.0}
+# Call sites that are not answering a user who is waiting; everything else is interactive
+SITE_PRIORITIES = {'session_index': 'background', 'categorize_spot': 'batch'}
+
+class Overloaded(Exception):
+    """
+    An LLM call could not be admitted before its deadline. status is 429
+    when the request rate is the limit and 503 when every slot or the queue
+    is full; retry_after is a hint in seconds.
+    """
+
+    def __init__(self, message, status, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+# --- Token buckets ---
+class TokenBucket:
+    """
+    In-process token bucket: rate tokens per second, at most burst saved up.
+    """
+
+    def __init__(self, rate=RATE_PER_SECOND, burst=BURST):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        """
+        Take a token if one is available. Returns 0.0 on success, otherwise
+        the seconds until the next token (nothing is taken).
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+class SharedTokenBucket(TokenBucket):
+    """
+    Token bucket kept in a SQLite file so every worker process on the host
+    draws from one budget. Errors fail open (the call is admitted).
+    """
+
+    def __init__(self, path, rate=RATE_PER_SECOND, burst=BURST, name='openai'):
+        super().__init__(rate, burst)
+        self.path = path
+        self.name = name
+        self.local = threading.local()
+
+    def _connection(self):
+        # One connection per thread, and a fresh one after a fork
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("CREATE TABLE IF NOT EXISTS token_buckets "
+                         "(name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+            self.local.conn, self.local.pid = conn, os.getpid()
+        return conn
+
+    def take(self):
+        if self.rate <= 0:
+            return 0.0
+        try:
+            conn = self._connection()
+            now = time.time()  # Wall clock: shared by every process
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT tokens, updated FROM token_buckets WHERE name = ?",
+                                   (self.name,)).fetchone()
+                tokens = self.burst if row is None else min(self.burst, row[0] + max(0.0, now - row[1]) * self.rate)
+                delay = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+                if not delay:
+                    tokens -= 1
+                conn.execute("INSERT OR REPLACE INTO token_buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                             (self.name, tokens, now))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return delay
+        except sqlite3.Error as e:
+            print(f"Limiter DB error: {e}")
+            return 0.0
+
+# --- Priority admission with bounded concurrency ---
+class Limiter:
+    """
+    Admits outbound LLM calls one at a time in priority order: the first
+    waiter runs once a concurrency slot is free and the bucket has a token.
+    A caller whose deadline (MAX_WAIT for its priority) cannot be met is
+    rejected with Overloaded straight away instead of queueing.
+    """
+
+    def __init__(self, bucket, max_concurrent=MAX_CONCURRENT, max_queue=MAX_QUEUE):
+        self.bucket = bucket
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.cond = threading.Condition()
+        self.waiting = []  # Heap of (priority, arrival)
+        self.classes = {}  # Heap entry -> priority class name
+        self.active = 0
+        self.arrivals = itertools.count()
+
+    def _reject(self, priority, reason, status, retry_after, waited=0.0):
+        metrics.observe_admission(priority, waited, reason)
+        return Overloaded(f"LLM capacity exceeded ({reason})", status, max(1, math.ceil(retry_after)))
+
+    def _min_wait(self, ahead):
+        # Lower bound on the wait behind `ahead` callers: each needs a token
+        return ahead / self.bucket.rate if self.bucket.rate > 0 else 0.0
+
+    def check(self, site):
+        """
+        Raise Overloaded now if a call for this site could not currently be
+        admitted in time (used before a streamed response is started).
+        """
+        priority = SITE_PRIORITIES.get(site, 'interactive')
+        with self.cond:
+            if len(self.waiting) >= self.max_queue:
+                raise self._reject(priority, 'queue_full', 503, self._min_wait(len(self.waiting)))
+            ahead = sum(1 for p, _ in self.waiting if p <= PRIORITIES[priority])
+            if self._min_wait(ahead) > MAX_WAIT[priority]:
+                raise self._reject(priority, 'rate_limited', 429, self._min_wait(ahead))
+
+    def acquire(self, site):
+        """
+        Wait for admission of a call from site. Returns the seconds waited;
+        the caller must release() when the call ends.
+        """
+        priority = SITE_PRIORITIES.get(site, 'interactive')
+        start = time.monotonic()
+        deadline = start + MAX_WAIT[priority]
+        with self.cond:
+            if len(self.waiting) >= self.max_queue:
+                raise self._reject(priority, 'queue_full', 503, self._min_wait(len(self.waiting)))
+            entry = (PRIORITIES[priority], next(self.arrivals))
+            heapq.heappush(self.waiting, entry)
+            self.classes[entry] = priority
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self.waiting[0] == entry and self.active < self.max_concurrent:
+                        delay = self.bucket.take()
+                        if not delay:
+                            heapq.heappop(self.waiting)
+                            self.active += 1
+                            self.cond.notify_all()  # The next waiter is now first in line
+                            metrics.observe_admission(priority, now - start, 'admitted')
+                            return now - start
+                        reason, status = 'rate_limited', 429
+                    elif self.active >= self.max_concurrent:
+                        delay, reason, status = 0.0, 'busy', 503
+                    else:
+                        ahead = sum(1 for other in self.waiting if other < entry)
+                        delay, reason, status = self._min_wait(ahead), 'rate_limited', 429
+                    if now + delay > deadline or now >= deadline:
+                        raise self._reject(priority, reason, status, delay or MAX_WAIT[priority], now - start)
+                    # Token waits wake on their own; slot waits are woken by release()
+                    self.cond.wait(min(deadline - now, delay) if delay else deadline - now)
+            except BaseException:
+                if entry in self.classes:
+                    self.waiting.remove(entry)
+                    heapq.heapify(self.waiting)
+                    self.cond.notify_all()
+                raise
+            finally:
+                self.classes.pop(entry, None)
+
+    def configure(self, bucket, max_concurrent, max_queue):
+        """
+        Replace the budget in place (callers hold references to this limiter).
+        """
+        with self.cond:
+            self.bucket = bucket
+            self.max_concurrent = max_concurrent
+            self.max_queue = max_queue
+            self.cond.notify_all()  # Waiters re-check against the new limits
+
+    def release(self):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify_all()
+
+    @contextmanager
+    def slot(self, site):
+        """
+        Hold an admitted slot for the duration of the block.
+        """
+        self.acquire(site)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        """
+        Calls in flight and callers queued per priority class.
+        """
+        with self.cond:
+            queued = dict.fromkeys(PRIORITIES, 0)
+            for priority in self.classes.values():
+                queued[priority] += 1
+            return {'active': self.active, 'max_concurrent': self.max_concurrent, 'queued': queued}
+
+# --- Flask integration ---
+def overloaded_response(error):
+    response = jsonify({'error': 'The assistant is busy, please retry shortly', 'retry_after': error.retry_after})
+    response.status_code = error.status
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def init_app(app):
+    """
+    Configure the shared limiter from app.config, else the environment (read
+    here, not at import, so .env and config overrides apply), and answer
+    Overloaded errors that reach a view with 429/503 and Retry-After.
+    """
+    def setting(name, default=None):
+        return app.config.get(name, os.getenv(name, default))
+
+    rate, burst = float(setting('LLM_RATE_PER_SECOND', RATE_PER_SECOND)), int(setting('LLM_BURST', BURST))
+    shared_db = setting('LLM_LIMITER_DB')
+    bucket = SharedTokenBucket(shared_db, rate, burst) if shared_db else TokenBucket(rate, burst)
+    limiter.configure(bucket, int(setting('LLM_MAX_CONCURRENT', MAX_CONCURRENT)),
+                      int(setting('LLM_MAX_QUEUE', MAX_QUEUE)))
+    app.register_error_handler(Overloaded, overloaded_response)
+
+# Shared per-process limiter (default budget until init_app runs)
+limiter = Limiter(TokenBucket())
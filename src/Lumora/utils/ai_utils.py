@@ -1,18 +1,76 @@
-import openai  # OpenAI API for AI features
+from models import StudySession  # Import database models
+from db import db  # Database session for column-only queries
+from utils.llm_cache import llm_cache  # Cache for repeated LLM prompts
+from utils import openai_client  # Pooled, coalescing OpenAI client
+from utils.spot_catalog import db_catalog, json_catalog  # Indexed in-memory spot catalogs
+from utils.spot_search import search_ids  # Full-text spot search
+from utils.membership import session_members  # Session membership lookups
+from utils.intent_router import intent_router  # Local intent/slot extraction
+from utils.opening_hours import parse_open_at, time_in_text  # open_at / open_now filters
+from utils.jobs import job  # Background job handlers
+import json  # For parsing LLM JSON replies
 import os
-from dotenv import load_dotenv  # For loading environment variables
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")  # Set OpenAI API key
+import time
 
-from models import Spot, User, StudySession  # Import database models
-import json  # For reading JSON spot data
+# 'embeddings' (OpenAI, local fallback on errors) or 'local' (TF-IDF only, no API calls)
+SESSION_MATCH_MODE = os.getenv('SESSION_MATCH_MODE', 'embeddings')
+
+# --- Chat completion through the LLM response cache ---
+def chat_completion(site, messages, model="gpt-3.5-turbo", ttl=None, cacheable=None, **params):
+    """
+    Return the assistant's reply for a chat request. Identical (normalized)
+    requests are answered from the cache; site selects the cache TTL.
+    Replies for which cacheable(reply) is false are returned but not cached.
+    """
+    call = lambda: openai_client.chat(site, model, messages, **params)
+    return llm_cache.get_or_call(site, model, messages, call, ttl=ttl, cacheable=cacheable, **params)
+
+def is_json_object(reply):
+    """
+    Whether a reply parses as a JSON object (what the extraction prompts ask for).
+    """
+    try:
+        return isinstance(json.loads(reply), dict)
+    except (TypeError, ValueError):
+        return False
+
+# --- Streamed chat completion through the LLM response cache ---
+def stream_chat_completion(site, messages, model="gpt-3.5-turbo", ttl=None, **params):
+    """
+    Yield the assistant's reply in chunks as they arrive. A cached reply is
+    yielded as one chunk; a stream that runs to completion is cached, while
+    one that is closed early (client went away) is cancelled upstream.
+    """
+    cached = llm_cache.lookup(site, model, messages, **params)
+    if cached is not None:
+        yield cached
+        return
+    start = time.perf_counter()
+    parts = []
+    upstream = openai_client.stream_chat(site, model, messages, **params)
+    try:
+        for chunk in upstream:
+            parts.append(chunk)
+            yield chunk
+    finally:
+        upstream.close()
+    llm_cache.store(site, model, messages, "".join(parts), time.perf_counter() - start, ttl=ttl, **params)
 
 # --- Helper to parse user queries using OpenAI ---
 def parse_query(query):
     """
-    Uses OpenAI to extract structured info from a user's request.
+    Extract structured info from a user's request: locally when the intent
+    router is confident (also after correcting misspelled vocabulary
+    words), otherwise with OpenAI. If OpenAI fails or its reply is not a
+    JSON object, the corrected local route is used as is.
     Returns a dict with type, noise_level, amenities, activity, subject.
     """
+    route = intent_router.route(query)
+    if not route.confident:
+        route = intent_router.route(intent_router.correct(query))
+    intent_router.count(route, route.confident)
+    if route.confident:
+        return route.parsed()
     prompt = f"""
     Extract the following information from the user's request:
     - type: study or recreation
@@ -24,38 +82,42 @@ def parse_query(query):
     User request: {query}
     """
     try:
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        content = response.choices[0].message.content
+        content = chat_completion('parse_query', [{"role": "user", "content": prompt}], cacheable=is_json_object)
         parsed = json.loads(content)
+        if not isinstance(parsed, dict):
+            raise ValueError(f"expected a JSON object, got {type(parsed).__name__}")
         return parsed
     except Exception as e:
         print(f"OpenAI error: {e}")
-        noise = 'quiet' if 'quiet' in query else None
-        amenities = 'coffee' if 'coffee' in query else None
-        return {'type': 'study', 'noise_level': noise, 'amenities': amenities}
+        return route.parsed()
 
 # --- Recommend spots based on parsed query ---
-def recommend_spots(parsed):
+def recommend_spots(parsed, k=None, preferences=None, allowed_ids=None):
     """
-    Query the Spot database for matching study or recreation spots.
+    Rank spots of the requested type by how well they match the parsed
+    noise level, amenities, activity, location and lat/lon (soft matches,
+    so one unmatched attribute no longer empties the list). open_at or
+    open_now limits the ranking to spots open at that time.
+    preferences is a User.preferences dict: its 'weights' reweight the
+    signals and its attributes fill in what the query leaves out.
+    Returns the k (default DEFAULT_TOP_K) best spots with a score and
+    per-signal explanation.
     """
-    query = Spot.query.filter_by(type=parsed.get('type', 'study'))
-    if parsed.get('noise_level'):
-        query = query.filter_by(noise_level=parsed['noise_level'])
-    if parsed.get('amenities'):
-        query = query.filter(Spot.amenities.contains(parsed['amenities']))
-    if parsed.get('activity'):
-        query = query.filter_by(activity=parsed['activity'])
-    spots = query.all()
-    return [spot_to_dict(s) for s in spots]
+    from utils.spot_ranking import DEFAULT_TOP_K, rank_spots  # NumPy loads on first use
+    catalog = db_catalog()
+    parsed = dict(parsed, type=parsed.get('type') or 'study')
+    open_at = parse_open_at('now' if parsed.get('open_now') else parsed.get('open_at'))
+    if open_at is not None:
+        open_ids = catalog.hours().open_ids(open_at)
+        allowed_ids = open_ids if allowed_ids is None else open_ids & set(allowed_ids)
+    ranked = rank_spots(catalog.features(), parsed, k=k or DEFAULT_TOP_K, preferences=preferences, allowed_ids=allowed_ids)
+    return [dict(spot_to_dict(catalog.records[spot_id]), score=round(score, 4), explanation=explanation)
+            for spot_id, score, explanation in ranked]
 
 # --- Convert Spot model to dictionary ---
 def spot_to_dict(spot):
     """
-    Convert a Spot SQLAlchemy object to a dictionary.
+    Convert a Spot SQLAlchemy object (or catalog SpotRecord) to a dictionary.
     """
     return {
         'id': spot.id,
@@ -66,30 +128,158 @@ def spot_to_dict(spot):
         'hours': spot.hours,
         'noise_level': spot.noise_level,
         'seating': spot.seating,
-        'amenities': spot.amenities
+        'amenities': spot.amenities,
+        'latitude': spot.latitude,
+        'longitude': spot.longitude
     }
 
+# --- Embed a batch of texts with one OpenAI call ---
+def embed_texts(texts, site='embeddings'):
+    """
+    Embed a list of texts in a single OpenAI request.
+    Returns one embedding per text, in order.
+    """
+    from utils.embeddings import EMBEDDING_MODEL  # NumPy loads on first use, not at startup
+    return openai_client.embed(texts, EMBEDDING_MODEL, site=site)
+
+def embed_for_index(texts):
+    """
+    embed_texts for indexing sessions, admitted at background priority.
+    """
+    return embed_texts(texts, site='session_index')
+
+# --- Store the embedding for a newly created or edited session ---
+def index_session(session):
+    """
+    Compute (or reuse) the embedding for a session's subject and add it to
+    the session indexes. Only re-embeds when the subject has changed.
+    """
+    from utils.ann_index import session_index
+    from utils.embeddings import normalize_rows, session_store, subject_hash
+    h = subject_hash(session.subject)
+    if session_index.is_trained():
+        # Large catalogs: the memory-mapped ANN index is the only vector store
+        if session_index.content_hash(session.id) == h:
+            return None
+        vector = normalize_rows(embed_for_index([session.subject]))[0]
+    else:
+        vector = session_store.upsert(session.id, session.subject, embed_for_index)
+        note_session_indexed('embeddings', session.id)
+    session_index.add(session.id, vector, h)
+    if session_index.needs_compaction():
+        if session_index.is_trained():
+            session_index.compact()
+        else:
+            # First training: sessions created before the index existed (or
+            # never indexed) must be in it, since searches then skip the store
+            rebuild_session_index()
+    return vector
+
+@job('index_session')
+def index_session_job(payload):
+    """
+    Background job: embed a session's current subject (queued by create_session).
+    """
+    session = db.session.get(StudySession, payload['session_id'])
+    if session is None:
+        return {'indexed': False}  # Deleted before the job ran
+    index_session_locally(session)
+    index_session(session)
+    return {'indexed': True}
+
+# --- Rebuild the session indexes from the database ---
+def rebuild_session_index():
+    """
+    Reconcile both session indexes with the StudySession table: embed new or
+    changed subjects in one batch, drop deleted sessions and rewrite the ANN
+    index from scratch. Returns the number of indexed sessions.
+    """
+    from utils.ann_index import session_index
+    from utils.embeddings import session_store
+    rows = db.session.query(StudySession.id, StudySession.subject).all()
+    session_store.sync(rows, embed_for_index)
+    if len(session_store):
+        session_index.build(session_store.ids, session_store.matrix, session_store.hashes)
+    return len(session_store)
+
+# --- Keep per-process session indexes in step with the table ---
+_synced = {}  # Index name -> (count, max id) of StudySession when it was last synced here
+
+def sync_sessions(name, sync):
+    """
+    Call sync with every (id, subject) row, but only when sessions were
+    added or deleted since index `name` was last synced in this process,
+    so a read normally costs one COUNT/MAX query.
+    """
+    signature = tuple(db.session.query(db.func.count(StudySession.id), db.func.max(StudySession.id)).one())
+    if _synced.get(name) != signature:
+        sync(db.session.query(StudySession.id, StudySession.subject).all())
+        _synced[name] = signature
+
+def note_session_indexed(name, session_id):
+    """
+    Record that index `name` already holds a session created in this
+    process, so the next read doesn't resync the whole table for it.
+    """
+    signature = _synced.get(name)
+    if signature is not None and (signature[1] is None or session_id > signature[1]):
+        _synced[name] = (signature[0] + 1, session_id)
+
+def index_session_locally(session):
+    """
+    Add a new or edited session to this process's TF-IDF index (no API call).
+    """
+    from utils.text_vectors import session_vectors  # NumPy loads on first use
+    session_vectors.add(session.id, session.subject)
+    note_session_indexed('local', session.id)
+
+# --- Match study sessions with the local TF-IDF index ---
+def match_sessions_locally(input_text, top_k=10):
+    """
+    Rank sessions by hashed character n-gram TF-IDF similarity of their
+    subjects, with no API call. Returns (session_id, score) pairs.
+    """
+    from utils.text_vectors import LOCAL_MIN_SCORE, session_vectors  # NumPy loads on first use
+    # Creates add to the index as they happen; a full sync (only re-vectorizing new or
+    # changed subjects) runs when sessions were added or deleted elsewhere
+    sync_sessions('local', session_vectors.sync)
+    return session_vectors.top_k(input_text, k=top_k, min_score=LOCAL_MIN_SCORE)
+
 # --- Match study sessions using embeddings ---
-def match_study_sessions(user_input):
+def match_study_sessions(user_input, top_k=10, min_score=0.8, nprobe=None, mode=None):
     """
     Use OpenAI embeddings to match user input to study sessions.
+    Session embeddings come from the persisted store, so a lookup costs one
+    embedding call for the input plus a single matrix-vector product. Once
+    there are enough sessions, the ANN index is searched instead; nprobe
+    trades recall for latency there (None uses the index default).
+    mode 'local' (default SESSION_MATCH_MODE) skips the API and ranks with
+    the local TF-IDF index, which is also the fallback when the API fails
+    (min_score is on the embedding scale, so local matches use
+    LOCAL_MIN_SCORE instead).
+    Returns up to top_k sessions scoring at least min_score, best first.
     """
-    sessions = StudySession.query.all()
+    from utils.ann_index import session_index
+    from utils.embeddings import session_store
+    input_text = f"{user_input.get('subject','')} {user_input.get('topic','')} {user_input.get('difficulty','')}"
+    local_text = f"{user_input.get('subject','')} {user_input.get('topic','')}"  # Difficulty words only add noise here
     try:
-        input_text = f"{user_input.get('subject','')} {user_input.get('topic','')} {user_input.get('difficulty','')}"
-        input_emb = openai.embeddings.create(input=[input_text], model="text-embedding-ada-002").data[0].embedding
-        matches = []
-        for session in sessions:
-            session_text = f"{session.subject}"
-            session_emb = openai.embeddings.create(input=[session_text], model="text-embedding-ada-002").data[0].embedding
-            sim = cosine_similarity(input_emb, session_emb)
-            if sim > 0.8:
-                matches.append(session_to_dict(session))
-        return matches
+        if (mode or SESSION_MATCH_MODE) == 'local':
+            ranked = match_sessions_locally(local_text, top_k)
+        elif session_index.is_trained():
+            input_emb = embed_texts([input_text])[0]
+            ranked = session_index.search(input_emb, k=top_k, nprobe=nprobe, min_score=min_score)
+        else:
+            # Only embeds new or changed subjects, and only when sessions were added or deleted
+            sync_sessions('embeddings', lambda rows: session_store.sync(rows, embed_texts))
+            input_emb = embed_texts([input_text])[0]
+            ranked = session_store.top_k(input_emb, k=top_k, min_score=min_score)
     except Exception as e:
         print(f"OpenAI error: {e}")
-        matches = [session_to_dict(s) for s in sessions if user_input.get('subject','').lower() in s.subject.lower()]
-        return matches
+        ranked = match_sessions_locally(local_text, top_k)
+    by_id = {s.id: s for s in StudySession.query.filter(StudySession.id.in_([sid for sid, _ in ranked])).all()}
+    members = session_members(list(by_id))
+    return [session_to_dict(by_id[sid], members[sid]) for sid, _ in ranked if sid in by_id]
 
 # --- Cosine similarity for embeddings ---
 def cosine_similarity(vec1, vec2):
@@ -102,93 +292,84 @@ def cosine_similarity(vec1, vec2):
     return float(np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2)))
 
 # --- Convert StudySession model to dictionary ---
-def session_to_dict(session):
+def session_to_dict(session, members=None):
     """
     Convert a StudySession SQLAlchemy object to a dictionary.
+    members: the session's user ids (from session_members), fetched by the caller in bulk.
     """
     return {
         'id': session.id,
         'subject': session.subject,
         'spot_id': session.spot_id,
         'user_id': session.user_id,
-        'joined_users': session.joined_users
+        'joined_users': members if members is not None else session_members([session.id])[session.id],
+        'member_count': session.member_count,
+        'capacity': session.capacity
     }
 
 # --- Categorize recreation spots using OpenAI ---
+SPOT_ACTIVITIES = ["soccer", "basketball", "swimming", "tennis", "running", "gym", "park", "other"]
+
 def categorize_spot(name, description):
     """
     Use OpenAI to classify a recreation spot's activity.
     """
     prompt = f"""
-    Classify the following spot into one of these activities: soccer, basketball, swimming, tennis, running, gym, park, other.
+    Classify the following spot into one of these activities: {", ".join(SPOT_ACTIVITIES)}.
     Return only the activity name.
     Spot: {name}
     Description: {description}
     """
     try:
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        activity = response.choices[0].message.content.strip().lower()
+        activity = chat_completion('categorize_spot', [{"role": "user", "content": prompt}]).strip().lower()
         return activity
     except Exception as e:
         print(f"OpenAI error: {e}")
         return "other"
 
 # --- Main conversation helper for Lumora chatbot ---
-def conversation_helper(user_query):
+def conversation_helper(user_query, stream=False):
     """
     Main helper function for Lumora chatbot to process user queries.
     Determines if the query is about study, recreation, or a general question.
+    With stream=True a study answer is returned as "answer_stream", an
+    iterator of text chunks, instead of a complete "answer".
     """
-    # Keywords for different types of queries
-    study_keywords = ["solve", "explain", "help", "question", "math", "science", "history", "english", "biology", "physics", "chemistry", "calculate", "who", "what", "when", "where", "why", "how"]
-    location_keywords = ["location", "where", "place", "spot", "specific", "library", "milpitas", "san jose", "online"]
-    recreation_keywords = ["recreation", "play", "park", "basketball", "pickleball", "tennis", "hiking", "hang-gliding", "dog park"]
-
-    # Load study and recreation spots from JSON file
-    with open("backend/spots.json", "r") as f:
-        data = json.load(f)
-
-    # If it's a study question and not a location query, use OpenAI to answer
-    if any(word in user_query.lower() for word in study_keywords) and not any(word in user_query.lower() for word in location_keywords):
-        prompt = f"You are Lumora, a friendly campus assistant. Help the student with their study question: {user_query}"
-        client = openai.OpenAI()
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are Lumora, a helpful assistant for kids. Answer study questions clearly and simply."},
-                {"role": "user", "content": user_query}
-            ]
-        )
-        return [{"type": "study_answer", "answer": response.choices[0].message.content}]
-
-    # If the query is about study spots (location-specific), return from JSON
-    if any(word in user_query.lower() for word in location_keywords):
-        result = []
-        for spot in data["study_spots"]:
-            result.append({
-                "type": "study",
-                "name": spot["name"],
-                "location": spot["location"],
-                "noise_level": spot.get("noise_level", "unknown")
-            })
-        return result
-
-    # If the query is about recreation spots, return from JSON
-    if any(word in user_query.lower() for word in recreation_keywords):
-        result = []
-        for spot in data["recreation_spots"]:
-            result.append({
-                "type": "recreation",
-                "name": spot["name"],
-                "location": spot["location"],
-                "activity": spot.get("activity", "unknown"),
-                "amenities": spot.get("amenities", "unknown")
-            })
-        return result
+    route = intent_router.route(user_query)
+    intent_router.count(route, route.confident)
+    open_at = time_in_text(user_query)  # "open at 11pm"
+    if open_at is None and route.slots.get('open_now'):
+        open_at = parse_open_at('now')
+    # spots.json has no opening hours, so time-bound questions use the database catalog
+    spot_catalog = json_catalog if open_at is None else db_catalog
+
+    # A confident study question (not about a place) goes straight to OpenAI for an answer
+    if route.confident and route.intent == 'study_question':
+        messages = [
+            {"role": "system", "content": "You are Lumora, a helpful assistant for kids. Answer study questions clearly and simply."},
+            {"role": "user", "content": user_query}
+        ]
+        if stream:
+            return [{"type": "study_answer", "answer_stream": stream_chat_completion('conversation_helper', messages)}]
+        answer = chat_completion('conversation_helper', messages)
+        return [{"type": "study_answer", "answer": answer}]
+
+    # If the query is about study spots (location-specific), return from the JSON catalog
+    if route.confident and route.intent == 'study_spot':
+        return [
+            {"type": "study", "name": spot.name, "location": spot.location, "noise_level": spot.noise_level}
+            for spot in spot_catalog().filter(type="study", open_at=open_at)
+        ]
+
+    # If the query is about recreation spots, return from the JSON catalog
+    if route.confident and route.intent == 'recreation':
+        return [
+            {"type": "recreation", "name": spot.name, "location": spot.location,
+             "activity": spot.activity, "amenities": spot.amenities}
+            for spot in spot_catalog().filter(type="recreation", open_at=open_at)
+        ]
 
+    # Low confidence: let the model extract the filters
     prompt = f"""
     You are an assistant for a campus app. Given a user's question, extract:
     - type: study or recreation
@@ -196,6 +377,7 @@ def conversation_helper(user_query):
     - subject (if study)
     - location (if mentioned)
     - any other relevant filters (noise_level, amenities)
+    - open_at (if they ask what is open at a time: "now" or a time like "23:00")
     Return as a JSON object.
     
     Examples:
@@ -213,30 +395,16 @@ def conversation_helper(user_query):
     User question: {user_query}
     """
     try:
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        content = response.choices[0].message.content
+        content = chat_completion('conversation_helper', [{"role": "user", "content": prompt}],
+                                  cacheable=is_json_object)
         params = json.loads(content)
-        # Use params to query spots
-        query = Spot.query
-        if params.get('type'):
-            query = query.filter_by(type=params['type'])
-        if params.get('activity'):
-            query = query.filter_by(activity=params['activity'])
-        if params.get('subject'):
-            query = query.filter(Spot.amenities.contains(params['subject']))
-        if params.get('location'):
-            query = query.filter_by(location=params['location'])
-        if params.get('noise_level'):
-            query = query.filter_by(noise_level=params['noise_level'])
-        if params.get('amenities'):
-            query = query.filter(Spot.amenities.contains(params['amenities']))
+        # Rank the spot catalog by the extracted params (seating words score with amenities)
         if params.get('seating'):
-            query = query.filter(Spot.seating.contains(params['seating']))
-        spots = query.all()
-        return [spot_to_dict(s) for s in spots]
+            params['amenities'] = f"{params.get('amenities') or ''} {params['seating']}"
+        if open_at is not None:
+            params['open_at'] = open_at  # Parsed locally, more reliably than by the model
+        allowed = search_ids(params['subject'], columns=['amenities']) if params.get('subject') else None
+        return recommend_spots(params, allowed_ids=allowed)
     except Exception as e:
         print(f"OpenAI error: {e}")
         return []
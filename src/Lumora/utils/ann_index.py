@@ -0,0 +1,325 @@
+import json  # Index metadata
+import os
+import threading  # Guard the index across request threads
+from contextlib import contextmanager
+
+import numpy as np  # Vector math for embeddings
+
+from utils.embeddings import normalize_rows
+
+try:
+    import fcntl  # Cross-process write lock (POSIX)
+except ImportError:  # Windows: writers are only serialized within a process
+    fcntl = None
+
+INDEX_PATH = os.path.join('instance', 'session_ann')
+DEFAULT_NPROBE = 8  # Inverted lists scanned per query (higher = better recall, slower)
+MIN_TRAIN_ROWS = 1024  # Below this an exact scan is fast enough
+COMPACT_RATIO = 0.2  # Compact once this share of rows are deleted
+CHUNK_ROWS = 8192  # Rows processed at a time when rewriting the index
+
+# --- Spherical k-means for the coarse quantizer ---
+def train_centroids(vectors, nlist, iterations=10, seed=0):
+    """
+    Cluster unit-length vectors into nlist centroids on a sample of rows.
+    """
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), nlist * 64)
+    sample = normalize_rows(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))])
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        empty = np.bincount(assign, minlength=nlist) == 0
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]  # Reseed empty lists
+        centroids = normalize_rows(sums)
+    return centroids
+
+# --- Memory-mapped inverted-file (IVF) index for session embeddings ---
+class IVFIndex:
+    """
+    Approximate nearest-neighbour index over unit-length embeddings.
+
+    Rows live in append-only files that every worker memory-maps, so the
+    vectors are shared through the page cache instead of copied per process.
+    Vectors are bucketed by their nearest centroid and a query only scans
+    the nprobe closest buckets. Adds append a row, deletes set a tombstone,
+    and compact() rewrites the files without tombstones (retraining the
+    centroids when the index has grown or shrunk a lot).
+    """
+
+    FILES = {'ids': np.int64, 'hashes': 'S16', 'lists': np.int32, 'deleted': np.uint8}
+
+    def __init__(self, path=INDEX_PATH, nprobe=DEFAULT_NPROBE, min_train_rows=MIN_TRAIN_ROWS,
+                 compact_ratio=COMPACT_RATIO):
+        self.path = path
+        self.nprobe = nprobe
+        self.min_train_rows = min_train_rows
+        self.compact_ratio = compact_ratio
+        self.lock = threading.RLock()
+        self.meta = None
+        self.rows = 0
+        self.arrays = {}
+        self.centroids = None
+        self.order = None
+        self.offsets = None
+        self.grouped_rows = 0
+
+    # --- File layout ---
+    def _file(self, name, gen):
+        return os.path.join(self.path, f"{name}.{gen}.bin")
+
+    def _read_meta(self):
+        try:
+            with open(os.path.join(self.path, 'meta.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, meta):
+        tmp_path = os.path.join(self.path, f"meta.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(self.path, 'meta.json'))
+
+    def _map(self, name, gen, rows, mode='r'):
+        dtype = np.float32 if name == 'vectors' else self.FILES[name]
+        shape = (rows, self.meta['dim']) if name == 'vectors' else (rows,)
+        if rows == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self._file(name, gen), dtype=dtype, mode=mode, shape=shape)
+
+    @contextmanager
+    def _writer(self):
+        """
+        Serialize writers across threads and (on POSIX) across processes.
+        """
+        with self.lock:
+            os.makedirs(self.path, exist_ok=True)
+            with open(os.path.join(self.path, 'lock'), 'a') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self.refresh()
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # --- Reading ---
+    def refresh(self):
+        """
+        Re-open the memory maps if another process appended rows or
+        swapped in a compacted generation.
+        """
+        with self.lock:
+            meta = self._read_meta()
+            if meta is None:
+                self.meta, self.rows, self.arrays, self.centroids = None, 0, {}, None
+                return
+            try:
+                rows = os.path.getsize(self._file('ids', meta['gen'])) // 8  # ids are written last
+            except OSError:
+                rows = 0
+            if self.meta == meta and rows == self.rows:
+                return
+            same_gen = self.meta == meta
+            self.meta, self.rows = meta, rows
+            self.arrays = {name: self._map(name, meta['gen'], rows) for name in ['vectors', *self.FILES]}
+            if not same_gen:
+                self.centroids = np.load(os.path.join(self.path, f"centroids.{meta['gen']}.npy")) if meta['nlist'] else None
+            # Rows appended since the lists were grouped are scanned as a tail
+            # until it grows past a tenth of the index
+            if self.centroids is not None and (not same_gen or rows - self.grouped_rows > rows // 10):
+                # Row numbers grouped by inverted list, plus where each list starts
+                lists = np.asarray(self.arrays['lists'])
+                self.order = np.argsort(lists, kind='stable').astype(np.int64)
+                counts = np.bincount(lists, minlength=meta['nlist'])
+                self.offsets = np.concatenate([[0], np.cumsum(counts)])
+                self.grouped_rows = rows
+
+    def is_trained(self):
+        """
+        True once the coarse quantizer exists and ANN search is in use.
+        """
+        self.refresh()
+        return bool(self.meta and self.meta['nlist'])
+
+    def __len__(self):
+        self.refresh()
+        return int(self.rows - np.count_nonzero(self.arrays['deleted'])) if self.rows else 0
+
+    def _live_rows(self, session_id):
+        ids = self.arrays.get('ids')
+        if ids is None or not len(ids):
+            return np.zeros(0, dtype=np.int64)
+        rows = np.nonzero(ids == int(session_id))[0]
+        return rows[self.arrays['deleted'][rows] == 0]
+
+    def content_hash(self, session_id):
+        """
+        Return the subject hash stored for a session, or None if absent.
+        """
+        self.refresh()
+        rows = self._live_rows(session_id)
+        return bytes(self.arrays['hashes'][rows[-1]]) if len(rows) else None
+
+    def search(self, query_vector, k=10, nprobe=None, min_score=None):
+        """
+        Return up to k (session_id, score) pairs, best first. nprobe trades
+        recall for latency; scanning every list gives exact results.
+        """
+        self.refresh()
+        if not self.rows:
+            return []
+        q = normalize_rows(query_vector)
+        vectors, deleted = self.arrays['vectors'], self.arrays['deleted']
+        if self.centroids is None:
+            rows = np.arange(self.rows)
+        else:
+            nprobe = min(nprobe or self.nprobe, len(self.centroids))
+            probe = np.argpartition(-(self.centroids @ q), nprobe - 1)[:nprobe]
+            tail = np.arange(self.grouped_rows, self.rows)
+            tail = tail[np.isin(self.arrays['lists'][tail], probe)]
+            rows = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probe] + [tail])
+        rows = rows[deleted[rows] == 0]
+        if not len(rows):
+            return []
+        scores = vectors[rows] @ q
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        if min_score is not None:
+            top = top[scores[top] >= min_score]
+        ids = self.arrays['ids']
+        return [(int(ids[rows[i]]), float(scores[i])) for i in top]
+
+    # --- Writing ---
+    def add(self, session_id, vector, content_hash=b''):
+        """
+        Append (or replace) the embedding for one session.
+        """
+        vector = normalize_rows(vector)
+        with self._writer():
+            if self.meta is None:
+                self.meta = {'dim': len(vector), 'gen': 0, 'nlist': 0, 'trained_rows': 0}
+                self._write_meta(self.meta)
+            self._tombstone(session_id)
+            gen = self.meta['gen']
+            assign = int(np.argmax(self.centroids @ vector)) if self.meta['nlist'] else -1
+            # ids go last: readers treat its length as the committed row count
+            for name, value in [('vectors', vector), ('hashes', np.asarray([content_hash], dtype='S16')),
+                                ('lists', np.asarray([assign], dtype=np.int32)),
+                                ('deleted', np.zeros(1, dtype=np.uint8)),
+                                ('ids', np.asarray([session_id], dtype=np.int64))]:
+                with open(self._file(name, gen), 'ab') as f:
+                    f.write(np.ascontiguousarray(value).tobytes())
+
+    def remove(self, session_id):
+        """
+        Tombstone a session so searches skip it until the next compaction.
+        """
+        with self._writer():
+            self._tombstone(session_id)
+
+    def _tombstone(self, session_id):
+        rows = self._live_rows(session_id)
+        if len(rows):
+            deleted = self._map('deleted', self.meta['gen'], self.rows, mode='r+')
+            deleted[rows] = 1
+            deleted.flush()
+
+    def needs_compaction(self):
+        """
+        True when tombstones pile up, or when the index should be (re)trained.
+        """
+        self.refresh()
+        if not self.rows:
+            return False
+        live = len(self)
+        trained = self.meta['trained_rows']
+        if not self.meta['nlist']:
+            return live >= self.min_train_rows
+        return (self.rows - live > self.compact_ratio * self.rows
+                or live > 4 * trained or live < trained / 4)
+
+    def maybe_compact(self):
+        """
+        Compact if needs_compaction() says so. Returns True if it ran.
+        """
+        if not self.needs_compaction():
+            return False
+        self.compact()
+        return True
+
+    def compact(self):
+        """
+        Rewrite the index without tombstoned rows as a new generation,
+        retraining the centroids when the live row count has changed a lot.
+        """
+        with self._writer():
+            if not self.rows:
+                return
+            live = np.nonzero(self.arrays['deleted'] == 0)[0]
+            self._write_generation(self.arrays['ids'][live], self.arrays['hashes'][live],
+                                   self.arrays['vectors'], live)
+
+    def build(self, ids, vectors, hashes=None):
+        """
+        Replace the whole index with the given rows.
+        """
+        vectors = normalize_rows(vectors)
+        hashes = np.asarray(hashes if hashes is not None else [b''] * len(ids), dtype='S16')
+        with self._writer():
+            if self.meta is None:
+                self.meta = {'dim': vectors.shape[1], 'gen': 0, 'nlist': 0, 'trained_rows': 0}
+            self.meta['dim'] = vectors.shape[1]
+            self._write_generation(np.asarray(ids, dtype=np.int64), hashes, vectors, np.arange(len(ids)))
+
+    def _write_generation(self, ids, hashes, source_vectors, source_rows):
+        old_meta = dict(self.meta)
+        live = len(source_rows)
+        meta = {'dim': old_meta['dim'], 'gen': old_meta['gen'] + 1,
+                'nlist': old_meta['nlist'], 'trained_rows': old_meta['trained_rows']}
+        gen = meta['gen']
+        with open(self._file('vectors', gen), 'wb') as f:
+            for start in range(0, live, CHUNK_ROWS):
+                f.write(np.ascontiguousarray(source_vectors[source_rows[start:start + CHUNK_ROWS]],
+                                             dtype=np.float32).tobytes())
+        vectors = np.memmap(self._file('vectors', gen), dtype=np.float32, mode='r',
+                            shape=(live, meta['dim'])) if live else np.zeros((0, meta['dim']), np.float32)
+
+        trained = meta['trained_rows']
+        retrain = live >= self.min_train_rows and (not meta['nlist'] or live > 4 * trained or live < trained / 4)
+        if live < self.min_train_rows:
+            centroids = None
+            meta['nlist'], meta['trained_rows'] = 0, 0
+        elif retrain:
+            centroids = train_centroids(vectors, max(1, int(np.sqrt(live))))
+            meta['nlist'], meta['trained_rows'] = len(centroids), live
+        else:
+            centroids = self.centroids
+        if centroids is not None:
+            np.save(os.path.join(self.path, f"centroids.{gen}.npy"), centroids)
+            lists = np.concatenate([np.argmax(vectors[s:s + CHUNK_ROWS] @ centroids.T, axis=1)
+                                    for s in range(0, live, CHUNK_ROWS)] or [np.zeros(0)]).astype(np.int32)
+        else:
+            lists = np.full(live, -1, dtype=np.int32)
+
+        for name, value in [('hashes', hashes), ('lists', lists),
+                            ('deleted', np.zeros(live, dtype=np.uint8)), ('ids', ids)]:
+            with open(self._file(name, gen), 'wb') as f:
+                f.write(np.ascontiguousarray(value, dtype=self.FILES[name]).tobytes())
+        self._write_meta(meta)
+
+        # Old files stay readable to processes that still have them mapped
+        for name in ['vectors', 'centroids', *self.FILES]:
+            old = (os.path.join(self.path, f"centroids.{old_meta['gen']}.npy") if name == 'centroids'
+                   else self._file(name, old_meta['gen']))
+            if os.path.exists(old):
+                os.remove(old)
+        self.refresh()
+
+# Shared per-process index
+session_index = IVFIndex()
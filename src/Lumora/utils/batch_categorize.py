@@ -0,0 +1,180 @@
+import hashlib  # Content hashes for spots
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from sqlalchemy import insert, select, update
+
+from db import db
+from models import Spot, SpotCategory
+from utils import openai_client  # Pooled, coalescing OpenAI client
+from utils.ai_utils import SPOT_ACTIVITIES
+from utils.jobs import job  # Background job handlers
+
+BATCH_SIZE = 25  # Spots per request
+CONCURRENCY = 4  # Requests in flight
+REQUESTS_PER_MINUTE = 60
+UNLABELED = (None, '', 'unknown')
+
+# --- Content hash of what the model sees ---
+def spot_hash(name, description):
+    """
+    Hash a spot's name and description; identical text is never classified twice.
+    """
+    normalized = " ".join(f"{name}\n{description}".lower().split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+def spot_description(spot):
+    """
+    Description text for a Spot row (spots have no free-text description).
+    """
+    return "; ".join(part for part in (spot.amenities, spot.seating, spot.location) if part and part != 'unknown')
+
+# --- Request pacing shared by the worker threads ---
+class RateLimiter:
+    """
+    Spaces request starts evenly so at most per_minute begin each minute.
+    """
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute
+        self.next_start = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+# --- Classify one batch with a single structured-output request ---
+def classify_batch(items, model="gpt-3.5-turbo"):
+    """
+    items: list of (key, name, description). Returns {key: activity}; labels
+    outside SPOT_ACTIVITIES become 'other'.
+    """
+    listing = "\n".join(
+        json.dumps({"id": str(i), "name": name, "description": description})
+        for i, (_, name, description) in enumerate(items)
+    )
+    prompt = f"""
+    Classify each spot below into one of these activities: {", ".join(SPOT_ACTIVITIES)}.
+    Return a JSON object mapping every spot id to its activity name, e.g. {{"0": "park", "1": "gym"}}.
+    Spots (one JSON object per line):
+    {listing}
+    """
+    content = openai_client.chat('categorize_spot', model, [{"role": "user", "content": prompt}],
+                                 response_format={"type": "json_object"})
+    labels = json.loads(content)
+    results = {}
+    for i, (key, _, _) in enumerate(items):
+        activity = str(labels.get(str(i), 'other')).strip().lower()
+        results[key] = activity if activity in SPOT_ACTIVITIES else 'other'
+    return results
+
+# --- Label cache writes that tolerate a concurrent run ---
+def _insert_categories(rows):
+    """
+    Cache new labels, skipping hashes another run stored in the meantime
+    (identical text gets the same label either way).
+    """
+    table = SpotCategory.__table__
+    dialect = db.engine.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        db.session.execute(dialect_insert(table).on_conflict_do_nothing(index_elements=['content_hash']), rows)
+        return
+    existing = set(db.session.execute(
+        select(table.c.content_hash).where(table.c.content_hash.in_([r['content_hash'] for r in rows]))).scalars())
+    rows = [r for r in rows if r['content_hash'] not in existing]
+    if rows:
+        db.session.execute(insert(table), rows)
+
+# --- Bulk pipeline ---
+def categorize_spots(spots, batch_size=BATCH_SIZE, concurrency=CONCURRENCY,
+                     requests_per_minute=REQUESTS_PER_MINUTE, progress=print):
+    """
+    Label Spot rows' activity in bulk. Cached labels (by content hash) are
+    reused; the rest are classified batch_size at a time with up to
+    concurrency requests in flight under a rate limit. Labels are written
+    back in one bulk UPDATE. Must run inside an app context.
+    Returns a stats dict.
+    """
+    started = time.perf_counter()
+    hashes = {spot.id: spot_hash(spot.name, spot_description(spot)) for spot in spots}
+    texts = {hashes[spot.id]: (spot.name, spot_description(spot)) for spot in spots}
+
+    labels = {}
+    unique = list(texts)
+    for start in range(0, len(unique), 500):
+        chunk = unique[start:start + 500]
+        for row in SpotCategory.query.filter(SpotCategory.content_hash.in_(chunk)):
+            labels[row.content_hash] = row.activity
+    cached = len(labels)
+
+    pending = [(h, *texts[h]) for h in unique if h not in labels]
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    limiter = RateLimiter(requests_per_minute)
+    failed = 0
+
+    def run(batch):
+        limiter.wait()
+        return classify_batch(batch)
+
+    fresh = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(run, batch): batch for batch in batches}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                fresh.update(future.result())
+            except Exception as e:
+                failed += len(futures[future])
+                print(f"OpenAI error: {e}")
+            if progress:
+                elapsed = time.perf_counter() - started
+                progress(f"batch {done}/{len(batches)}: {len(fresh)} classified, "
+                         f"{len(fresh) / elapsed:.1f} spots/s")
+    labels.update(fresh)
+
+    # Cache new labels and write activities back in bulk
+    if fresh:
+        _insert_categories([{'content_hash': h, 'activity': a} for h, a in fresh.items()])
+    updates = [{'id': spot.id, 'activity': labels[hashes[spot.id]]}
+               for spot in spots if hashes[spot.id] in labels and spot.activity != labels[hashes[spot.id]]]
+    if updates:
+        db.session.execute(update(Spot), updates)
+    db.session.commit()
+
+    elapsed = time.perf_counter() - started
+    return {'spots': len(spots), 'cached': cached, 'classified': len(fresh), 'failed': failed,
+            'updated': len(updates), 'requests': len(batches), 'seconds': round(elapsed, 2),
+            'spots_per_second': round(len(spots) / elapsed, 1) if elapsed else None}
+
+def spots_to_categorize(include_labeled=False):
+    """
+    Recreation spots without an activity label (or all of them).
+    """
+    query = Spot.query.filter_by(type='recreation')
+    if not include_labeled:
+        # IN never matches NULL, so None needs its own clause ('' must stay in the list)
+        query = query.filter(db.or_(Spot.activity.is_(None),
+                                    Spot.activity.in_([v for v in UNLABELED if v is not None])))
+    return query.all()
+
+@job('categorize_spots', lease=3600)
+def categorize_spots_job(payload):
+    """
+    Background job: label unlabeled recreation spots (or all with
+    payload['all']). Batches that failed are retried with the job's
+    backoff; labels already written are kept.
+    """
+    stats = categorize_spots(spots_to_categorize(include_labeled=bool(payload.get('all'))), progress=None)
+    if stats['failed']:
+        raise RuntimeError(f"{stats['failed']} spots could not be classified: {stats}")
+    return stats
@@ -0,0 +1,313 @@
+import hashlib  # Content hashes for subjects
+import os
+import threading  # Guard the store across request threads
+from contextlib import contextmanager
+
+import numpy as np  # Vector math for embeddings
+
+try:
+    import fcntl  # Cross-process write lock (POSIX)
+except ImportError:  # Windows: writers are only serialized within a process
+    fcntl = None
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
+STORE_PATH = os.path.join('instance', 'session_embeddings.npz')
+LOG_HEADER_BYTES = 16  # int64 dimension + int64 snapshot token
+COMPACT_MIN_ROWS = 1024  # Fold the log into a new snapshot once it holds this many rows
+COMPACT_RATIO = 0.25  # ... and at least this share of the store
+
+# --- Content hash of a session subject ---
+def subject_hash(text):
+    """
+    Hash a subject after normalizing case and whitespace, so an embedding
+    only has to be recomputed when the subject actually changes.
+    """
+    normalized = " ".join((text or "").lower().split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16].encode("ascii")
+
+# --- Normalize embedding rows to unit length ---
+def normalize_rows(matrix):
+    """
+    Scale each row to unit length so a dot product is a cosine similarity.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+# --- Persisted float32 embedding matrix for study sessions ---
+class EmbeddingStore:
+    """
+    Keeps one unit-length float32 embedding per study session, keyed by
+    session id and tagged with the content hash of the subject it was
+    computed from. On disk it is a snapshot (.npz) plus an append-only log
+    of rows written since: a write appends one record, and the log is folded
+    into a new snapshot only once it has grown past a share of the store.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self.log_path = f"{path}.log"
+        self.lock = threading.RLock()
+        self._reset()
+        self.loaded = False
+        self.mtime = None  # Of the snapshot as last loaded or saved here
+
+    def _reset(self):
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.hashes = np.zeros(0, dtype='S16')
+        self.matrix = None
+        self.rows = {}
+        self.buffers = None  # (ids, hashes, matrix) with room to append in place
+        self.token = None  # Pairs the snapshot with the log written after it
+        self.log_offset = 0  # Bytes of the log applied so far
+
+    def __len__(self):
+        return len(self.ids)
+
+    # --- Reading ---
+    def load(self):
+        """
+        Load the snapshot on first use, or again whenever another process
+        has written a new one, then apply rows appended to the log since.
+        """
+        with self.lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if not self.loaded or mtime != self.mtime:
+                self._reset()
+                self.loaded, self.mtime = True, mtime
+                if mtime is not None:
+                    try:
+                        with np.load(self.path) as data:
+                            self._set(data['ids'], data['hashes'], data['matrix'])
+                            self.token = int(data['token']) if 'token' in data else None
+                    except Exception as e:
+                        print(f"Embedding store load error: {e}")
+            self._replay()
+
+    def _record_dtype(self, dim):
+        return np.dtype([('id', '<i8'), ('hash', 'S16'), ('vector', '<f4', (dim,))])
+
+    def _replay(self):
+        try:
+            with open(self.log_path, 'rb') as f:
+                header = np.frombuffer(f.read(LOG_HEADER_BYTES), dtype='<i8')
+                if len(header) < 2:
+                    return
+                dim, token = int(header[0]), int(header[1])
+                if self.token is None and self.mtime is None:
+                    self.token = token  # Log written before any snapshot
+                if token != self.token:
+                    return  # Belongs to another snapshot; a newer one will be loaded
+                dtype = self._record_dtype(dim)
+                offset = max(self.log_offset, LOG_HEADER_BYTES)
+                f.seek(offset)
+                data = f.read()
+        except OSError:
+            return
+        count = len(data) // dtype.itemsize  # A record still being written is read next time
+        if not count:
+            return
+        self._apply(np.frombuffer(data[:count * dtype.itemsize], dtype=dtype))
+        self.log_offset = offset + count * dtype.itemsize
+
+    def _apply(self, records):
+        # The last record per session wins; an empty hash removes the session
+        latest = {}
+        for i, sid in enumerate(records['id'].tolist()):
+            latest[sid] = i
+        removed, new = [], []
+        for sid, i in latest.items():
+            row = self.rows.get(sid)
+            if not records['hash'][i]:
+                if row is not None:
+                    removed.append(row)
+            elif row is None:
+                new.append(i)
+            else:
+                self.hashes[row] = records['hash'][i]
+                self.matrix[row] = records['vector'][i]
+        if removed:
+            keep = np.ones(len(self.ids), dtype=bool)
+            keep[removed] = False
+            self._set(self.ids[keep], self.hashes[keep], self.matrix[keep])
+        if new:
+            self._append(records['id'][new], records['hash'][new], records['vector'][new])
+
+    def _set(self, ids, hashes, matrix):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.hashes = np.asarray(hashes, dtype='S16')
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.rows = {int(i): row for row, i in enumerate(self.ids)}
+        self.buffers = (self.ids, self.hashes, self.matrix)
+
+    def _append(self, ids, hashes, vectors):
+        # Grow the buffers geometrically so appends don't copy the whole matrix each time
+        n, m = len(self.ids), len(self.ids) + len(ids)
+        if self.matrix is None or m > len(self.buffers[0]):
+            dim = vectors.shape[1] if self.matrix is None else self.matrix.shape[1]
+            capacity = max(m, 2 * n, 64)
+            buffers = (np.empty(capacity, dtype=np.int64), np.empty(capacity, dtype='S16'),
+                       np.empty((capacity, dim), dtype=np.float32))
+            if n:
+                buffers[0][:n], buffers[1][:n], buffers[2][:n] = self.ids, self.hashes, self.matrix
+            self.buffers = buffers
+        buf_ids, buf_hashes, buf_matrix = self.buffers
+        buf_ids[n:m], buf_hashes[n:m], buf_matrix[n:m] = ids, hashes, vectors
+        self.ids, self.hashes, self.matrix = buf_ids[:m], buf_hashes[:m], buf_matrix[:m]
+        self.rows.update((int(sid), row) for row, sid in enumerate(ids.tolist(), start=n))
+
+    # --- Writing ---
+    def save(self):
+        """
+        Atomically write a snapshot of every row and start an empty log.
+        """
+        with self.lock:
+            if self.matrix is None:
+                return
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            token = int.from_bytes(os.urandom(7), 'little')
+            tmp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+            np.savez(tmp_path, ids=self.ids, hashes=self.hashes, matrix=self.matrix, token=token)
+            # Snapshot first: until the new log replaces the old one, readers skip the old log
+            os.replace(tmp_path, self.path)
+            tmp_log = f"{self.log_path}.{os.getpid()}.tmp"
+            with open(tmp_log, 'wb') as f:
+                f.write(np.asarray([self.matrix.shape[1], token], dtype='<i8').tobytes())
+            os.replace(tmp_log, self.log_path)
+            self.mtime, self.token, self.log_offset = os.stat(self.path).st_mtime_ns, token, LOG_HEADER_BYTES
+
+    @contextmanager
+    def _writer(self):
+        """
+        Serialize writers across threads and (on POSIX) across processes,
+        so web workers and job workers appending at once never lose rows.
+        """
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(f"{self.path}.lock", 'a') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self.load()  # Catch up with other writers before appending
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write(self, ids, hashes, vectors):
+        """
+        Append rows (an empty hash removes a session) to the log and apply them.
+        """
+        with self._writer():
+            dim = vectors.shape[1]
+            if self.token is None or not os.path.exists(self.log_path):
+                if self.matrix is not None:
+                    self.save()  # Snapshot from before the log existed
+                else:
+                    self.token = int.from_bytes(os.urandom(7), 'little')
+                    with open(self.log_path, 'wb') as f:
+                        f.write(np.asarray([dim, self.token], dtype='<i8').tobytes())
+            records = np.empty(len(ids), dtype=self._record_dtype(dim))
+            records['id'], records['hash'], records['vector'] = ids, hashes, vectors
+            with open(self.log_path, 'ab') as f:
+                f.write(records.tobytes())
+            self._replay()
+            log_rows = (self.log_offset - LOG_HEADER_BYTES) // records.dtype.itemsize
+            if log_rows >= max(COMPACT_MIN_ROWS, COMPACT_RATIO * len(self.ids)):
+                self.save()
+
+    def vector(self, session_id):
+        """
+        Return the stored embedding for a session, or None.
+        """
+        row = self.rows.get(int(session_id))
+        return None if row is None else self.matrix[row]
+
+    def sync(self, sessions, embed_fn):
+        """
+        Reconcile the store with (id, subject) pairs from the database.
+        Rows for deleted sessions are dropped, and every new or changed
+        subject is embedded in a single batched call to embed_fn.
+        Returns True if the store changed.
+        """
+        with self.lock:
+            self.load()
+            wanted = {int(sid): subject_hash(subject) for sid, subject in sessions}
+            subjects = {int(sid): subject for sid, subject in sessions}
+            stale = [int(sid) for row, sid in enumerate(self.ids) if int(sid) not in wanted]
+            missing = [sid for sid, h in wanted.items()
+                       if sid not in self.rows or self.hashes[self.rows[sid]] != h]
+            if not missing and not stale:
+                return False
+
+            # Reuse vectors for identical subjects before paying for new ones
+            by_hash = {h: row for row, h in enumerate(self.hashes.tolist())}
+            to_embed = {}
+            for sid in missing:
+                if wanted[sid] not in by_hash:
+                    to_embed.setdefault(wanted[sid], subjects[sid])
+            new_vectors = {}
+            if to_embed:
+                embedded = normalize_rows(embed_fn(list(to_embed.values())))
+                new_vectors = dict(zip(to_embed.keys(), embedded))
+            dim = self.matrix.shape[1] if self.matrix is not None else len(next(iter(new_vectors.values())))
+            vectors = np.zeros((len(missing) + len(stale), dim), dtype=np.float32)
+            for i, sid in enumerate(missing):
+                h = wanted[sid]
+                vectors[i] = new_vectors[h] if h in new_vectors else self.matrix[by_hash[h]]
+            self._write(np.asarray(missing + stale, dtype=np.int64),
+                        np.asarray([wanted[sid] for sid in missing] + [b''] * len(stale), dtype='S16'), vectors)
+            return True
+
+    def upsert(self, session_id, subject, embed_fn):
+        """
+        Add or refresh a single session. The subject is only embedded if
+        its content hash differs from the stored one.
+        """
+        session_id = int(session_id)
+        h = subject_hash(subject)
+        with self.lock:
+            self.load()
+            row = self.rows.get(session_id)
+            if row is not None and self.hashes[row] == h:
+                return self.matrix[row]
+        vector = normalize_rows(embed_fn([subject]))[0]
+        self._write(np.asarray([session_id], dtype=np.int64), np.asarray([h], dtype='S16'), vector[None, :])
+        return vector
+
+    def remove(self, session_id):
+        """
+        Drop a session from the store.
+        """
+        with self.lock:
+            self.load()
+            if int(session_id) not in self.rows:
+                return
+            self._write(np.asarray([session_id], dtype=np.int64), np.asarray([b''], dtype='S16'),
+                        np.zeros((1, self.matrix.shape[1]), dtype=np.float32))
+
+    def top_k(self, query_vector, k=10, min_score=None):
+        """
+        Score every stored session against a query vector with one
+        matrix-vector product and return the best k as (session_id, score)
+        pairs, highest first.
+        """
+        with self.lock:
+            self.load()
+            if self.matrix is None or not len(self.ids):
+                return []
+            matrix, ids = self.matrix, self.ids
+        scores = matrix @ normalize_rows(query_vector)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        if min_score is not None:
+            top = top[scores[top] >= min_score]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+# Shared per-process store
+session_store = EmbeddingStore()
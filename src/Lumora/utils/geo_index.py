@@ -0,0 +1,108 @@
+import math
+
+import numpy as np  # Vectorized distance math
+
+EARTH_RADIUS_KM = 6371.0088
+CELL_DEGREES = 0.05  # Grid cell size (~5.5 km north-south)
+MAX_SCAN_CELLS = 4096  # Larger search areas fall back to one vectorized scan
+
+# --- Great-circle distance ---
+def haversine_km(lat, lon, lats, lons):
+    """
+    Distance in km from one point to arrays of points (all in degrees).
+    """
+    lat, lon = math.radians(lat), math.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+# --- Fixed-grid spatial index ---
+class GeoIndex:
+    """
+    Spots bucketed into a lat/lon grid. Points are sorted by cell key, so
+    the cells of one grid row are a contiguous slice found by binary search;
+    a radius query only computes distances for points in overlapping cells.
+    Built from a catalog snapshot, so it is rebuilt whenever the catalog is.
+    """
+
+    def __init__(self, ids, lats, lons, cell_degrees=CELL_DEGREES):
+        self.cell = cell_degrees
+        self.nx = int(math.ceil(360 / cell_degrees))
+        ids, lats, lons = (np.asarray(a) for a in (ids, lats, lons))
+        keys = self._keys(lats, lons)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.ids = ids[order].astype(np.int64)
+        self.lats = lats[order].astype(np.float64)
+        self.lons = lons[order].astype(np.float64)
+
+    @classmethod
+    def from_records(cls, records, cell_degrees=CELL_DEGREES):
+        located = [r for r in records if r.latitude is not None and r.longitude is not None]
+        return cls([r.id for r in located], [r.latitude for r in located], [r.longitude for r in located],
+                   cell_degrees)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _cell_y(self, lat):
+        return np.floor((np.asarray(lat) + 90.0) / self.cell).astype(np.int64)
+
+    def _cell_x(self, lon):
+        return np.floor(((np.asarray(lon) + 180.0) % 360.0) / self.cell).astype(np.int64) % self.nx
+
+    def _keys(self, lats, lons):
+        return self._cell_y(lats) * self.nx + self._cell_x(lons)
+
+    def _candidates(self, lat, lon, radius_km):
+        """
+        Positions of points in grid cells overlapping the search circle.
+        """
+        dlat = radius_km / 111.195
+        coslat = max(math.cos(math.radians(lat)), 1e-6)
+        dlon = min(radius_km / (111.195 * coslat), 180.0)
+        y0, y1 = int(self._cell_y(max(lat - dlat, -90.0))), int(self._cell_y(min(lat + dlat, 90.0)))
+        width = int(math.ceil(2 * dlon / self.cell)) + 1
+        if (y1 - y0 + 1) * min(width, self.nx) > MAX_SCAN_CELLS:
+            return np.arange(len(self.ids))
+        x0 = int(self._cell_x(lon - dlon))
+        # Column ranges, split where the search box wraps past the antimeridian
+        if width >= self.nx:
+            spans = [(0, self.nx - 1)]
+        elif x0 + width - 1 < self.nx:
+            spans = [(x0, x0 + width - 1)]
+        else:
+            spans = [(x0, self.nx - 1), (0, x0 + width - 1 - self.nx)]
+        starts, ends = [], []
+        for y in range(y0, y1 + 1):
+            for xa, xb in spans:
+                starts.append(y * self.nx + xa)
+                ends.append(y * self.nx + xb + 1)
+        lo = np.searchsorted(self.keys, starts)
+        hi = np.searchsorted(self.keys, ends)
+        slices = [np.arange(a, b) for a, b in zip(lo, hi) if b > a]
+        return np.concatenate(slices) if slices else np.zeros(0, dtype=np.int64)
+
+    def nearest(self, lat, lon, k=10, radius_km=5.0, allowed_ids=None):
+        """
+        Up to k (spot_id, distance_km) pairs within radius_km, nearest first.
+        allowed_ids (a set) restricts results, e.g. to a catalog filter.
+        """
+        if not len(self.ids) or k < 1:
+            return []
+        rows = self._candidates(lat, lon, radius_km)
+        if not len(rows):
+            return []
+        distances = haversine_km(lat, lon, self.lats[rows], self.lons[rows])
+        inside = distances <= radius_km
+        rows, distances = rows[inside], distances[inside]
+        if allowed_ids is not None and len(rows):
+            # Only the few points inside the circle are checked against the filter
+            keep = np.fromiter((int(i) in allowed_ids for i in self.ids[rows]), dtype=bool, count=len(rows))
+            rows, distances = rows[keep], distances[keep]
+        if not len(rows):
+            return []
+        k = min(k, len(rows))
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top], kind='stable')]
+        return [(int(self.ids[rows[i]]), float(distances[i])) for i in top]
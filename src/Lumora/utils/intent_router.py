@@ -0,0 +1,188 @@
+import re
+import threading  # Guard counters across request threads
+from collections import defaultdict
+
+MIN_SCORE = 1.0  # Weaker evidence than this always goes to the LLM
+MIN_CONFIDENCE = 0.6  # Share of the total score the winning intent needs
+CORRECTION_MIN_SCORE = 0.38  # n-gram similarity a misspelled word needs to its vocabulary word
+MIN_CORRECTED_LENGTH = 4  # Shorter words have too few n-grams to correct reliably
+
+# Intents and the spot type each implies
+INTENTS = {'study_question': 'study', 'study_spot': 'study', 'recreation': 'recreation'}
+
+# Common words that misspellings must not be corrected to ("there" is not "where")
+QUESTION_WORDS = ("who", "what", "when", "why", "how", "where")
+
+# Words asking for a place count toward both kinds of spot
+PLACE_WORDS = ("where", "location", "place", "spot", "spots", "specific", "near", "nearby", "open")
+
+# (phrases, intent, weight, slots). A slot value of None means "the matched phrase";
+# an intent of None only fills slots.
+VOCABULARY = [
+    # Homework help
+    (("solve", "explain", "calculate", "homework", "question", "essay", "equation"), 'study_question', 2.0, {}),
+    (("math", "science", "history", "english", "biology", "physics", "chemistry", "calculus", "algebra",
+      "geometry", "spanish", "economics"), 'study_question', 1.5, {'subject': None}),
+    (("who", "what", "when", "why", "how"), 'study_question', 1.0, {}),
+    (("help",), 'study_question', 0.5, {}),
+    # Finding a place to study
+    (PLACE_WORDS, 'study_spot', 1.5, {}),
+    (("study", "studying", "library", "cafe", "coffee shop", "desk"), 'study_spot', 1.0, {'type': 'study'}),
+    (("quiet", "very quiet", "silent", "calm"), 'study_spot', 1.0, {'noise_level': 'quiet'}),
+    (("moderate", "some noise"), 'study_spot', 1.0, {'noise_level': 'moderate'}),
+    (("loud", "noisy", "lively"), 'study_spot', 1.0, {'noise_level': 'loud'}),
+    (("wifi", "wi-fi", "internet"), 'study_spot', 0.5, {'amenities': 'wifi'}),
+    (("outlets", "outlet", "charging"), 'study_spot', 0.5, {'amenities': 'outlets'}),
+    (("coffee",), 'study_spot', 0.5, {'amenities': 'coffee'}),
+    (("group", "group study"), 'study_spot', 0.5, {'seating': 'group'}),
+    # Recreation
+    (PLACE_WORDS, 'recreation', 1.5, {}),
+    (("recreation", "play", "fun", "hang out", "outdoors", "exercise"), 'recreation', 2.0, {'type': 'recreation'}),
+    (("park", "basketball", "pickleball", "tennis", "hiking", "hang-gliding", "dog park", "soccer", "swimming",
+      "running", "gym", "biking", "boating", "playground"), 'recreation', 2.0,
+     {'type': 'recreation', 'activity': None}),
+    (("swim", "swimming pool", "pool"), 'recreation', 2.0, {'type': 'recreation', 'activity': 'swimming'}),
+    (("hike", "trail"), 'recreation', 2.0, {'type': 'recreation', 'activity': 'hiking'}),
+    (("run", "jog", "jogging"), 'recreation', 1.5, {'type': 'recreation', 'activity': 'running'}),
+    # Times
+    (("open now", "right now", "still open", "currently open"), None, 0.0, {'open_now': True}),
+    # Places
+    (("milpitas", "san jose", "santa clara", "online", "campus", "downtown"), None, 0.0, {'location': None}),
+]
+
+# --- Routing result ---
+class Route:
+    """
+    Winning intent (None if nothing matched), its confidence in [0, 1],
+    the extracted slots and every intent's score.
+    """
+    __slots__ = ('intent', 'confidence', 'slots', 'scores')
+
+    def __init__(self, intent, confidence, slots, scores):
+        self.intent = intent
+        self.confidence = confidence
+        self.slots = slots
+        self.scores = scores
+
+    @property
+    def confident(self):
+        return self.intent is not None and self.confidence >= MIN_CONFIDENCE \
+            and self.scores[self.intent] >= MIN_SCORE
+
+    def parsed(self):
+        """
+        Slots in parse_query's format (type, noise_level, amenities, activity, subject, ...).
+        """
+        return dict(self.slots, type=INTENTS.get(self.intent, 'study'))
+
+# --- Phrase set -> regex sharing common prefixes ---
+def trie_regex(phrases):
+    """
+    Alternation of phrases factored into a prefix trie ("ho(?:w|me)" rather
+    than "how|home"), so the regex engine rejects a position after one
+    character instead of trying every phrase. Longer matches are preferred
+    and spaces match any run of whitespace.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[''] = True
+
+    def build(node):
+        end = '' in node
+        branches = [(r'\s+' if ch == ' ' else re.escape(ch)) + build(child)
+                    for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if end:
+            return f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+# --- Compiled router ---
+class IntentRouter:
+    """
+    Classifies a message with one pass of a compiled, word-bounded regex
+    over the case-folded text. Every vocabulary match adds its weight to an
+    intent and may fill a slot (first match per slot wins; longer phrases
+    are tried first, so "dog park" beats "park").
+    """
+
+    def __init__(self, vocabulary=VOCABULARY):
+        effects = defaultdict(list)
+        for phrases, intent, weight, slots in vocabulary:
+            for phrase in phrases:
+                effects[phrase].append((intent, weight, slots))
+        # Per phrase: (intent, weight) pairs that score and the slots it fills
+        self.effects = {
+            phrase: ([(i, w) for i, w, _ in items if i is not None],
+                     [(slot, phrase if value is None else value) for _, _, fills in items
+                      for slot, value in fills.items()])
+            for phrase, items in effects.items()
+        }
+        self.pattern = re.compile(rf"\b(?:{trie_regex(self.effects)})\b")
+        self.known_words = {word for phrase in self.effects for word in re.findall(r"[a-z]+", phrase)}
+        self.spelling = None  # Vocabulary n-gram index, built on the first correction
+        self.lock = threading.Lock()
+        self.counters = defaultdict(lambda: {'local': 0, 'fallback': 0})
+
+    def route(self, text):
+        scores = dict.fromkeys(INTENTS, 0.0)
+        slots = {}
+        effects = self.effects
+        for phrase in self.pattern.findall(text.casefold()):
+            found = effects.get(phrase) or effects[" ".join(phrase.split())]
+            for intent, weight in found[0]:
+                scores[intent] += weight
+            for slot, value in found[1]:
+                if slot not in slots:
+                    slots[slot] = value
+        total = sum(scores.values())
+        if not total:
+            return Route(None, 0.0, slots, scores)
+        intent = max(scores, key=scores.get)
+        return Route(intent, scores[intent] / total, slots, scores)
+
+    def correct(self, text):
+        """
+        Replace misspelled words ("quiett libary with wiifi") with the
+        closest single-word vocabulary phrase by character n-gram TF-IDF
+        similarity, so the regex can route them.
+        """
+        if self.spelling is None:
+            from utils.text_vectors import TextIndex  # NumPy loads on first use
+            index = TextIndex()
+            index.sync((word, word) for word in self.known_words
+                       if len(word) >= MIN_CORRECTED_LENGTH and word not in QUESTION_WORDS)
+            self.spelling = index
+
+        def replace(match):
+            word = match.group(0)
+            if len(word) < MIN_CORRECTED_LENGTH or word in self.known_words:
+                return word
+            best = self.spelling.top_k(word, k=1, min_score=CORRECTION_MIN_SCORE)
+            return best[0][0] if best else word
+
+        return re.sub(r"[a-z]+", replace, text.casefold())
+
+    def count(self, route, handled_locally):
+        with self.lock:
+            self.counters[route.intent or 'unknown']['local' if handled_locally else 'fallback'] += 1
+
+    def stats(self):
+        """
+        Per-intent counts of messages routed locally versus parsed by the LLM.
+        """
+        with self.lock:
+            result = {}
+            for intent, counters in self.counters.items():
+                total = counters['local'] + counters['fallback']
+                result[intent] = dict(counters, local_rate=counters['local'] / total if total else 0.0)
+            return result
+
+# Shared per-process router
+intent_router = IntentRouter()
@@ -0,0 +1,269 @@
+import json
+import os
+import random  # Backoff jitter
+import socket
+import sqlite3  # Durable queue; no broker to run
+import threading
+import time
+import traceback
+
+from utils import metrics  # Job run times
+
+JOBS_PATH = os.path.join('instance', 'jobs.sqlite')
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 2.0  # First retry delay; doubles per attempt
+MAX_BACKOFF_SECONDS = 300.0
+LEASE_SECONDS = 600  # A running job whose worker died is picked up again after this
+POLL_SECONDS = 1.0  # Idle workers check for new jobs this often
+KEEP_FINISHED_SECONDS = 7 * 24 * 3600  # Done/failed jobs kept for status polling
+# Worker threads started inside each web process on its first enqueue; set 0
+# when dedicated `python worker.py` processes run the queue
+INLINE_WORKERS = int(os.getenv('JOB_INLINE_WORKERS', 1))
+
+STATUSES = ('queued', 'running', 'done', 'failed')
+
+# kind -> handler(payload) registered with @job; runs inside an app context
+HANDLERS = {}
+LEASES = {}  # kind -> seconds a claim lasts
+
+def job(kind, lease=LEASE_SECONDS):
+    """
+    Register a handler for a job kind. Its return value (JSON-serializable)
+    is stored as the job's result; raising retries the job with backoff.
+    lease must outlast the longest run, or a second worker may pick it up.
+    """
+    def register(fn):
+        HANDLERS[kind] = fn
+        LEASES[kind] = lease
+        return fn
+    return register
+
+def _row_to_dict(row):
+    if row is None:
+        return None
+    (job_id, kind, key, payload, status, priority, attempts, max_attempts, run_at,
+     result, error, created_at, updated_at) = row
+    return {'id': job_id, 'kind': kind, 'key': key, 'payload': json.loads(payload), 'status': status,
+            'priority': priority, 'attempts': attempts, 'max_attempts': max_attempts, 'run_at': run_at,
+            'result': json.loads(result) if result is not None else None, 'error': error,
+            'created_at': created_at, 'updated_at': updated_at}
+
+COLUMNS = ("id, kind, key, payload, status, priority, attempts, max_attempts, run_at, result, error, "
+           "created_at, updated_at")
+
+# --- Durable queue in a SQLite file ---
+class JobQueue:
+    """
+    Jobs live in a SQLite file shared by the web processes and workers.
+    A job key deduplicates: enqueueing a key that is already queued returns
+    the queued job instead of adding another. Workers claim jobs with a
+    lease, so a job whose worker crashed runs again once the lease expires.
+    """
+
+    def __init__(self, path=JOBS_PATH):
+        self.path = path
+        self.local = threading.local()
+        self.workers = []
+        self.workers_pid = None
+        self.lock = threading.Lock()
+
+    def _conn(self):
+        # One connection per thread, and a fresh one after a fork
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id INTEGER PRIMARY KEY, kind TEXT NOT NULL, key TEXT, payload TEXT NOT NULL, "
+                "status TEXT NOT NULL, priority INTEGER NOT NULL DEFAULT 0, attempts INTEGER NOT NULL DEFAULT 0, "
+                "max_attempts INTEGER NOT NULL, run_at REAL NOT NULL, locked_until REAL, worker TEXT, "
+                "result TEXT, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)")
+            # At most one queued job per key; a running job may have read stale data, so it doesn't count
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_jobs_queued_key ON jobs (key) "
+                         "WHERE status = 'queued' AND key IS NOT NULL")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_status_run_at ON jobs (status, priority, run_at)")
+            self.local.conn, self.local.pid = conn, os.getpid()
+        return conn
+
+    def enqueue(self, kind, payload=None, key=None, priority=0, delay=0.0, max_attempts=MAX_ATTEMPTS):
+        """
+        Queue a job (lower priority numbers run first) and, when called from
+        a request, start this process's inline workers. Returns the job as a dict,
+        with 'deduplicated': True if the key was already queued.
+        """
+        if kind not in HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = time.time()
+        conn = self._conn()
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO jobs (kind, key, payload, status, priority, max_attempts, run_at, "
+            "created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?, ?, ?, ?)",
+            (kind, key, json.dumps(payload or {}), priority, max_attempts, now + delay, now, now))
+        if cursor.rowcount:
+            queued = self.get(cursor.lastrowid)
+        else:
+            queued = _row_to_dict(conn.execute(
+                f"SELECT {COLUMNS} FROM jobs WHERE key = ? AND status = 'queued'", (key,)).fetchone())
+        self._start_inline_workers()
+        return dict(queued, deduplicated=not cursor.rowcount) if queued else None
+
+    def get(self, job_id):
+        return _row_to_dict(self._conn().execute(f"SELECT {COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def latest(self, key):
+        """
+        Most recent job for a key, or None.
+        """
+        return _row_to_dict(self._conn().execute(
+            f"SELECT {COLUMNS} FROM jobs WHERE key = ? ORDER BY id DESC LIMIT 1", (key,)).fetchone())
+
+    def claim(self, worker, kinds=None):
+        """
+        Lease the next due job (by priority, then due time) to a worker, or
+        return None if nothing is due.
+        """
+        conn = self._conn()
+        now = time.time()
+        kinds = list(kinds or HANDLERS)
+        if not kinds:
+            return None
+        marks = ",".join("?" * len(kinds))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # A job whose worker died on its last attempt (e.g. killed out of memory) fails here
+            # instead of being handed to the next worker forever
+            conn.execute(
+                f"UPDATE jobs SET status = 'failed', error = 'Lease expired on the last attempt (worker died?)', "
+                f"locked_until = NULL, updated_at = ? WHERE kind IN ({marks}) AND status = 'running' "
+                f"AND locked_until < ? AND attempts >= max_attempts", (now, *kinds, now))
+            row = conn.execute(
+                f"SELECT id, kind FROM jobs WHERE kind IN ({marks}) AND ((status = 'queued' AND run_at <= ?) "
+                f"OR (status = 'running' AND locked_until < ?)) ORDER BY priority, run_at, id LIMIT 1",
+                (*kinds, now, now)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_until = ?, worker = ?, "
+                "updated_at = ? WHERE id = ?", (now + LEASES[row[1]], worker, now, row[0]))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(row[0])
+
+    def complete(self, job_id, worker, result=None):
+        """
+        Store a job's result. Returns False (and changes nothing) if the
+        worker's lease expired and the job was claimed again meanwhile.
+        """
+        return bool(self._conn().execute(
+            "UPDATE jobs SET status = 'done', result = ?, error = NULL, locked_until = NULL, updated_at = ? "
+            "WHERE id = ? AND status = 'running' AND worker = ?",
+            (json.dumps(result), time.time(), job_id, worker)).rowcount)
+
+    def fail(self, job, error, worker):
+        """
+        Requeue a failed job with exponential backoff, or mark it failed
+        after its last attempt. Returns the new status, or 'lost' if the
+        worker no longer holds the job's lease.
+        """
+        now = time.time()
+        owned = "WHERE id = ? AND status = 'running' AND worker = ?"
+        if job['attempts'] >= job['max_attempts']:
+            cursor = self._conn().execute(
+                f"UPDATE jobs SET status = 'failed', error = ?, locked_until = NULL, updated_at = ? {owned}",
+                (error, now, job['id'], worker))
+            return 'failed' if cursor.rowcount else 'lost'
+        delay = min(MAX_BACKOFF_SECONDS, BACKOFF_SECONDS * 2 ** (job['attempts'] - 1)) * random.uniform(0.5, 1.0)
+        try:
+            cursor = self._conn().execute(
+                f"UPDATE jobs SET status = 'queued', error = ?, run_at = ?, locked_until = NULL, updated_at = ? {owned}",
+                (error, now + delay, now, job['id'], worker))
+        except sqlite3.IntegrityError:
+            # The same key was queued again meanwhile; that job will do this one's work
+            cursor = self._conn().execute(
+                f"UPDATE jobs SET status = 'failed', error = ?, locked_until = NULL, updated_at = ? {owned}",
+                (f"{error} (superseded)", now, job['id'], worker))
+            return 'failed' if cursor.rowcount else 'lost'
+        return 'queued' if cursor.rowcount else 'lost'
+
+    def run_one(self, app, worker, kinds=None):
+        """
+        Claim and run one job inside an app context. Returns the job, or None if none was due.
+        """
+        claimed = self.claim(worker, kinds)
+        if claimed is None:
+            return None
+        start = time.perf_counter()
+        try:
+            with app.app_context():
+                result = HANDLERS[claimed['kind']](claimed['payload'])
+            outcome = 'done' if self.complete(claimed['id'], worker, result) else 'lost'
+        except Exception as e:
+            print(f"Job {claimed['id']} ({claimed['kind']}) error: {e}")
+            outcome = self.fail(claimed, "".join(traceback.format_exception_only(type(e), e)).strip(), worker)
+        if outcome == 'lost':
+            print(f"Job {claimed['id']} ({claimed['kind']}): lease expired before it finished; result dropped")
+        metrics.observe_job(claimed['kind'], time.perf_counter() - start, outcome)
+        return claimed
+
+    def work(self, app, stop, kinds=None, worker=None):
+        """
+        Run jobs until stop (a threading.Event) is set, polling when idle.
+        """
+        worker = worker or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        while not stop.is_set():
+            try:
+                ran = self.run_one(app, worker, kinds)
+            except sqlite3.Error as e:
+                print(f"Job queue error: {e}")
+                ran = None
+            if ran is None:
+                stop.wait(POLL_SECONDS)
+
+    def start_workers(self, app, threads, kinds=None):
+        """
+        Run jobs on background daemon threads. Returns the Event that stops them.
+        """
+        stop = threading.Event()
+        for _ in range(threads):
+            thread = threading.Thread(target=self.work, args=(app, stop, kinds), daemon=True, name='job-worker')
+            thread.start()
+            self.workers.append(thread)
+        return stop
+
+    def _start_inline_workers(self):
+        # Started lazily from a request, so a pre-forking server only starts them in
+        # the workers that enqueue, and short-lived scripts leave their jobs to worker.py
+        if not INLINE_WORKERS or self.workers_pid == os.getpid():
+            return
+        from flask import current_app, has_request_context
+        if not has_request_context():
+            return
+        with self.lock:
+            if self.workers_pid != os.getpid():
+                self.workers, self.workers_pid = [], os.getpid()
+                self.start_workers(current_app._get_current_object(), INLINE_WORKERS)
+
+    def stats(self):
+        """
+        Job counts per kind and status.
+        """
+        counts = {}
+        for kind, status, n in self._conn().execute("SELECT kind, status, COUNT(*) FROM jobs GROUP BY kind, status"):
+            counts.setdefault(kind, dict.fromkeys(STATUSES, 0))[status] = n
+        return counts
+
+    def purge(self, older_than=KEEP_FINISHED_SECONDS):
+        """
+        Delete done and failed jobs last updated more than older_than seconds ago.
+        """
+        return self._conn().execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+                                    (time.time() - older_than,)).rowcount
+
+# Shared per-process queue
+job_queue = JobQueue()
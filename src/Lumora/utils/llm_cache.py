@@ -0,0 +1,244 @@
+import hashlib  # Cache keys
+import json
+import os
+import sqlite3  # Shared on-disk tier
+import threading  # Guard in-process state across request threads
+import time
+from collections import OrderedDict, defaultdict
+
+from utils import metrics  # Per-request cache hit counts
+
+CACHE_PATH = os.path.join('instance', 'llm_cache.sqlite')
+
+# Seconds a cached answer stays fresh, per call site
+SITE_TTLS = {
+    'parse_query': 24 * 3600,
+    'categorize_spot': 30 * 24 * 3600,
+    'conversation_helper': 3600,
+    'recommend': 3600,
+}
+DEFAULT_TTL = 3600
+
+# --- Cache key from normalized prompt, model and parameters ---
+def make_key(model, messages, **params):
+    """
+    Build a stable key for a chat request. Message text is whitespace-collapsed
+    so reindented prompts share an entry; case is kept, since it can change
+    the answer (code, units, proper nouns).
+    """
+    normalized = [
+        {'role': m['role'], 'content': " ".join(str(m['content']).split())}
+        for m in messages
+    ]
+    payload = json.dumps({'model': model, 'messages': normalized, 'params': params}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+# --- In-process LRU tier ---
+class MemoryTier:
+    """
+    Size-bounded least-recently-used cache local to one worker process.
+    """
+    name = 'memory'
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+# --- Shared SQLite tier ---
+class SQLiteTier:
+    """
+    Size-bounded cache in a SQLite file that every worker process can read.
+    Expired rows are purged and the least recently used rows evicted as
+    entries are added. A hit refreshes its row's last_used at most every
+    touch_every seconds, so hot keys don't turn every read into a write.
+    """
+    name = 'disk'
+
+    def __init__(self, path=CACHE_PATH, max_entries=50000, purge_every=100, touch_every=60):
+        self.path = path
+        self.max_entries = max_entries
+        self.purge_every = purge_every
+        self.touch_every = touch_every
+        self.local = threading.local()
+        self.writes = 0
+
+    def _conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, latency REAL NOT NULL, "
+                "last_used REAL NOT NULL DEFAULT 0)"
+            )
+            if 'last_used' not in {row[1] for row in conn.execute("PRAGMA table_info(llm_cache)")}:
+                # Cache files written before LRU tracking; their rows are evicted first
+                conn.execute("ALTER TABLE llm_cache ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_expires_at ON llm_cache (expires_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_last_used ON llm_cache (last_used)")
+            self.local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute(
+            "SELECT expires_at, value, latency, last_used FROM llm_cache WHERE key = ? AND expires_at >= ?",
+            (key, now),
+        ).fetchone()
+        if row is None:
+            return None
+        if row[3] < now - self.touch_every:
+            try:
+                with conn:
+                    conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+            except sqlite3.Error as e:
+                print(f"LLM cache {self.name} error: {e}")  # Still a hit; only its LRU position is stale
+        return row[:3]
+
+    def set(self, key, entry):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, latency, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, entry[1], entry[0], entry[2], time.time()),
+            )
+        self.writes += 1
+        if self.writes % self.purge_every == 0:
+            self.purge()
+
+    def purge(self):
+        """
+        Drop expired rows, then the least recently used rows beyond max_entries.
+        """
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM llm_cache")
+
+# --- Tiered cache for LLM responses ---
+class LLMCache:
+    """
+    Looks a request up in each tier in order (fastest first) and only calls
+    the model on a miss. Entries are (expires_at, value, latency) so a hit
+    can report how much upstream latency it saved. Any object with get/set
+    can be used as a tier, e.g. a Redis-backed one.
+    """
+
+    def __init__(self, tiers=None):
+        self.tiers = tiers if tiers is not None else [MemoryTier(), SQLiteTier()]
+        self.lock = threading.Lock()
+        self.counters = defaultdict(lambda: {'hits': 0, 'misses': 0, 'saved_seconds': 0.0})
+
+    def get_or_call(self, site, model, messages, call, ttl=None, cacheable=None, **params):
+        """
+        Return the cached response for this request, or run call() (which must
+        return a JSON-serializable value), cache its result and return it.
+        Exceptions from call() propagate and are never cached, and neither are
+        results for which cacheable(value) is false (e.g. malformed JSON).
+        """
+        cached = self.lookup(site, model, messages, **params)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        value = call()
+        if cacheable is None or cacheable(value):
+            self.store(site, model, messages, value, time.perf_counter() - start, ttl=ttl, **params)
+        return value
+
+    def lookup(self, site, model, messages, **params):
+        """
+        Return the cached value for a request, or None (counted as a miss).
+        """
+        key = make_key(model, messages, **params)
+        for i, tier in enumerate(self.tiers):
+            try:
+                entry = tier.get(key)
+            except Exception as e:
+                print(f"LLM cache {tier.name} error: {e}")
+                continue
+            if entry is not None:
+                for faster in self.tiers[:i]:
+                    self._set(faster, key, entry)  # Promote to the faster tiers
+                self._count(site, 'hits', tier.name, entry[2])
+                return json.loads(entry[1])
+        self._count(site, 'misses')
+        return None
+
+    def store(self, site, model, messages, value, latency, ttl=None, **params):
+        """
+        Cache a value produced upstream in latency seconds.
+        """
+        key = make_key(model, messages, **params)
+        ttl = ttl if ttl is not None else SITE_TTLS.get(site, DEFAULT_TTL)
+        entry = (time.time() + ttl, json.dumps(value), latency)
+        for tier in self.tiers:
+            self._set(tier, key, entry)
+
+    def _set(self, tier, key, entry):
+        # A failing tier must not fail the request; the value is still returned
+        try:
+            tier.set(key, entry)
+        except Exception as e:
+            print(f"LLM cache {tier.name} error: {e}")
+
+    def _count(self, site, outcome, tier=None, latency=0.0):
+        metrics.observe_cache(outcome)
+        with self.lock:
+            counters = self.counters[site]
+            counters[outcome] += 1
+            if tier:
+                counters[f'{tier}_hits'] = counters.get(f'{tier}_hits', 0) + 1
+                counters['saved_seconds'] += latency
+
+    def stats(self):
+        """
+        Per-site hit/miss counters, hit rate and upstream seconds saved.
+        """
+        with self.lock:
+            result = {}
+            for site, counters in self.counters.items():
+                total = counters['hits'] + counters['misses']
+                result[site] = dict(counters, hit_rate=counters['hits'] / total if total else 0.0)
+            return result
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+# Shared per-process cache
+llm_cache = LLMCache()
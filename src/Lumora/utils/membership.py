@@ -0,0 +1,88 @@
+import time
+
+from sqlalchemy import delete, insert, select, update
+
+from db import db
+from models import SessionMember, StudySession
+
+members = SessionMember.__table__
+sessions = StudySession.__table__
+
+# --- INSERT that ignores an existing (session_id, user_id) row ---
+def _insert_member(dialect):
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(members).on_conflict_do_nothing(index_elements=['session_id', 'user_id'])
+
+def add_member(session_id, user_id):
+    """
+    Atomically add a user to a session and bump its member_count, in the
+    caller's transaction. The count is only incremented while below capacity
+    and the membership row is only inserted if it is new, so concurrent joins
+    can neither lose a member nor overfill a session.
+    Returns 'joined', 'already_joined', 'full' or 'not_found'.
+    Caller commits on 'joined' and rolls back otherwise.
+    """
+    counted = db.session.execute(
+        update(sessions)
+        .where(sessions.c.id == session_id,
+               db.or_(sessions.c.capacity.is_(None), sessions.c.member_count < sessions.c.capacity))
+        .values(member_count=sessions.c.member_count + 1)
+    ).rowcount
+    if not counted:
+        exists = db.session.execute(select(sessions.c.id).where(sessions.c.id == session_id)).first()
+        if exists is None:
+            return 'not_found'
+        return 'already_joined' if is_member(session_id, user_id) else 'full'
+
+    row = {'session_id': session_id, 'user_id': user_id, 'joined_at': time.time()}
+    stmt = _insert_member(db.engine.dialect.name)
+    if stmt is not None:
+        inserted = db.session.execute(stmt, row).rowcount
+    elif is_member(session_id, user_id):
+        inserted = 0
+    else:
+        inserted = db.session.execute(insert(members), row).rowcount
+    return 'joined' if inserted else 'already_joined'
+
+def remove_member(session_id, user_id):
+    """
+    Remove a user from a session (in the caller's transaction). Returns True if they were a member.
+    """
+    removed = db.session.execute(
+        delete(members).where(members.c.session_id == session_id, members.c.user_id == user_id)).rowcount
+    if removed:
+        db.session.execute(update(sessions).where(sessions.c.id == session_id)
+                           .values(member_count=sessions.c.member_count - 1))
+    return bool(removed)
+
+# --- Indexed lookups in both directions ---
+def is_member(session_id, user_id):
+    return db.session.execute(select(members.c.user_id).where(
+        members.c.session_id == session_id, members.c.user_id == user_id)).first() is not None
+
+def session_members(session_ids):
+    """
+    {session_id: [user_id, ...]} in join order, for several sessions in one query.
+    """
+    result = {session_id: [] for session_id in session_ids}
+    if result:
+        rows = db.session.execute(
+            select(members.c.session_id, members.c.user_id)
+            .where(members.c.session_id.in_(list(result)))
+            .order_by(members.c.session_id, members.c.joined_at))
+        for session_id, user_id in rows:
+            result[session_id].append(user_id)
+    return result
+
+def user_sessions(user_id):
+    """
+    Ids of the sessions a user belongs to.
+    """
+    return db.session.execute(
+        select(members.c.session_id).where(members.c.user_id == user_id).order_by(members.c.session_id)
+    ).scalars().all()
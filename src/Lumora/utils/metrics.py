@@ -0,0 +1,292 @@
+import bisect
+import json
+import os
+import random
+import threading  # Guard metric updates across request threads
+import time
+
+from flask import Response, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Log a timing breakdown for requests slower than this many seconds (None = off);
+# init_app sets both from the app config or the environment
+SLOW_REQUEST_SECONDS = None
+SLOW_REQUEST_SAMPLE_RATE = 1.0
+MAX_SAMPLED_STATEMENTS = 200
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# --- Minimal Prometheus metric types (text exposition format 0.0.4) ---
+def _labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in values)
+    pairs = ','.join(f'{n}="{v}"' for n, v in zip(names, escaped))
+    return '{' + pairs + '}'
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, tuple(labels), tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            for labels, (counts, total, count) in sorted(self.series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    lines.append(f'{self.name}_bucket{_labels(self.labels + ("le",), labels + (bound,))} {cumulative}')
+                lines.append(f'{self.name}_bucket{_labels(self.labels + ("le",), labels + ("+Inf",))} {count}')
+                lines.append(f'{self.name}_sum{_labels(self.labels, labels)} {total}')
+                lines.append(f'{self.name}_count{_labels(self.labels, labels)} {count}')
+        return lines
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount, *labels):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self.lock:
+            lines += [f'{self.name}{_labels(self.labels, labels)} {value}'
+                      for labels, value in sorted(self.series.items())]
+        return lines
+
+def _gauge(name, help, labels, values):
+    return [f'# HELP {name} {help}', f'# TYPE {name} gauge'] + \
+        [f'{name}{_labels(labels, key)} {value}' for key, value in values]
+
+REQUEST_SECONDS = Histogram('lumora_request_duration_seconds', 'Wall time per request',
+                            ('endpoint', 'method', 'status'))
+REQUEST_SQL_QUERIES = Histogram('lumora_request_sql_queries', 'SQL statements per request',
+                                ('endpoint',), COUNT_BUCKETS)
+REQUEST_SQL_SECONDS = Histogram('lumora_request_sql_seconds', 'Time in SQL per request', ('endpoint',))
+REQUEST_OPENAI_CALLS = Histogram('lumora_request_openai_calls', 'OpenAI calls per request',
+                                 ('endpoint',), COUNT_BUCKETS)
+REQUEST_OPENAI_SECONDS = Histogram('lumora_request_openai_seconds', 'Time waiting on OpenAI per request',
+                                   ('endpoint',))
+OPENAI_SECONDS = Histogram('lumora_openai_request_seconds', 'Latency of each OpenAI request attempt',
+                           ('site', 'outcome'))
+OPENAI_TOKENS = Counter('lumora_openai_tokens_total', 'OpenAI tokens used', ('site', 'kind'))
+JOB_SECONDS = Histogram('lumora_job_duration_seconds', 'Run time of background jobs', ('kind', 'outcome'))
+LLM_ADMISSION_SECONDS = Histogram('lumora_llm_admission_wait_seconds',
+                                  'Time LLM calls waited for admission, by priority and outcome',
+                                  ('priority', 'outcome'))
+RESPONSE_CACHE = Counter('lumora_response_cache_total', 'Cached listing responses by route and outcome',
+                         ('route', 'outcome'))
+
+# --- Per-request accumulation ---
+class RequestStats:
+    __slots__ = ('started', 'sql_count', 'sql_seconds', 'statements', 'openai_calls', 'openai_seconds',
+                 'openai', 'cache', 'finished')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.statements = []  # (seconds, statement) while the slow sampler is on
+        self.openai_calls = 0
+        self.openai_seconds = 0.0
+        self.openai = []  # (site, seconds, outcome)
+        self.cache = {'hits': 0, 'misses': 0}
+        self.finished = False  # Set once after_request has taken care of recording
+
+STATS_KEY = 'lumora.request_stats'
+
+def current():
+    """
+    Stats of the request being handled, or None outside a request. Stored
+    on the WSGI environ so streamed responses (stream_with_context) see it too.
+    """
+    return request.environ.get(STATS_KEY) if has_request_context() else None
+
+# --- SQL statement timing via SQLAlchemy events ---
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('lumora_query_start', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('lumora_query_start')
+    if not starts:
+        return
+    seconds = time.perf_counter() - starts.pop()
+    stats = current()
+    if stats is not None:
+        stats.sql_count += 1
+        stats.sql_seconds += seconds
+        if SLOW_REQUEST_SECONDS and len(stats.statements) < MAX_SAMPLED_STATEMENTS:
+            stats.statements.append((seconds, " ".join(statement.split())[:300]))
+
+# --- Hooks for the OpenAI client and LLM cache ---
+def observe_openai(site, seconds, outcome):
+    """
+    Record one upstream OpenAI attempt (outcome: 'ok' or an error class name).
+    """
+    OPENAI_SECONDS.observe(seconds, site, outcome)
+    stats = current()
+    if stats is not None:
+        stats.openai_calls += 1
+        stats.openai_seconds += seconds
+        stats.openai.append((site, round(seconds, 4), outcome))
+
+def record_usage(site, usage):
+    """
+    Add an OpenAI response's token usage (may be None).
+    """
+    if usage is None:
+        return
+    prompt = getattr(usage, 'prompt_tokens', 0) or 0
+    completion = getattr(usage, 'completion_tokens', 0) or 0
+    if prompt:
+        OPENAI_TOKENS.inc(prompt, site, 'prompt')
+    if completion:
+        OPENAI_TOKENS.inc(completion, site, 'completion')
+
+def observe_admission(priority, seconds, outcome):
+    """
+    Record an admission decision (outcome: 'admitted' or a rejection reason).
+    """
+    LLM_ADMISSION_SECONDS.observe(seconds, priority, outcome)
+
+def observe_job(kind, seconds, outcome):
+    """
+    Record one background job run (outcome: 'done', 'queued' for a retry, 'failed',
+    or 'lost' when its lease expired and another worker took it over).
+    """
+    JOB_SECONDS.observe(seconds, kind, outcome)
+
+def observe_cache(outcome):
+    stats = current()
+    if stats is not None:
+        stats.cache[outcome] += 1
+
+# --- Flask integration ---
+def init_app(app):
+    """
+    Time every request and expose all metrics at /metrics.
+    SLOW_REQUEST_SECONDS and SLOW_REQUEST_SAMPLE_RATE come from app.config,
+    else the environment, read here so .env and config overrides apply.
+    """
+    global SLOW_REQUEST_SECONDS, SLOW_REQUEST_SAMPLE_RATE
+    SLOW_REQUEST_SECONDS = float(app.config.get('SLOW_REQUEST_SECONDS', os.getenv('SLOW_REQUEST_SECONDS')) or 0) or None
+    SLOW_REQUEST_SAMPLE_RATE = float(app.config.get('SLOW_REQUEST_SAMPLE_RATE',
+                                                    os.getenv('SLOW_REQUEST_SAMPLE_RATE', 1.0)))
+    @app.before_request
+    def _start():
+        request.environ[STATS_KEY] = RequestStats()
+
+    @app.after_request
+    def _finish(response):
+        stats = current()
+        if stats is None:
+            return response
+        stats.finished = True
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        method, status = request.method, response.status_code
+        if response.is_streamed:
+            # The body is still being generated, so record once the response closes
+            response.call_on_close(lambda: record_request(stats, endpoint, method, status))
+        else:
+            record_request(stats, endpoint, method, status)
+        return response
+
+    @app.teardown_request
+    def _teardown(error):
+        # after_request is skipped when a view raises, so unhandled errors are recorded here
+        stats = current()
+        if stats is None or stats.finished:
+            return
+        stats.finished = True
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        record_request(stats, endpoint, request.method, getattr(error, 'code', None) or 500)
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+def record_request(stats, endpoint, method, status):
+    seconds = time.perf_counter() - stats.started
+    REQUEST_SECONDS.observe(seconds, endpoint, method, status)
+    REQUEST_SQL_QUERIES.observe(stats.sql_count, endpoint)
+    REQUEST_SQL_SECONDS.observe(stats.sql_seconds, endpoint)
+    REQUEST_OPENAI_CALLS.observe(stats.openai_calls, endpoint)
+    REQUEST_OPENAI_SECONDS.observe(stats.openai_seconds, endpoint)
+    if SLOW_REQUEST_SECONDS and seconds >= SLOW_REQUEST_SECONDS and random.random() < SLOW_REQUEST_SAMPLE_RATE:
+        slowest = sorted(stats.statements, reverse=True)[:10]
+        print("Slow request: " + json.dumps({
+            'endpoint': endpoint, 'method': method, 'status': status, 'seconds': round(seconds, 4),
+            'sql': {'count': stats.sql_count, 'seconds': round(stats.sql_seconds, 4),
+                    'slowest': [{'seconds': round(s, 4), 'statement': q} for s, q in slowest]},
+            'openai': {'count': stats.openai_calls, 'seconds': round(stats.openai_seconds, 4),
+                       'calls': stats.openai},
+            'cache': stats.cache,
+            'other_seconds': round(seconds - stats.sql_seconds - stats.openai_seconds, 4),
+        }))
+
+def render():
+    """
+    All metrics in Prometheus text format, including cache and router counters.
+    """
+    from utils.llm_cache import llm_cache
+    from utils.intent_router import intent_router
+    from utils.openai_client import flight
+    from utils.admission import limiter
+    from utils.jobs import job_queue
+    from utils.response_cache import response_cache
+
+    lines = []
+    for metric in (REQUEST_SECONDS, REQUEST_SQL_QUERIES, REQUEST_SQL_SECONDS, REQUEST_OPENAI_CALLS,
+                   REQUEST_OPENAI_SECONDS, OPENAI_SECONDS, OPENAI_TOKENS, LLM_ADMISSION_SECONDS, JOB_SECONDS,
+                   RESPONSE_CACHE):
+        lines += metric.render()
+    cache = llm_cache.stats()
+    lines += _gauge('lumora_llm_cache_requests', 'LLM cache lookups by outcome', ('site', 'outcome'),
+                    [((site, outcome), c[outcome]) for site, c in sorted(cache.items())
+                     for outcome in ('hits', 'misses')])
+    lines += _gauge('lumora_llm_cache_hit_ratio', 'LLM cache hit rate', ('site',),
+                    [((site,), c['hit_rate']) for site, c in sorted(cache.items())])
+    lines += _gauge('lumora_llm_cache_saved_seconds', 'Upstream seconds saved by cache hits', ('site',),
+                    [((site,), c['saved_seconds']) for site, c in sorted(cache.items())])
+    lines += _gauge('lumora_intent_router_messages', 'Messages routed locally or parsed by the LLM',
+                    ('intent', 'route'),
+                    [((intent, route), c[route]) for intent, c in sorted(intent_router.stats().items())
+                     for route in ('local', 'fallback')])
+    lines += _gauge('lumora_openai_coalesced_requests', 'Requests that shared an identical in-flight call',
+                    (), [((), flight.coalesced)])
+    admission = limiter.stats()
+    lines += _gauge('lumora_llm_in_flight', 'LLM calls holding an admission slot', (), [((), admission['active'])])
+    lines += _gauge('lumora_llm_queue_depth', 'LLM calls waiting for admission', ('priority',),
+                    [((priority,), n) for priority, n in admission['queued'].items()])
+    try:
+        jobs = job_queue.stats()
+    except Exception as e:  # The queue file may be locked or missing; the rest still renders
+        print(f"Job queue error: {e}")
+        jobs = {}
+    lines += _gauge('lumora_jobs', 'Background jobs by kind and status', ('kind', 'status'),
+                    [((kind, status), n) for kind, counts in sorted(jobs.items()) for status, n in counts.items()])
+    lines += _gauge('lumora_response_cache_bytes', 'Encoded listing bytes held in the response cache', (),
+                    [((), response_cache.stats()['bytes'])])
+    return "\n".join(lines) + "\n"
+
+def metrics_view():
+    return Response(render(), mimetype='text/plain; version=0.0.4')
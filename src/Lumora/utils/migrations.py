@@ -0,0 +1,141 @@
+import json
+import time
+
+from sqlalchemy import inspect, text
+
+from models import SessionMember, bump_catalog_version
+from utils.opening_hours import encode_hours
+
+# Ordered schema migrations for databases created before a model change.
+# Each one must be safe to run on a database that already has the change
+# (fresh databases get the current schema from db.create_all()).
+MIGRATIONS = []
+
+def migration(fn):
+    """
+    Register a migration; it runs once, in definition order.
+    """
+    MIGRATIONS.append(fn)
+    return fn
+
+def _columns(conn, table):
+    return {c['name'] for c in inspect(conn).get_columns(table)}
+
+@migration
+def add_spot_coordinates(conn):
+    # Optional lat/lon for nearest-spot queries
+    columns = _columns(conn, 'spot')
+    for column in ('latitude', 'longitude'):
+        if column not in columns:
+            conn.execute(text(f"ALTER TABLE spot ADD COLUMN {column} FLOAT"))
+
+@migration
+def unique_spot_name_location(conn):
+    # Earlier seeders inserted duplicates on every run: keep the oldest row per
+    # (name, location), point sessions at it, then enforce the natural key
+    if 'study_session' in inspect(conn).get_table_names():
+        conn.execute(text(
+            "UPDATE study_session SET spot_id = (SELECT MIN(s2.id) FROM spot s1 JOIN spot s2 "
+            "ON s1.name = s2.name AND s1.location = s2.location WHERE s1.id = study_session.spot_id) "
+            "WHERE spot_id IS NOT NULL"))
+    deleted = conn.execute(text(
+        "DELETE FROM spot WHERE id NOT IN (SELECT MIN(id) FROM spot GROUP BY name, location)")).rowcount
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_spot_name_location ON spot (name, location)"))
+    if deleted:
+        bump_catalog_version(conn)
+
+@migration
+def add_query_indexes(conn):
+    # Index for batch categorization's unlabeled recreation spots
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_spot_type_activity ON spot (type, activity)"))
+    conn.execute(text("ANALYZE"))  # Planner statistics for the new index
+
+@migration
+def session_members_from_json(conn):
+    # Move StudySession.joined_users into SessionMember rows and maintained counts
+    if 'study_session' not in inspect(conn).get_table_names():
+        return
+    columns = _columns(conn, 'study_session')
+    if 'member_count' not in columns:
+        conn.execute(text("ALTER TABLE study_session ADD COLUMN member_count INTEGER NOT NULL DEFAULT 0"))
+    if 'capacity' not in columns:
+        conn.execute(text("ALTER TABLE study_session ADD COLUMN capacity INTEGER"))
+    SessionMember.__table__.create(conn, checkfirst=True)
+
+    now = time.time()
+    rows = []
+    for session_id, user_id, joined in conn.execute(text("SELECT id, user_id, joined_users FROM study_session")):
+        if isinstance(joined, str):
+            joined = json.loads(joined)
+        seen = []
+        for member in [user_id] + list(joined or []):
+            if isinstance(member, int) and member not in seen:
+                seen.append(member)
+        # Keep the old list order via joined_at
+        rows.extend({'s': session_id, 'u': member, 't': now + i * 1e-6} for i, member in enumerate(seen))
+    if rows:
+        conn.execute(text(
+            "INSERT INTO session_member (session_id, user_id, joined_at) SELECT :s, :u, :t "
+            "WHERE NOT EXISTS (SELECT 1 FROM session_member WHERE session_id = :s AND user_id = :u)"), rows)
+    conn.execute(text(
+        "UPDATE study_session SET member_count = "
+        "(SELECT COUNT(*) FROM session_member WHERE session_member.session_id = study_session.id)"))
+
+@migration
+def parse_spot_hours(conn):
+    # Store each spot's hours text as minute-of-week intervals for open_at/open_now filters
+    if 'open_intervals' not in _columns(conn, 'spot'):
+        conn.execute(text("ALTER TABLE spot ADD COLUMN open_intervals TEXT"))
+    rows = conn.execute(text("SELECT id, hours FROM spot WHERE hours IS NOT NULL")).all()
+    updates = [{'id': spot_id, 'intervals': encode_hours(hours)} for spot_id, hours in rows]
+    if updates:
+        conn.execute(text("UPDATE spot SET open_intervals = :intervals WHERE id = :id"), updates)
+        bump_catalog_version(conn)
+
+def _reparse_hours(conn):
+    # Re-encode every spot whose stored intervals differ from what the parser now gives
+    rows = conn.execute(text("SELECT id, hours, open_intervals FROM spot WHERE hours IS NOT NULL")).all()
+    updates = [{'id': spot_id, 'intervals': encode_hours(hours)} for spot_id, hours, stored in rows
+               if encode_hours(hours) != stored]
+    if updates:
+        conn.execute(text("UPDATE spot SET open_intervals = :intervals WHERE id = :id"), updates)
+        bump_catalog_version(conn)
+
+@migration
+def reparse_trailing_day_hours(conn):
+    # Hours like "8am-8pm (Mon-Fri)" were stored as open every day
+    _reparse_hours(conn)
+
+@migration
+def drop_unused_indexes(conn):
+    # Created by earlier versions of add_query_indexes; spot listings are served from
+    # the in-memory catalog and sessions are looked up by id or through session_member
+    for name in ('ix_spot_type_noise_level_location', 'ix_spot_type_location',
+                 'ix_study_session_user_id', 'ix_study_session_spot_id'):
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+@migration
+def reparse_overnight_24h_hours(conn):
+    # 24-hour ranges past midnight like "22-2" were stored as 10am-2pm
+    _reparse_hours(conn)
+
+# --- Apply pending migrations ---
+def run_migrations(engine):
+    """
+    Apply every registered migration not yet recorded in schema_migrations.
+    Call after db.create_all(). Returns the names that were applied.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations (name VARCHAR(120) PRIMARY KEY, applied_at FLOAT)"))
+        applied = {row[0] for row in conn.execute(text("SELECT name FROM schema_migrations"))}
+    ran = []
+    for fn in MIGRATIONS:
+        if fn.__name__ in applied:
+            continue
+        with engine.begin() as conn:
+            fn(conn)
+            conn.execute(text("INSERT INTO schema_migrations (name, applied_at) VALUES (:name, :at)"),
+                         {'name': fn.__name__, 'at': time.time()})
+        ran.append(fn.__name__)
+    return ran
@@ -0,0 +1,183 @@
+import hashlib  # Coalescing keys
+import json
+import os
+import random  # Backoff jitter
+import threading
+import time
+
+from utils import metrics  # Per-request and per-site OpenAI timing
+from utils.admission import limiter  # Rate, concurrency and priority limits on outbound calls
+
+# Timeout (seconds) and retry policy per call site; override with configure()
+DEFAULT_POLICY = {'timeout': 20.0, 'retries': 2, 'backoff': 0.5, 'max_backoff': 8.0}
+SITE_POLICIES = {
+    'parse_query': {'timeout': 10.0},
+    'categorize_spot': {'timeout': 10.0, 'retries': 3},
+    'conversation_helper': {'timeout': 30.0},
+    'recommend': {'timeout': 30.0},
+    'embeddings': {'timeout': 10.0},
+    'session_index': {'timeout': 30.0},  # Background re-embedding of session subjects
+}
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+# --- Per-site call policy ---
+def configure(site, **policy):
+    """
+    Set timeout/retries/backoff/max_backoff for a call site.
+    """
+    SITE_POLICIES.setdefault(site, {}).update(policy)
+
+def get_policy(site):
+    """
+    Return the effective call policy for a site.
+    """
+    return {**DEFAULT_POLICY, **SITE_POLICIES.get(site, {})}
+
+# --- One pooled client per process ---
+def get_client():
+    """
+    Return this process's OpenAI client, creating it on first use. A new one
+    is built after a fork so workers never share a connection pool.
+    """
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                # The client keeps a keep-alive connection pool; retries are
+                # handled here so every site gets the same backoff policy
+                import openai  # Slow to import, so loaded on first call (or by warm_caches)
+                _client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+                _client_pid = os.getpid()
+    return _client
+
+# --- Single-flight coalescing of identical in-flight requests ---
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time. Callers that arrive while a call
+    for the same key is running wait for it and share its result (or error).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.event.set()
+        return call.result
+
+flight = SingleFlight()
+
+# --- Retry with exponential backoff and jitter ---
+def is_retryable(error):
+    """
+    True for errors worth retrying: timeouts, dropped connections, 429s and 5xx responses.
+    """
+    import openai  # Already loaded by get_client() whenever a call was made
+    return isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError,
+                              openai.InternalServerError))
+
+def with_retries(site, fn, admit=True):
+    """
+    Call fn(timeout) under the site's policy, retrying retryable errors.
+    Each attempt first waits for admission from the limiter (admit=False
+    when the caller already holds a slot); Overloaded is not retried.
+    """
+    policy = get_policy(site)
+    for attempt in range(policy['retries'] + 1):
+        if admit:
+            limiter.acquire(site)
+        start = time.perf_counter()
+        try:
+            try:
+                result = fn(policy['timeout'])
+            finally:
+                if admit:
+                    limiter.release()  # Free the slot before any backoff sleep
+            metrics.observe_openai(site, time.perf_counter() - start, 'ok')
+            return result
+        except Exception as e:
+            metrics.observe_openai(site, time.perf_counter() - start, type(e).__name__)
+            if not is_retryable(e):
+                raise
+            if attempt == policy['retries']:
+                raise
+            delay = min(policy['max_backoff'], policy['backoff'] * 2 ** attempt)
+            print(f"OpenAI {site} retry {attempt + 1} after error: {e}")
+            time.sleep(delay * random.uniform(0.5, 1.0))
+
+def _key(kind, **payload):
+    return hashlib.sha256(json.dumps([kind, payload], sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+# --- Public helpers used by ai_utils ---
+def chat(site, model, messages, **params):
+    """
+    Return the assistant message content for a chat request. Identical
+    concurrent requests share one upstream call.
+    """
+    def call(timeout):
+        response = get_client().chat.completions.create(model=model, messages=messages, timeout=timeout, **params)
+        metrics.record_usage(site, response.usage)
+        return response.choices[0].message.content
+    return flight.do(_key('chat', model=model, messages=messages, params=params),
+                     lambda: with_retries(site, call))
+
+def embed(texts, model, site='embeddings'):
+    """
+    Return one embedding per text from a single embeddings request.
+    """
+    texts = list(texts)
+
+    def call(timeout):
+        response = get_client().embeddings.create(input=texts, model=model, timeout=timeout)
+        metrics.record_usage(site, response.usage)
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+    return flight.do(_key('embed', model=model, texts=texts), lambda: with_retries(site, call))
+
+def stream_chat(site, model, messages, **params):
+    """
+    Yield the assistant's reply in text chunks as they are generated.
+    Closing the generator (e.g. when the client disconnects) closes the
+    upstream HTTP response, which cancels the generation.
+    """
+    with limiter.slot(site):  # Held until the stream ends or is closed
+        stream = with_retries(site, lambda timeout: get_client().chat.completions.create(
+            model=model, messages=messages, stream=True, stream_options={'include_usage': True}, timeout=timeout,
+            **params), admit=False)
+        try:
+            for event in stream:
+                if event.usage is not None:  # Final chunk carries the token counts
+                    metrics.record_usage(site, event.usage)
+                if event.choices and event.choices[0].delta.content:
+                    yield event.choices[0].delta.content
+        finally:
+            stream.close()
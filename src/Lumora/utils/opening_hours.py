@@ -0,0 +1,265 @@
+import bisect
+import os
+import re
+from datetime import datetime
+from functools import lru_cache
+
+MINUTES_PER_DAY = 1440
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY  # Minute 0 is Monday 00:00
+MAX_CACHED_SEGMENTS = 512  # Open-id sets kept per index
+
+# Interpret "now" and bare times in this zone (e.g. "America/Los_Angeles"); unset = server local time
+TIMEZONE = os.getenv('SPOTS_TIMEZONE')
+
+DAYS = {'mon': 0, 'monday': 0, 'tue': 1, 'tues': 1, 'tuesday': 1, 'wed': 2, 'wednesday': 2,
+        'thu': 3, 'thur': 3, 'thurs': 3, 'thursday': 3, 'fri': 4, 'friday': 4,
+        'sat': 5, 'saturday': 5, 'sun': 6, 'sunday': 6}
+DAY_GROUPS = {'daily': range(7), 'everyday': range(7), 'weekdays': range(5), 'weekends': range(5, 7),
+              'weekend': range(5, 7)}
+
+_DAY = '|'.join(sorted(DAYS, key=len, reverse=True))
+_TIME = r'(\d{1,2})(?::?(\d{2}))?\s*(?:([ap])(?:\.?m\.?|\b))?'
+_TOKEN_RE = re.compile(
+    rf"(?P<allday>24\s*/\s*7|24\s*h(?:ou)?rs?|open\s+24\s*hours|all\s+day)"
+    rf"|(?P<range>\b{_TIME}\s*-\s*{_TIME})"
+    rf"|(?P<dayrange>\b(?:{_DAY})\b\.?\s*-\s*\b(?:{_DAY})\b\.?)"
+    rf"|(?P<group>\b(?:{'|'.join(DAY_GROUPS)})\b)"
+    rf"|(?P<day>\b(?:{_DAY})\b\.?)"
+    r"|(?P<closed>\bclosed\b)",
+    re.I)
+_CLOCK_RE = re.compile(rf"\s*{_TIME}\s*", re.I)
+
+# --- Parse free-text hours into minute-of-week intervals ---
+def _clock(hour, minute, half):
+    hour, minute = int(hour), int(minute or 0)
+    if half:
+        hour = hour % 12 + (12 if half.lower() == 'p' else 0)
+    return hour * 60 + minute
+
+def _time_range(h1, m1, a1, h2, m2, a2):
+    """
+    (open, close) minutes after midnight. A missing am/pm is inferred from
+    the other end ("8-5pm" -> 8am, "10-2pm" -> 10am); with neither, hours
+    are read as a 24-hour clock unless both are 12 or less and that would
+    close before opening ("9-5" -> 9am-5pm, but "22-2" runs past midnight).
+    """
+    if a2 and not a1:
+        a1 = a2 if int(h1) % 12 <= int(h2) % 12 else ('a' if a2.lower() == 'p' else 'p')
+    elif a1 and not a2:
+        a2 = a1 if int(h2) % 12 >= int(h1) % 12 else ('p' if a1.lower() == 'a' else 'a')
+    elif not a1 and not a2 and int(h1) <= 12 and int(h2) < int(h1) and not m1 and not m2:
+        a1, a2 = 'a', 'p'
+    start, end = _clock(h1, m1, a1), _clock(h2, m2, a2)
+    if start > MINUTES_PER_DAY or end > MINUTES_PER_DAY:
+        raise ValueError("time out of range")
+    return start, end
+
+def _add(intervals, days, start, end):
+    if end <= start:
+        end += MINUTES_PER_DAY  # Overnight, e.g. 6pm-2am; equal ends mean 24 hours
+    for day in days:
+        s, e = day * MINUTES_PER_DAY + start, day * MINUTES_PER_DAY + end
+        if e > MINUTES_PER_WEEK:  # Sunday night into Monday morning
+            intervals.append((s, MINUTES_PER_WEEK))
+            intervals.append((0, e - MINUTES_PER_WEEK))
+        else:
+            intervals.append((s, e))
+
+def merge_intervals(intervals):
+    """
+    Sort and merge overlapping or touching intervals.
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def _tokens(text):
+    """
+    ('days', [weekday, ...]) and ('times', (open, close) or None for
+    "closed") tokens in text order; unreadable ranges are skipped.
+    """
+    for match in _TOKEN_RE.finditer(text):
+        kind = match.lastgroup
+        if kind in ('day', 'dayrange', 'group'):
+            token = match.group(kind).lower().replace('.', '')
+            if kind == 'group':
+                yield 'days', list(DAY_GROUPS[token])
+            elif kind == 'dayrange':
+                first, last = (DAYS[d.strip()] for d in token.split('-'))
+                yield 'days', [(first + i) % 7 for i in range((last - first) % 7 + 1)]
+            else:
+                yield 'days', [DAYS[token]]
+        elif kind == 'allday':
+            yield 'times', (0, 0)
+        elif kind == 'range':
+            try:
+                yield 'times', _time_range(*match.groups()[2:8])
+            except ValueError:
+                continue
+        else:
+            yield 'times', None
+
+def parse_hours(text):
+    """
+    Weekly schedule from free text as merged [(start, end)] minute-of-week
+    intervals. Handles daily ranges ("8am-8pm"), day groups before or after
+    their times ("Mon-Fri 8am-9pm; Sat 10am-6pm", "8am-8pm (Mon-Fri)",
+    "weekends 9-5"), several ranges per day, overnight spans ("6pm-2am") and
+    "24/7". Returns [] for "closed" and None when nothing in the text can be
+    read as hours.
+    """
+    if not text:
+        return None
+    text = str(text).replace('–', '-').replace('—', '-')
+    text = re.sub(r'\s+to\s+', '-', text, flags=re.I)
+    text = re.sub(r'\bnoon\b', '12pm', text, flags=re.I)
+    text = re.sub(r'\bmidnight\b', '12am', text, flags=re.I)
+    tokens = list(_tokens(text))
+    if not any(kind == 'times' for kind, _ in tokens):
+        return None
+
+    groups = []  # [days, times] in text order
+    if tokens[0][0] == 'times' and tokens[-1][0] == 'days':
+        # Days follow the times they qualify: "8am-8pm (Mon-Fri), 10am-4pm weekends"
+        groups.append([[], []])
+        for kind, value in tokens:
+            if kind == 'times':
+                if groups[-1][0]:  # A time after a day name starts a new group
+                    groups.append([[], []])
+                groups[-1][1].append(value)
+            else:
+                groups[-1][0].extend(value)
+    else:
+        for kind, value in tokens:
+            if kind == 'days':
+                if not groups or groups[-1][1]:  # A day after a time range starts a new group
+                    groups.append([[], []])
+                groups[-1][0].extend(value)
+            else:
+                if not groups:
+                    groups.append([list(range(7)), []])  # No day names at all: daily
+                groups[-1][1].append(value)
+
+    intervals = []
+    for days, times in groups:
+        for span in times:
+            if span is not None:  # 'closed' adds nothing for its days
+                _add(intervals, days, *span)
+    return merge_intervals(intervals)
+
+# --- Compact storage ("480-1260,1920-2700"; '' = never open, NULL = unknown) ---
+def encode_intervals(intervals):
+    if intervals is None:
+        return None
+    return ",".join(f"{start}-{end}" for start, end in intervals)
+
+def decode_intervals(value):
+    if value is None:
+        return None
+    return [tuple(int(x) for x in part.split('-')) for part in value.split(',') if part]
+
+@lru_cache(maxsize=4096)  # Bulk seeds repeat the same few hours strings
+def encode_hours(text):
+    """
+    Parse hours text straight into its stored form (for inserts and migrations).
+    """
+    return encode_intervals(parse_hours(text))
+
+# --- Query times ---
+def now():
+    if TIMEZONE:
+        from zoneinfo import ZoneInfo
+        return datetime.now(ZoneInfo(TIMEZONE))
+    return datetime.now()
+
+def minute_of_week(dt):
+    return dt.weekday() * MINUTES_PER_DAY + dt.hour * 60 + dt.minute
+
+def parse_open_at(value, current=None):
+    """
+    Minute of the week for an open_at value: "now", "23:00", "2300" or
+    "11pm" (today), or "sat 11pm". None if invalid.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    value = str(value).strip().lower()  # A number from parsed JSON reads as "HHMM"
+    current = current or now()
+    if value == 'now':
+        return minute_of_week(current)
+    day = current.weekday()
+    match = re.match(rf"({_DAY})\.?\s+", value)
+    if match:
+        day, value = DAYS[match.group(1)], value[match.end():]
+    match = _CLOCK_RE.fullmatch(value)
+    if not match or (not match.group(2) and not match.group(3)):
+        return None  # A bare number is ambiguous
+    if int(match.group(2) or 0) >= 60:
+        return None
+    minute = _clock(*match.groups())
+    if minute >= MINUTES_PER_DAY:
+        return None
+    return day * MINUTES_PER_DAY + minute
+
+_ASKED_TIME_RE = re.compile(
+    rf"\b(?:at|by|around|after|until|till)\s+(?:(?P<day>{_DAY})\.?\s+)?(?P<time>\d{{1,2}}(?::\d{{2}})?\s*(?:am|pm)\b)",
+    re.I)
+
+def time_in_text(text, current=None):
+    """
+    Minute of the week of a time asked about in a chat message ("open at
+    11pm", "around 7:30 am on", "by sat 9am"), or None.
+    """
+    match = _ASKED_TIME_RE.search(text or '')
+    if not match:
+        return None
+    value = f"{match.group('day')} {match.group('time')}" if match.group('day') else match.group('time')
+    return parse_open_at(value, current)
+
+# --- Interval index ---
+class HoursIndex:
+    """
+    Open spots per elementary segment of the week. Interval endpoints split
+    the week into segments in which the set of open spots does not change,
+    so open_ids(minute) is a bisect plus a cached set; each segment's set is
+    computed (one vectorized pass) the first time it is asked for.
+    """
+
+    def __init__(self, schedules):
+        """
+        schedules maps spot id -> [(start, end)] or None (hours unknown).
+        """
+        import numpy as np  # Only the index needs NumPy; parsing runs at write time without it
+        self.known = frozenset(i for i, s in schedules.items() if s is not None)
+        pairs = [(i, start, end) for i, s in schedules.items() if s for start, end in s]
+        self.ids = np.array([p[0] for p in pairs], dtype=np.int64)
+        self.starts = np.array([p[1] for p in pairs], dtype=np.int32)
+        self.ends = np.array([p[2] for p in pairs], dtype=np.int32)
+        points = {0, MINUTES_PER_WEEK}
+        points.update(self.starts.tolist())
+        points.update(self.ends.tolist())
+        self.breakpoints = sorted(points)
+        self._open = {}
+
+    def segment(self, minute):
+        """
+        Index of the segment containing a minute of the week.
+        """
+        return bisect.bisect_right(self.breakpoints, minute % MINUTES_PER_WEEK) - 1
+
+    def open_ids(self, minute):
+        """
+        Frozen set of ids of spots open at a minute of the week.
+        """
+        segment = self.segment(minute)
+        ids = self._open.get(segment)
+        if ids is None:
+            m = self.breakpoints[segment]
+            ids = frozenset(self.ids[(self.starts <= m) & (self.ends > m)].tolist())
+            if len(self._open) >= MAX_CACHED_SEGMENTS:
+                self._open.clear()
+            self._open[segment] = ids
+        return ids
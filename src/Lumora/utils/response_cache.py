@@ -0,0 +1,96 @@
+import hashlib  # ETags
+import os
+import threading  # Guard the cache across request threads
+from collections import OrderedDict
+
+from flask import Response, request
+
+from utils import metrics  # Hit, miss and 304 counts
+from utils.responses import compress, dumps, negotiated_encoding
+
+MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MB', 64)) * 1024 * 1024  # Encoded bodies kept per process
+# Seconds clients may reuse a listing before revalidating; 0 revalidates every
+# time, which costs one version lookup and an empty 304 while nothing changed
+MAX_AGE = int(os.getenv('SPOTS_MAX_AGE', 0))
+
+# --- Encoded responses per catalog version ---
+class ResponseCache:
+    """
+    Encoded (and compressed) response bodies with their headers, keyed by
+    route, normalized filters, catalog version and content encoding.
+    Least recently used entries are evicted past max_bytes, and a newer
+    catalog version drops every entry of older ones, which can't be served again.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (body, headers)
+        self.size = 0
+        self.version = None
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, version, body, headers):
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            if self.version is not None and version < self.version:
+                return  # Rendered from a lagging replica; newer entries already exist
+            if version != self.version:
+                self.entries.clear()
+                self.size, self.version = 0, version
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+            self.entries[key] = (body, headers)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size, self.version = 0, None
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.size, 'version': self.version}
+
+# --- Conditional GET ---
+def cached_response(key, version, build):
+    """
+    Serve a JSON GET whose body depends only on key (route first, then its
+    normalized parameters) and the catalog version. Answers 304 when
+    If-None-Match already holds this representation's strong ETag, replays
+    the stored bytes on a hit, and otherwise encodes build() -> (payload,
+    headers) and keeps the result.
+    """
+    route = key[0]
+    key = (*key, version, negotiated_encoding())
+    tag = f"{version}-{hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16]}"
+    validators = {'ETag': f'"{tag}"', 'Cache-Control': f'public, max-age={MAX_AGE}, must-revalidate',
+                  'Vary': 'Accept-Encoding'}
+    if request.if_none_match.contains(tag):
+        metrics.RESPONSE_CACHE.inc(1, route, 'not_modified')
+        return Response(status=304, headers=validators)
+    entry = response_cache.get(key)
+    if entry is None:
+        metrics.RESPONSE_CACHE.inc(1, route, 'miss')
+        payload, headers = build()
+        headers = dict(headers, **validators)
+        entry = (compress(dumps(payload), headers), headers)
+        response_cache.set(key, version, *entry)
+    else:
+        metrics.RESPONSE_CACHE.inc(1, route, 'hit')
+    body, headers = entry
+    return Response(body, headers=headers, mimetype='application/json')
+
+# Shared per-process cache of spot listings
+response_cache = ResponseCache()
@@ -0,0 +1,65 @@
+import gzip
+import json
+
+from flask import Response, request
+
+try:
+    import orjson  # Optional: much faster JSON encoding
+except ImportError:
+    orjson = None
+
+try:
+    import brotli  # Optional: smaller responses than gzip
+except ImportError:
+    brotli = None
+
+MIN_COMPRESS_BYTES = 1024  # Smaller bodies aren't worth compressing
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+# --- Fast JSON encoding ---
+def dumps(payload):
+    """
+    Encode payload as compact UTF-8 JSON bytes (orjson when installed).
+    """
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+# --- Compression negotiated from Accept-Encoding ---
+def negotiated_encoding():
+    """
+    Encoding this request's response body would use if large enough:
+    'br', 'gzip' or 'identity'.
+    """
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return 'identity'
+
+def compress(body, headers):
+    """
+    Compress body with brotli or gzip if the client accepts it; updates headers.
+    Output is deterministic, so equal bodies compress to equal bytes.
+    """
+    if len(body) < MIN_COMPRESS_BYTES:
+        return body
+    headers['Vary'] = 'Accept-Encoding'
+    encoding = negotiated_encoding()
+    if encoding == 'br':
+        headers['Content-Encoding'] = 'br'
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        headers['Content-Encoding'] = 'gzip'
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)  # No timestamp in the header
+    return body
+
+def json_response(payload, status=200, headers=None):
+    """
+    Like jsonify, but with the fast encoder and response compression.
+    """
+    headers = dict(headers or {})
+    body = compress(dumps(payload), headers)
+    return Response(body, status=status, headers=headers, mimetype='application/json')
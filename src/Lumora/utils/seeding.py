@@ -0,0 +1,235 @@
+import csv
+import json
+import os
+import time
+
+from sqlalchemy import case, func, insert, literal_column, select, tuple_
+
+from db import db
+from models import Spot
+from utils.opening_hours import encode_hours
+
+SPOT_COLUMNS = ('name', 'type', 'location', 'activity', 'hours', 'noise_level', 'seating', 'amenities',
+                'latitude', 'longitude')
+NATURAL_KEY = ('name', 'location')
+BATCH_SIZE = 5000  # Rows per INSERT statement
+READ_SIZE = 1 << 16  # Bytes read at a time from JSON files
+
+# Group keys in spots.json and the spot type they imply
+GROUP_TYPES = {'study_spots': 'study', 'recreation_spots': 'recreation'}
+
+# --- Incremental readers (one dict per spot, constant memory) ---
+def iter_ndjson(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+def iter_csv(f):
+    for row in csv.DictReader(f):
+        yield {k: (v if v != '' else None) for k, v in row.items()}
+
+def iter_json(f, read_size=READ_SIZE):
+    """
+    Stream the objects out of a top-level array, or out of each array in a
+    {"study_spots": [...], "recreation_spots": [...]} document, without
+    loading the whole file. Objects from a named group get '_group' set.
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = '', 0, False
+    group, in_array = None, False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = f.read(read_size)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    while True:
+        # Skip whitespace and separators
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            fill()
+        if pos >= len(buf):
+            return
+        ch = buf[pos]
+        if not in_array:
+            if ch == '[':
+                in_array = True
+                pos += 1
+            elif ch == '"':
+                # A key of the top-level object: remember it and step past the colon
+                while True:
+                    try:
+                        key, end = decoder.raw_decode(buf, pos)
+                        break
+                    except ValueError:
+                        if eof:
+                            raise
+                        fill()
+                group, pos = key, end
+                while True:
+                    while pos < len(buf) and buf[pos] in ' \t\r\n:':
+                        pos += 1
+                    if pos < len(buf) or eof:
+                        break
+                    fill()
+                if pos < len(buf) and buf[pos] != '[':
+                    # Not an array of spots: skip the value
+                    while True:
+                        try:
+                            _, pos = decoder.raw_decode(buf, pos)
+                            break
+                        except ValueError:
+                            if eof:
+                                raise
+                            fill()
+            else:
+                pos += 1  # '{' / '}' of the top-level object
+            continue
+        if ch == ']':
+            in_array, group = False, None
+            pos += 1
+            continue
+        while True:
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+                break
+            except ValueError:
+                if eof:
+                    raise
+                fill()
+        pos = end
+        if group is not None and isinstance(obj, dict):
+            obj['_group'] = group
+        yield obj
+        if pos > read_size:
+            buf, pos = buf[pos:], 0
+
+READERS = {'json': iter_json, 'ndjson': iter_ndjson, 'csv': iter_csv}
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    return {'jsonl': 'ndjson'}.get(ext, ext if ext in READERS else 'json')
+
+# --- Normalize one input record into Spot column values ---
+def _float(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def normalize_spot(raw):
+    """
+    Map an input record to Spot columns, or None if it lacks name/location.
+    Missing fields default the same way the original seeder did.
+    """
+    name, location = raw.get('name'), raw.get('location')
+    if not name or not location:
+        return None
+    spot_type = raw.get('type') or GROUP_TYPES.get(raw.get('_group'), 'study')
+    row = {column: raw.get(column) for column in SPOT_COLUMNS}
+    row.update(name=str(name).strip(), location=str(location).strip(), type=spot_type,
+               latitude=_float(raw.get('latitude', raw.get('lat'))),
+               longitude=_float(raw.get('longitude', raw.get('lon'))))
+    if spot_type == 'study':
+        row['noise_level'] = row['noise_level'] or 'unknown'
+    else:
+        row['activity'] = row['activity'] or 'unknown'
+        row['amenities'] = row['amenities'] or 'unknown'
+    return row
+
+def iter_spot_rows(path, fmt=None):
+    """
+    Yield normalized Spot rows from a JSON, NDJSON or CSV file.
+    """
+    fmt = fmt or detect_format(path)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for raw in READERS[fmt](f):
+            row = normalize_spot(raw)
+            if row is not None:
+                yield row
+
+# --- Bulk upsert ---
+def _upsert_statement(dialect):
+    """
+    INSERT ... ON CONFLICT (name, location) DO UPDATE for SQLite/PostgreSQL.
+    Incoming NULL or 'unknown' values never overwrite known ones.
+    """
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return None
+    stmt = dialect_insert(Spot.__table__)
+    table = Spot.__table__
+    updates = {}
+    for column in SPOT_COLUMNS:
+        if column in NATURAL_KEY:
+            continue
+        if table.c[column].type.python_type is str:
+            incoming = func.nullif(stmt.excluded[column], literal_column("'unknown'"))
+            updates[column] = func.coalesce(incoming, table.c[column], stmt.excluded[column])
+        else:
+            # Coordinates: comparing a float to 'unknown' is an error on PostgreSQL
+            updates[column] = func.coalesce(stmt.excluded[column], table.c[column])
+    # The parsed schedule follows whichever hours text is kept
+    kept_hours = func.nullif(stmt.excluded.hours, literal_column("'unknown'")).is_(None)
+    updates['open_intervals'] = case((kept_hours, table.c.open_intervals), else_=stmt.excluded.open_intervals)
+    return stmt.on_conflict_do_update(index_elements=list(NATURAL_KEY), set_=updates)
+
+def _write_batch(batch, stmt):
+    rows = list({(r['name'], r['location']): r for r in batch}.values())  # Last row wins within a batch
+    rows = [dict(r, open_intervals=encode_hours(r.get('hours'))) for r in rows]  # Parsed once, at write time
+    if stmt is not None:
+        db.session.execute(stmt, rows)
+        return len(rows)
+    # Other databases: look up existing keys, then insert the new ones
+    table = Spot.__table__
+    keys = [(r['name'], r['location']) for r in rows]
+    existing = set(db.session.execute(
+        select(table.c.name, table.c.location).where(tuple_(table.c.name, table.c.location).in_(keys))).all())
+    new_rows = [r for r in rows if (r['name'], r['location']) not in existing]
+    if new_rows:
+        db.session.execute(insert(table), new_rows)
+    return len(rows)
+
+def upsert_spots(rows, batch_size=BATCH_SIZE, commit_every=1, progress=print):
+    """
+    Insert or update spots from any iterable of rows in batches of
+    batch_size, committing every commit_every batches. Rerunning with the
+    same input changes nothing. Must run inside an app context.
+    Returns a stats dict.
+    """
+    stmt = _upsert_statement(db.engine.dialect.name)
+    started = time.perf_counter()
+    total, batches, batch = 0, 0, []
+
+    def flush():
+        nonlocal total, batches
+        total += _write_batch(batch, stmt)
+        batches += 1
+        batch.clear()
+        if batches % commit_every == 0:
+            db.session.commit()
+            if progress:
+                elapsed = time.perf_counter() - started
+                progress(f"{total} rows, {total / elapsed:,.0f} rows/s")
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    if batches % commit_every:
+        db.session.commit()
+    elapsed = time.perf_counter() - started
+    return {'rows': total, 'batches': batches, 'seconds': round(elapsed, 2),
+            'rows_per_second': round(total / elapsed) if elapsed else None}
@@ -0,0 +1,274 @@
+import bisect  # Keyset pagination over sorted ids
+import json  # For reading JSON spot data
+import os
+import re
+import threading  # Guard catalog swaps across request threads
+
+from db import db, read_bind
+from models import Spot, CatalogVersion
+from utils.opening_hours import HoursIndex, decode_intervals, parse_hours
+
+SPOTS_JSON_PATH = os.getenv(
+    "SPOTS_JSON_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'spots.json'))
+
+MAX_SORTED_FILTERS = 256  # Cached sorted id lists per catalog
+
+_TOKEN_RE = re.compile(r"[^\W_]+")  # Same word boundaries as SQLite's unicode61 tokenizer
+
+# --- Split free text into lowercase word tokens ---
+def tokenize(text):
+    """
+    Lowercase word tokens of a comma/space separated field, e.g. amenities.
+    """
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+# --- Compact spot record ---
+class SpotRecord:
+    """
+    Lightweight read-only copy of a spot, independent of any DB session.
+    """
+    __slots__ = ('id', 'name', 'type', 'location', 'activity', 'hours', 'noise_level', 'seating', 'amenities',
+                 'latitude', 'longitude')
+
+    def __init__(self, id, name, type, location, activity=None, hours=None, noise_level=None,
+                 seating=None, amenities=None, latitude=None, longitude=None):
+        self.id = id
+        self.name = name
+        self.type = type
+        self.location = location
+        self.activity = activity
+        self.hours = hours
+        self.noise_level = noise_level
+        self.seating = seating
+        self.amenities = amenities
+        self.latitude = latitude
+        self.longitude = longitude
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+# --- Spot catalog with prebuilt filter indexes ---
+class SpotCatalog:
+    """
+    Immutable snapshot of spots with inverted indexes, so filters are answered
+    with set intersections instead of scanning every spot.
+    Exact-value indexes: type, noise_level, activity, location.
+    Token indexes: amenities, seating (a filter matches whole words only).
+    open_at (a minute of the week) is answered by the hours interval index.
+    """
+    EXACT_FIELDS = ('type', 'noise_level', 'activity', 'location')
+    TOKEN_FIELDS = ('amenities', 'seating')
+
+    def __init__(self, records, version=None, schedules=None):
+        """
+        schedules maps id -> minute-of-week intervals (None = unknown hours);
+        when omitted they are parsed from each record's hours text.
+        """
+        self.version = version
+        self.records = {r.id: r for r in records}
+        self.schedules = schedules if schedules is not None else {r.id: parse_hours(r.hours) for r in records}
+        self.indexes = {field: {} for field in self.EXACT_FIELDS + self.TOKEN_FIELDS}
+        for r in records:
+            for field in self.EXACT_FIELDS:
+                value = getattr(r, field)
+                if value is not None:
+                    self.indexes[field].setdefault(value.lower(), set()).add(r.id)
+            for field in self.TOKEN_FIELDS:
+                for token in tokenize(getattr(r, field)):
+                    self.indexes[field].setdefault(token, set()).add(r.id)
+        # Frozen so callers can be handed an index set without copying it
+        self.indexes = {field: {k: frozenset(v) for k, v in index.items()} for field, index in self.indexes.items()}
+        self.all_ids = frozenset(self.records)
+        self._geo = None
+        self._features = None
+        self._hours = None
+        self._sorted = {}  # Sorted id lists per filter combination, for paging
+
+    def __len__(self):
+        return len(self.records)
+
+    def ids(self, **filters):
+        """
+        Return the (frozen) set of spot ids matching every given filter.
+        None/empty filters are ignored; exact fields compare case-insensitively
+        and token fields require every word of the filter value.
+        """
+        sets = []
+        for field, value in filters.items():
+            if field == 'open_at' and value is not None:
+                sets.append(self.hours().open_ids(value))
+                continue
+            if not value:
+                continue
+            if field in self.TOKEN_FIELDS:
+                tokens = tokenize(value)
+                sets.extend(self.indexes[field].get(t, frozenset()) for t in tokens)
+            else:
+                sets.append(self.indexes[field].get(str(value).lower(), frozenset()))
+        if not sets:
+            return self.all_ids
+        sets.sort(key=len)
+        result = sets[0]
+        for s in sets[1:]:
+            if not result:
+                break
+            result = result & s
+        return result
+
+    def hours(self):
+        """
+        Interval index over the spots' weekly opening hours (built on first use).
+        """
+        if self._hours is None:
+            self._hours = HoursIndex(self.schedules)
+        return self._hours
+
+    def geo(self):
+        """
+        Spatial index over spots that have coordinates (built on first use).
+        """
+        if self._geo is None:
+            from utils.geo_index import GeoIndex  # NumPy loads on first geo query
+            self._geo = GeoIndex.from_records(self.records.values())
+        return self._geo
+
+    def features(self):
+        """
+        Scoring feature arrays for recommendations (built on first use).
+        """
+        if self._features is None:
+            from utils.spot_ranking import SpotFeatures
+            self._features = SpotFeatures(self.records.values())
+        return self._features
+
+    def filter(self, **filters):
+        """
+        Return matching records ordered by id.
+        """
+        return [self.records[i] for i in self.sorted_ids(**filters)]
+
+    def normalized(self, filters):
+        """
+        filters with open_at snapped to the start of its hours segment.
+        """
+        if filters.get('open_at') is not None:
+            # Every minute of one index segment has the same open spots
+            filters = dict(filters, open_at=self.hours().breakpoints[self.hours().segment(filters['open_at'])])
+        return filters
+
+    @staticmethod
+    def filter_key(filters):
+        """
+        Hashable, order-independent key of (normalized) filters; empty ones are dropped.
+        """
+        return tuple(sorted((f, str(v).lower()) for f, v in filters.items() if v is not None and v != ''))
+
+    def sorted_ids(self, **filters):
+        """
+        Matching ids in ascending order, sorted once per filter combination.
+        """
+        filters = self.normalized(filters)
+        key = self.filter_key(filters)
+        ids = self._sorted.get(key)
+        if ids is None:
+            if len(self._sorted) >= MAX_SORTED_FILTERS:
+                self._sorted.clear()
+            ids = self._sorted[key] = sorted(self.ids(**filters))
+        return ids
+
+    def page(self, after=None, limit=100, **filters):
+        """
+        Keyset page: up to limit matching records with id > after, plus the
+        cursor for the next page (None on the last page).
+        """
+        ids = self.sorted_ids(**filters)
+        start = bisect.bisect_right(ids, after) if after is not None else 0
+        page_ids = ids[start:start + limit]
+        next_cursor = page_ids[-1] if start + limit < len(ids) else None
+        return [self.records[i] for i in page_ids], next_cursor
+
+# --- Loaders ---
+def _coordinates(spot):
+    # Accept "latitude"/"longitude" or "lat"/"lon"
+    lat = spot.get("latitude", spot.get("lat"))
+    lon = spot.get("longitude", spot.get("lon"))
+    return (float(lat), float(lon)) if lat is not None and lon is not None else (None, None)
+
+def read_spots_json(path=SPOTS_JSON_PATH):
+    """
+    Parse spots.json into SpotRecords (ids are positions in the file).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    records = []
+    for spot in data.get("study_spots", []):
+        lat, lon = _coordinates(spot)
+        records.append(SpotRecord(len(records) + 1, spot["name"], "study", spot["location"],
+                                  noise_level=spot.get("noise_level", "unknown"),
+                                  latitude=lat, longitude=lon))
+    for spot in data.get("recreation_spots", []):
+        lat, lon = _coordinates(spot)
+        records.append(SpotRecord(len(records) + 1, spot["name"], "recreation", spot["location"],
+                                  activity=spot.get("activity", "unknown"),
+                                  amenities=spot.get("amenities", "unknown"),
+                                  latitude=lat, longitude=lon))
+    return records
+
+def get_catalog_version():
+    """
+    Current catalog version from the database (0 if nothing was written yet).
+    """
+    table = CatalogVersion.__table__
+    try:
+        version = db.session.execute(db.select(table.c.version).where(table.c.id == 1),
+                                     bind_arguments=read_bind()).scalar()
+    except Exception:
+        db.session.rollback()
+        table.create(db.engine, checkfirst=True)  # Databases created before versioning
+        version = None
+    return version or 0
+
+_lock = threading.Lock()
+_json_catalog = None
+_db_catalog = None
+
+def json_catalog(path=SPOTS_JSON_PATH):
+    """
+    Catalog of spots.json, reloaded only when the file's mtime changes.
+    """
+    global _json_catalog
+    mtime = os.path.getmtime(path)
+    catalog = _json_catalog
+    if catalog is None or catalog.version != (path, mtime):
+        with _lock:
+            if _json_catalog is None or _json_catalog.version != (path, mtime):
+                _json_catalog = SpotCatalog(read_spots_json(path), version=(path, mtime))
+            catalog = _json_catalog
+    return catalog
+
+def db_catalog():
+    """
+    Catalog of the Spot table, reloaded only when the catalog version changes.
+    Reads from the replica when the request opted in (see db.read_bind).
+    Must be called inside an app context.
+    """
+    global _db_catalog
+    bind = read_bind()
+    version = get_catalog_version()
+
+    def stale(catalog):
+        if catalog is None:
+            return True
+        # A lagging replica must not roll back a catalog loaded from the primary
+        return catalog.version < version if bind else catalog.version != version
+
+    catalog = _db_catalog
+    if stale(catalog):
+        with _lock:
+            if stale(_db_catalog):
+                columns = [getattr(Spot, f) for f in SpotRecord.__slots__] + [Spot.open_intervals]
+                rows = db.session.execute(db.select(*columns), bind_arguments=bind).all()
+                _db_catalog = SpotCatalog([SpotRecord(*row[:-1]) for row in rows], version=version,
+                                          schedules={row[0]: decode_intervals(row[-1]) for row in rows})
+            catalog = _db_catalog
+    return catalog
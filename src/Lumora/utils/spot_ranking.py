@@ -0,0 +1,186 @@
+import numpy as np  # Vectorized scoring over the whole catalog
+
+from utils.geo_index import haversine_km
+from utils.spot_catalog import tokenize
+
+DEFAULT_TOP_K = 20
+MAX_TOP_K = 100
+
+# Weight of each signal in the final score; User.preferences['weights'] overrides these
+SIGNAL_WEIGHTS = {'noise': 2.0, 'amenities': 1.5, 'activity': 2.0, 'location': 1.0, 'distance': 1.0}
+PREFERENCE_FACTOR = 0.5  # Attributes taken from preferences count half as much as asked-for ones
+UNKNOWN_SCORE = 0.3  # Spots missing an attribute rank below matches but above clear mismatches
+DISTANCE_SCALE_KM = 2.0  # Distance score is exp(-km / scale)
+
+# Noise labels on a 0 (silent) .. 1 (loud) scale, so "silent" still favours "quiet" over "loud"
+NOISE_LEVELS = {'silent': 0.0, 'very quiet': 0.1, 'quiet': 0.25, 'calm': 0.25, 'moderate': 0.5,
+                'some noise': 0.5, 'outdoor': 0.7, 'lively': 0.8, 'loud': 0.85, 'noisy': 0.85, 'very loud': 1.0}
+
+# Query words that mean the same thing as a word used in spot data
+SYNONYMS = {'internet': 'wifi', 'wi': 'wifi', 'fi': 'wifi', 'charging': 'outlets', 'outlet': 'outlets',
+            'plugs': 'outlets', 'cafe': 'coffee', 'swim': 'swimming', 'pool': 'swimming', 'hike': 'hiking',
+            'trail': 'hiking', 'trails': 'hiking', 'run': 'running', 'jog': 'running', 'jogging': 'running'}
+
+# --- Parse attribute text ---
+def query_tokens(value):
+    """
+    Normalized word set of a query attribute (a string or a list of strings).
+    """
+    if not value:
+        return set()
+    if isinstance(value, (list, tuple, set)):
+        value = " ".join(str(v) for v in value)
+    return {SYNONYMS.get(t, t) for t in tokenize(str(value))}
+
+# --- Per-spot feature arrays ---
+class SpotFeatures:
+    """
+    Column arrays of every spot's scoring features, in ascending id order,
+    plus token postings (token -> row numbers) for the text attributes.
+    Built once per catalog snapshot.
+    """
+    TOKEN_SIGNALS = {'amenities': ('amenities', 'seating'), 'activity': ('activity',), 'location': ('location',)}
+
+    def __init__(self, records):
+        records = sorted(records, key=lambda r: r.id)
+        n = len(records)
+        self.ids = np.fromiter((r.id for r in records), dtype=np.int64, count=n)
+        self.noise = np.full(n, np.nan, dtype=np.float32)
+        self.noise_labels = np.array([(r.noise_level or '').lower() for r in records], dtype=object)
+        self.lats = np.array([r.latitude if r.latitude is not None else np.nan for r in records], dtype=np.float64)
+        self.lons = np.array([r.longitude if r.longitude is not None else np.nan for r in records], dtype=np.float64)
+        types, postings = {}, {signal: {} for signal in self.TOKEN_SIGNALS}
+        for row, r in enumerate(records):
+            types.setdefault((r.type or '').lower(), []).append(row)
+            level = NOISE_LEVELS.get(self.noise_labels[row])
+            if level is not None:
+                self.noise[row] = level
+            for signal, fields in self.TOKEN_SIGNALS.items():
+                tokens = {SYNONYMS.get(t, t) for f in fields for t in tokenize(getattr(r, f))}
+                for token in tokens:
+                    postings[signal].setdefault(token, []).append(row)
+        self.types = {t: np.array(rows, dtype=np.int64) for t, rows in types.items()}
+        self.postings = {signal: {t: np.array(rows, dtype=np.int64) for t, rows in index.items()}
+                         for signal, index in postings.items()}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rows(self, ids):
+        """
+        Row numbers of the given spot ids (unknown ids are dropped).
+        """
+        ids = np.fromiter(ids, dtype=np.int64)
+        if not len(self.ids):
+            return np.zeros(0, dtype=np.int64)
+        rows = np.minimum(np.searchsorted(self.ids, ids), len(self.ids) - 1)
+        return rows[self.ids[rows] == ids]
+
+    # --- Signal scores in [0, 1] for every spot ---
+    def token_score(self, signal, tokens):
+        counts = np.zeros(len(self.ids), dtype=np.float32)
+        for token in tokens:
+            rows = self.postings[signal].get(token)
+            if rows is not None:
+                counts[rows] += 1
+        return counts / len(tokens)
+
+    def noise_score(self, wanted):
+        level = NOISE_LEVELS.get(wanted.lower())
+        if level is None:  # Unrecognized label: exact matches only
+            return (self.noise_labels == wanted.lower()).astype(np.float32)
+        score = 1.0 - np.abs(self.noise - level)
+        return np.where(np.isnan(score), UNKNOWN_SCORE, score).astype(np.float32)
+
+    def distance_score(self, lat, lon):
+        score = np.exp(-haversine_km(lat, lon, self.lats, self.lons) / DISTANCE_SCALE_KM)
+        return np.nan_to_num(score, nan=0.0).astype(np.float32)
+
+# --- Which signals a request asks for ---
+def requested_signals(parsed, preferences=None):
+    """
+    [(signal, weight, argument)] for every signal the parsed query (or, at
+    PREFERENCE_FACTOR weight, the user's preferences) asks for.
+    """
+    preferences = preferences or {}
+    weights = dict(SIGNAL_WEIGHTS)
+    for signal, weight in (preferences.get('weights') or {}).items():
+        if signal in weights and isinstance(weight, (int, float)):
+            weights[signal] = max(0.0, float(weight))
+
+    def argument(signal, source):
+        if signal == 'noise':
+            value = source.get('noise_level')
+            return value.strip() if isinstance(value, str) and value.strip() else None
+        if signal in SpotFeatures.TOKEN_SIGNALS:
+            return query_tokens(source.get(signal)) or None
+        if signal == 'distance':
+            try:
+                return float(source['lat']), float(source['lon'])
+            except (KeyError, TypeError, ValueError):
+                return None
+
+    signals = []
+    for signal in SIGNAL_WEIGHTS:
+        value = argument(signal, parsed)
+        factor = 1.0
+        if value is None:
+            value, factor = argument(signal, preferences), PREFERENCE_FACTOR
+        if value is not None and weights[signal] > 0:
+            signals.append((signal, weights[signal] * factor, value))
+    return signals
+
+# --- Score and select the top k ---
+def rank_spots(features, parsed, k=DEFAULT_TOP_K, preferences=None, allowed_ids=None):
+    """
+    Score every spot of the requested type as the weighted mean of the
+    requested signals and return the best k as [(spot_id, score,
+    {signal: contribution})], best first (ties by id). Type (and
+    allowed_ids, if given) is the only hard filter.
+    """
+    signals = requested_signals(parsed, preferences)
+    n = len(features)
+    total = sum(weight for _, weight, _ in signals) or 1.0
+    contributions = {}
+    score = np.zeros(n, dtype=np.float32)
+    for signal, weight, value in signals:
+        if signal == 'noise':
+            s = features.noise_score(value)
+        elif signal == 'distance':
+            s = features.distance_score(*value)
+        else:
+            s = features.token_score(signal, value)
+        part = s * (weight / total)
+        contributions[signal] = part
+        score += part
+
+    eligible = np.ones(n, dtype=bool)
+    spot_type = parsed.get('type')
+    if spot_type:
+        eligible[:] = False
+        eligible[features.types.get(str(spot_type).lower(), np.zeros(0, dtype=np.int64))] = True
+    if allowed_ids is not None:
+        allowed = np.zeros(n, dtype=bool)
+        allowed[features.rows(allowed_ids)] = True
+        eligible &= allowed
+    candidates = np.flatnonzero(eligible)
+    k = max(0, min(k, len(candidates)))
+    if not k:
+        return []
+    candidate_scores = score[candidates]
+    if k < len(candidates):
+        # Partial selection: O(n) to find the best k, then sort only those
+        threshold = candidate_scores[np.argpartition(-candidate_scores, k - 1)[:k]].min()
+        # argpartition cuts ties at the k-th score arbitrarily; keep the lowest ids instead
+        # (candidates are in id order)
+        above = np.flatnonzero(candidate_scores > threshold)
+        tied = np.flatnonzero(candidate_scores == threshold)[:k - len(above)]
+        top = np.concatenate([above, tied])
+    else:
+        top = np.arange(len(candidates))
+    rows = candidates[top]
+    order = np.lexsort((features.ids[rows], -score[rows]))[:k]
+    rows = rows[order]
+    return [(int(features.ids[row]), float(score[row]),
+             {signal: round(float(part[row]), 4) for signal, part in contributions.items()})
+            for row in rows]
@@ -0,0 +1,110 @@
+from sqlalchemy import DDL, event, text  # Raw FTS5 statements
+
+from db import db, read_bind
+from models import Spot
+from utils.spot_catalog import db_catalog, tokenize
+
+SEARCH_COLUMNS = ('name', 'amenities', 'seating', 'activity')
+COLUMN_WEIGHTS = (10.0, 4.0, 2.0, 4.0)  # BM25 weight per column (a name hit counts most)
+
+_COLS = ", ".join(SEARCH_COLUMNS)
+_NEW = ", ".join(f"new.{c}" for c in SEARCH_COLUMNS)
+_OLD = ", ".join(f"old.{c}" for c in SEARCH_COLUMNS)
+
+# External-content FTS5 table over spot, kept in sync by triggers
+FTS_STATEMENTS = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS spot_fts USING fts5({_COLS}, content='spot', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS spot_fts_ai AFTER INSERT ON spot BEGIN "
+    f"INSERT INTO spot_fts(rowid, {_COLS}) VALUES (new.id, {_NEW}); END",
+    f"CREATE TRIGGER IF NOT EXISTS spot_fts_ad AFTER DELETE ON spot BEGIN "
+    f"INSERT INTO spot_fts(spot_fts, rowid, {_COLS}) VALUES ('delete', old.id, {_OLD}); END",
+    f"CREATE TRIGGER IF NOT EXISTS spot_fts_au AFTER UPDATE ON spot BEGIN "
+    f"INSERT INTO spot_fts(spot_fts, rowid, {_COLS}) VALUES ('delete', old.id, {_OLD}); "
+    f"INSERT INTO spot_fts(rowid, {_COLS}) VALUES (new.id, {_NEW}); END",
+]
+
+# Create the index alongside the spot table on SQLite
+for _statement in FTS_STATEMENTS:
+    event.listen(Spot.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+
+_ready_engines = set()
+
+# --- Make sure the FTS index exists (and is populated) ---
+def ensure_search_index():
+    """
+    Create the FTS5 table and triggers for databases that predate them and
+    index the existing rows. Returns False if full-text search is unavailable
+    (non-SQLite database or SQLite built without FTS5).
+    """
+    engine = db.engine
+    if engine in _ready_engines:
+        return True
+    if engine.dialect.name != 'sqlite':
+        return False
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'spot_fts'")).first()
+            for statement in FTS_STATEMENTS:
+                conn.execute(text(statement))
+            if not exists:
+                conn.execute(text("INSERT INTO spot_fts(spot_fts) VALUES ('rebuild')"))
+    except Exception as e:
+        print(f"Full-text search unavailable: {e}")
+        return False
+    _ready_engines.add(engine)
+    return True
+
+# --- Build an FTS5 MATCH expression from user text ---
+def match_expression(query, prefix=True, columns=None):
+    """
+    Quote each word so user input cannot inject FTS syntax. All words must
+    match; the last one also matches as a prefix (for search-as-you-type).
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return None
+    terms = [f'"{t}"' for t in tokens]
+    if prefix:
+        terms[-1] += '*'
+    expression = " ".join(terms)
+    if columns:
+        expression = "{" + " ".join(columns) + "} : (" + expression + ")"
+    return expression
+
+# --- Ranked search ---
+def search_spots(query, limit=20, columns=None, prefix=True):
+    """
+    Return [(spot_id, score)] best first, scored by BM25 (higher is better).
+    Without FTS5, falls back to counting matched words in the spot catalog.
+    """
+    expression = match_expression(query, prefix=prefix, columns=columns)
+    if expression is None:
+        return []
+    if ensure_search_index():
+        weights = ", ".join(str(w) for w in COLUMN_WEIGHTS)
+        rows = db.session.execute(
+            text(f"SELECT rowid, -bm25(spot_fts, {weights}) AS score FROM spot_fts "
+                 "WHERE spot_fts MATCH :q ORDER BY score DESC LIMIT :limit"),
+            {'q': expression, 'limit': limit},
+            bind_arguments=read_bind(),
+        ).all()
+        return [(row[0], float(row[1])) for row in rows]
+
+    catalog = db_catalog()
+    tokens = set(tokenize(query))
+    scored = []
+    for record in catalog.records.values():
+        words = set(tokenize(" ".join(getattr(record, c) or "" for c in (columns or SEARCH_COLUMNS))))
+        hits = len(tokens & words)
+        if hits == len(tokens):
+            scored.append((record.id, float(hits)))
+    scored.sort(key=lambda pair: (-pair[1], pair[0]))
+    return scored[:limit]
+
+def search_ids(query, columns=None, limit=10000):
+    """
+    Set of spot ids whose text matches every word of the query, for use as
+    a filter alongside the catalog's other indexes.
+    """
+    return {spot_id for spot_id, _ in search_spots(query, limit=limit, columns=columns, prefix=False)}
@@ -0,0 +1,158 @@
+import math
+import re
+import threading  # Guard the index across request threads
+import zlib  # Stable n-gram hashes (unlike hash(), the same in every process)
+from functools import lru_cache
+
+import numpy as np  # Sparse TF-IDF scoring
+
+DIMENSIONS = 1 << 18  # Hash buckets; collisions are rare at this size for short texts
+NGRAM_SIZES = (3, 4)  # Character n-grams of each space-padded word
+LOCAL_MIN_SCORE = 0.2  # Cosine floor for local matches (TF-IDF scores run lower than embeddings)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# --- Text -> hashed character n-grams ---
+@lru_cache(maxsize=65536)  # Subjects reuse a small vocabulary of words
+def word_buckets(word):
+    """
+    Hash buckets of a word and its character n-grams.
+    """
+    padded = f" {word} "
+    grams = [padded[i:i + n] for n in NGRAM_SIZES for i in range(len(padded) - n + 1)]
+    grams.append(padded)
+    return tuple(zlib.crc32(gram.encode("utf-8")) % DIMENSIONS for gram in grams)
+
+def text_features(text):
+    """
+    (buckets, weights) of a text's hashed TF vector: every word plus its
+    character n-grams, so "calc" still overlaps "calculus" and typos
+    ("calculas") keep most of their grams. Weights are 1 + log(count).
+    """
+    counts = {}
+    for word in _WORD_RE.findall((text or "").lower()):
+        for bucket in word_buckets(word):
+            counts[bucket] = counts.get(bucket, 0) + 1
+    buckets = np.fromiter(counts, dtype=np.int32, count=len(counts))
+    weights = np.fromiter((1.0 + math.log(c) for c in counts.values()), dtype=np.float32, count=len(counts))
+    return buckets, weights
+
+# --- Incrementally refit TF-IDF index ---
+class TextIndex:
+    """
+    Hashed character n-gram TF-IDF vectors for a set of keyed texts, scored
+    by cosine similarity without any API call. Adding or removing a text
+    updates the document frequencies in place; the postings arrays, IDF
+    weights and norms are rebuilt (one vectorized pass) on the next query
+    after a change, so an unchanged index never recomputes them.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.docs = {}  # key -> (text, buckets, weights)
+        self.df = np.zeros(DIMENSIONS, dtype=np.int32)
+        self._postings = None
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, key, text):
+        """
+        Add or refresh one text. Unchanged texts are skipped.
+        """
+        with self.lock:
+            old = self.docs.get(key)
+            if old is not None and old[0] == text:
+                return
+            if old is not None:
+                self.df[old[1]] -= 1
+            buckets, weights = text_features(text)
+            self.df[buckets] += 1
+            self.docs[key] = (text, buckets, weights)
+            self._postings = None
+
+    def remove(self, key):
+        with self.lock:
+            old = self.docs.pop(key, None)
+            if old is not None:
+                self.df[old[1]] -= 1
+                self._postings = None
+
+    def sync(self, items):
+        """
+        Reconcile the index with (key, text) pairs: add new or changed
+        texts and drop keys that are gone. Returns True if anything changed.
+        """
+        with self.lock:
+            wanted = dict(items)
+            stale = [key for key in self.docs if key not in wanted]
+            changed = [key for key, text in wanted.items()
+                       if key not in self.docs or self.docs[key][0] != text]
+            if not stale and not changed:
+                return False
+            dropped = [self.docs.pop(key)[1] for key in stale]
+            dropped += [self.docs[key][1] for key in changed if key in self.docs]
+            for key in changed:
+                self.docs[key] = (wanted[key], *text_features(wanted[key]))
+            # Document frequencies in two bulk passes rather than per text
+            if dropped:
+                self.df -= np.bincount(np.concatenate(dropped), minlength=DIMENSIONS).astype(np.int32)
+            if changed:
+                added = np.concatenate([self.docs[key][1] for key in changed])
+                self.df += np.bincount(added, minlength=DIMENSIONS).astype(np.int32)
+            self._postings = None
+            return True
+
+    def idf(self):
+        return np.log((1.0 + len(self.docs)) / (1.0 + self.df)) + 1.0
+
+    def _build(self):
+        """
+        Postings sorted by bucket (buckets, rows, weights), the key of each
+        row, each row's TF-IDF norm and the IDF of every bucket.
+        """
+        keys = list(self.docs)
+        if not keys:
+            empty = np.zeros(0, dtype=np.int32)
+            return empty, empty, np.zeros(0, dtype=np.float32), keys, np.zeros(0, dtype=np.float32), None
+        parts = [self.docs[key] for key in keys]
+        buckets = np.concatenate([p[1] for p in parts])
+        weights = np.concatenate([p[2] for p in parts])
+        rows = np.repeat(np.arange(len(keys), dtype=np.int32), [len(p[1]) for p in parts])
+        idf = self.idf()
+        norms = np.sqrt(np.bincount(rows, weights=(weights * idf[buckets]) ** 2, minlength=len(keys)))
+        order = np.argsort(buckets, kind='stable')
+        return buckets[order], rows[order], weights[order], keys, norms.astype(np.float32), idf
+
+    def top_k(self, text, k=10, min_score=None):
+        """
+        Best k (key, score) pairs for a query text, highest first.
+        """
+        with self.lock:
+            if self._postings is None:
+                self._postings = self._build()
+            buckets, rows, weights, all_keys, norms, idf = self._postings
+        if not all_keys:
+            return []
+        q_buckets, q_weights = text_features(text)
+        q_weights = q_weights * idf[q_buckets]
+        q_norm = float(np.linalg.norm(q_weights))
+        if not q_norm:
+            return []
+        lo = np.searchsorted(buckets, q_buckets, side='left')
+        hi = np.searchsorted(buckets, q_buckets, side='right')
+        scores = np.zeros(len(all_keys), dtype=np.float32)
+        for b, start, end, weight in zip(q_buckets, lo, hi, q_weights):
+            if start < end:  # A row appears at most once per bucket
+                scores[rows[start:end]] += weights[start:end] * (idf[b] * weight)
+        scores /= np.maximum(norms, 1e-12) * q_norm
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        floor = 1e-6 if min_score is None else min_score
+        return [(all_keys[i], float(scores[i])) for i in top if scores[i] >= floor]
+
+# Shared per-process index of study session subjects (keyed by session id)
+session_vectors = TextIndex()
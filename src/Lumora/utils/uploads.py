@@ -0,0 +1,180 @@
+import hashlib  # Content addresses
+import multiprocessing
+import os
+import signal
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.jobs import job, job_queue  # Durable derivation jobs
+
+try:
+    from PIL import Image, ImageOps  # Optional: thumbnails and format normalization
+except ImportError:
+    Image = ImageOps = None
+
+UPLOAD_FOLDER = os.path.join('instance', 'uploads')
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', 10 * 1024 * 1024))
+CHUNK_SIZE = 1 << 16  # Bytes read from the request at a time
+WORKERS = int(os.getenv('UPLOAD_WORKERS', 2))  # Image processes
+
+# Leading bytes of the accepted image formats
+SIGNATURES = {b'\x89PNG\r\n\x1a\n': 'png', b'\xff\xd8\xff': 'jpg', b'GIF87a': 'gif', b'GIF89a': 'gif'}
+
+# Derived assets: name -> longest side in pixels (all stored as JPEG)
+VARIANTS = {'thumb': 256, 'normalized': 2048}
+
+class UploadTooLarge(Exception):
+    pass
+
+class UnsupportedImage(Exception):
+    pass
+
+# --- Content-addressed paths ---
+def object_path(digest, ext):
+    return os.path.join(UPLOAD_FOLDER, 'objects', digest[:2], f'{digest}.{ext}')
+
+def find_object(digest):
+    """
+    Path of a stored original, or None.
+    """
+    for ext in set(SIGNATURES.values()):
+        path = object_path(digest, ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+def derived_path(digest, variant):
+    return os.path.join(UPLOAD_FOLDER, 'derived', digest[:2], digest, f'{variant}.jpg')
+
+# --- Streaming store ---
+def store_stream(stream, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Copy an upload to disk CHUNK_SIZE bytes at a time, hashing as it is
+    written, and file it under its SHA-256. Identical content is stored once.
+    Raises UploadTooLarge past max_bytes and UnsupportedImage unless the
+    bytes start like a PNG, JPEG or GIF.
+    Returns {'hash', 'ext', 'size', 'path', 'duplicate'}.
+    """
+    tmp_dir = os.path.join(UPLOAD_FOLDER, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    hasher = hashlib.sha256()
+    size, ext = 0, None
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if ext is None:
+                    ext = next((e for sig, e in SIGNATURES.items() if chunk.startswith(sig)), None)
+                    if ext is None:
+                        raise UnsupportedImage('Invalid file type')
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f'File exceeds {max_bytes} bytes')
+                hasher.update(chunk)
+                out.write(chunk)
+        if ext is None:
+            raise UnsupportedImage('Empty file')
+        digest = hasher.hexdigest()
+        path = object_path(digest, ext)
+        duplicate = os.path.exists(path)
+        if duplicate:
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        return {'hash': digest, 'ext': ext, 'size': size, 'path': path, 'duplicate': duplicate}
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+# --- Derived assets (run in worker processes) ---
+def render_variants(src, digest):
+    """
+    Write every variant of one image: EXIF rotation applied, metadata
+    stripped, RGB JPEG scaled to fit the variant's size.
+    """
+    with Image.open(src) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGB')
+        for variant, side in sorted(VARIANTS.items(), key=lambda item: -item[1]):
+            image.thumbnail((side, side))  # Shrinks in place, largest first
+            path = derived_path(digest, variant)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f'{path}.{os.getpid()}.tmp'
+            image.save(tmp, 'JPEG', quality=85, optimize=True)
+            os.replace(tmp, path)
+    return list(VARIANTS)
+
+def _ignore_interrupts():
+    # Ctrl-C reaches the whole process group; the parent shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+class DerivedAssets:
+    """
+    Generates thumbnails off the request thread. Each image is a durable
+    'render_upload' job (keyed by digest, so it is only queued once); the
+    job renders in a small process pool so image work never holds the GIL
+    of the worker that runs it. Pool processes are spawned, so they import
+    the running script again: scripts that render must keep their work under
+    `if __name__ == '__main__':` (see worker.py).
+    """
+
+    def __init__(self, workers=WORKERS):
+        self.workers = workers
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def ready(self, digest):
+        return all(os.path.exists(derived_path(digest, v)) for v in VARIANTS)
+
+    def schedule(self, digest, src):
+        """
+        Queue derivation for a stored image. Returns (status, job id) with
+        status 'ready', 'pending' or 'unavailable' (Pillow missing, or an
+        earlier render failed for good, e.g. an image Pillow can't decode).
+        """
+        if self.ready(digest):
+            return 'ready', None
+        if Image is None:
+            return 'unavailable', None
+        key = f'render_upload:{digest}'
+        latest = job_queue.latest(key)
+        if latest is not None and latest['status'] == 'failed':
+            return 'unavailable', latest['id']  # Don't queue a new render on every request
+        queued = job_queue.enqueue('render_upload', {'digest': digest, 'src': src}, key=key)
+        return 'pending', queued['id']
+
+    def render(self, digest, src):
+        """
+        Render every variant in the process pool and wait for it.
+        """
+        with self.lock:
+            if self.pool is None:
+                # Spawned workers don't inherit the server's threads or DB connections
+                self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                                initializer=_ignore_interrupts)
+            pool = self.pool
+        return pool.submit(render_variants, src, digest).result()
+
+    def shutdown(self):
+        with self.lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+@job('render_upload')
+def render_upload_job(payload):
+    """
+    Background job: write the derived variants of an uploaded image.
+    """
+    if derived_assets.ready(payload['digest']):
+        return {'variants': list(VARIANTS)}
+    return {'variants': derived_assets.render(payload['digest'], payload['src'])}
+
+# Shared per-process pool
+derived_assets = DerivedAssets()
@@ -0,0 +1,37 @@
+import argparse  # Command-line options
+from app import create_app  # Flask app factory (its blueprints register the session and upload jobs)
+import utils.batch_categorize  # Registers the categorize_spots job
+from utils.jobs import HANDLERS, job_queue  # Durable SQLite job queue
+from utils.uploads import derived_assets  # Thumbnail render pool
+
+# --- Run the job queue ---
+def main(argv=None):
+    """
+    Run queued jobs on worker threads until Ctrl-C, or purge old ones.
+    Only runs when this file is executed: spawned child processes (e.g. the
+    render pool) import it as a module and must not start workers of their own.
+    """
+    app = create_app()  # Registers the job kinds of every blueprint
+    parser = argparse.ArgumentParser(description="Run queued background jobs (embeddings, thumbnails, categorization).")
+    parser.add_argument('--threads', type=int, default=4, help="jobs run at a time")
+    parser.add_argument('--kinds', nargs='*', choices=sorted(HANDLERS), help="only run these job kinds")
+    parser.add_argument('--purge', action='store_true', help="delete old finished jobs and exit")
+    args = parser.parse_args(argv)
+
+    if args.purge:
+        print(f"Purged {job_queue.purge()} finished jobs.")
+        return
+    # Set JOB_INLINE_WORKERS=0 on the web processes when running this
+    print(f"Running {', '.join(args.kinds or sorted(HANDLERS))} jobs on {args.threads} threads (Ctrl-C to stop)")
+    stop = job_queue.start_workers(app, args.threads, args.kinds)
+    try:
+        while not stop.wait(60):
+            pass
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in job_queue.workers:
+            thread.join()  # Let running jobs finish; unfinished ones are retried after their lease
+        derived_assets.shutdown()
+
+if __name__ == '__main__':
+    main()